@@ -0,0 +1,120 @@
+-- Core rental system schema.
+
+CREATE TABLE IF NOT EXISTS user_auth (
+  auth_id INT NOT NULL AUTO_INCREMENT,
+  username VARCHAR(255) NOT NULL,
+  password_hash VARCHAR(255) NOT NULL,
+  salt VARCHAR(64) NOT NULL,
+  last_login DATETIME DEFAULT NULL,
+  PRIMARY KEY (auth_id),
+  UNIQUE KEY uq_user_auth_username (username)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS user (
+  user_id INT NOT NULL AUTO_INCREMENT,
+  auth_id INT NOT NULL,
+  first_name VARCHAR(64) NOT NULL,
+  last_name VARCHAR(64) NOT NULL,
+  phone VARCHAR(32) DEFAULT NULL,
+  email VARCHAR(255) NOT NULL,
+  PRIMARY KEY (user_id),
+  UNIQUE KEY uq_user_auth_id (auth_id),
+  CONSTRAINT fk_user_auth FOREIGN KEY (auth_id) REFERENCES user_auth (auth_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS landlord (
+  user_id INT NOT NULL,
+  PRIMARY KEY (user_id),
+  CONSTRAINT fk_landlord_user FOREIGN KEY (user_id) REFERENCES user (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS tenant (
+  user_id INT NOT NULL,
+  PRIMARY KEY (user_id),
+  CONSTRAINT fk_tenant_user FOREIGN KEY (user_id) REFERENCES user (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS us_citizen (
+  user_id INT NOT NULL,
+  ssn VARCHAR(11) NOT NULL,
+  PRIMARY KEY (user_id),
+  CONSTRAINT fk_us_citizen_user FOREIGN KEY (user_id) REFERENCES user (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS international_student (
+  user_id INT NOT NULL,
+  passport_id VARCHAR(32) NOT NULL,
+  PRIMARY KEY (user_id),
+  CONSTRAINT fk_international_student_user FOREIGN KEY (user_id) REFERENCES user (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS student (
+  user_id INT NOT NULL,
+  transcript VARCHAR(255) DEFAULT NULL,
+  PRIMARY KEY (user_id),
+  CONSTRAINT fk_student_user FOREIGN KEY (user_id) REFERENCES user (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS broker (
+  broker_id INT NOT NULL AUTO_INCREMENT,
+  first_name VARCHAR(64) NOT NULL,
+  last_name VARCHAR(64) NOT NULL,
+  phone VARCHAR(32) DEFAULT NULL,
+  email VARCHAR(255) DEFAULT NULL,
+  PRIMARY KEY (broker_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS broker_tenant (
+  broker_id INT NOT NULL,
+  tenant_id INT NOT NULL,
+  PRIMARY KEY (broker_id, tenant_id),
+  CONSTRAINT fk_broker_tenant_broker FOREIGN KEY (broker_id) REFERENCES broker (broker_id),
+  CONSTRAINT fk_broker_tenant_tenant FOREIGN KEY (tenant_id) REFERENCES tenant (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS neighborhood (
+  neighborhood_id INT NOT NULL AUTO_INCREMENT,
+  name VARCHAR(64) NOT NULL,
+  PRIMARY KEY (neighborhood_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS properties (
+  property_id INT NOT NULL AUTO_INCREMENT,
+  landlord_id INT NOT NULL,
+  street_number INT NOT NULL,
+  street_name VARCHAR(64) NOT NULL,
+  city VARCHAR(32) NOT NULL,
+  state VARCHAR(3) NOT NULL,
+  zip INT DEFAULT NULL,
+  room_number INT DEFAULT NULL,
+  square_foot INT DEFAULT NULL,
+  price DECIMAL(10, 2) NOT NULL,
+  room_amount INT DEFAULT NULL,
+  for_rent TINYINT(1) NOT NULL DEFAULT 1,
+  PRIMARY KEY (property_id),
+  CONSTRAINT fk_properties_landlord FOREIGN KEY (landlord_id) REFERENCES landlord (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS property_neighborhood (
+  property_id INT NOT NULL,
+  neighborhood_id INT NOT NULL,
+  PRIMARY KEY (property_id, neighborhood_id),
+  CONSTRAINT fk_property_neighborhood_property FOREIGN KEY (property_id) REFERENCES properties (property_id),
+  CONSTRAINT fk_property_neighborhood_neighborhood FOREIGN KEY (neighborhood_id) REFERENCES neighborhood (neighborhood_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS rent (
+  rent_id INT NOT NULL AUTO_INCREMENT,
+  tenant_id INT NOT NULL,
+  property_id INT NOT NULL,
+  contract_length INT NOT NULL,
+  price DECIMAL(10, 2) NOT NULL,
+  broker_fee DECIMAL(10, 2) DEFAULT NULL,
+  broker_id INT DEFAULT NULL,
+  start_date DATE NOT NULL,
+  end_date DATE NOT NULL,
+  PRIMARY KEY (rent_id),
+  CONSTRAINT fk_rent_tenant FOREIGN KEY (tenant_id) REFERENCES tenant (user_id),
+  CONSTRAINT fk_rent_property FOREIGN KEY (property_id) REFERENCES properties (property_id),
+  CONSTRAINT fk_rent_broker FOREIGN KEY (broker_id) REFERENCES broker (broker_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
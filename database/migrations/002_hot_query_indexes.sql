@@ -0,0 +1,20 @@
+-- Indexes for the lookups and searches issued by src/main.py.
+
+-- Login, signup and profile edits look users up by email and phone.
+CREATE UNIQUE INDEX uq_user_email ON user (email);
+CREATE UNIQUE INDEX uq_user_phone ON user (phone);
+CREATE UNIQUE INDEX uq_us_citizen_ssn ON us_citizen (ssn);
+CREATE UNIQUE INDEX uq_international_student_passport ON international_student (passport_id);
+
+-- Property search: equality on for_rent/city/state, then a price range.
+CREATE INDEX idx_properties_search ON properties (for_rent, city, state, price);
+-- Unfiltered searches walk for-rent listings in (price, property_id) order.
+CREATE INDEX idx_properties_price ON properties (for_rent, price, property_id);
+
+-- My rentals, newest first.
+CREATE INDEX idx_rent_tenant_end ON rent (tenant_id, end_date);
+-- "Am I already renting this property?"
+CREATE INDEX idx_rent_property_tenant_end ON rent (property_id, tenant_id, end_date);
+
+CREATE INDEX idx_broker_tenant_tenant ON broker_tenant (tenant_id);
+CREATE INDEX idx_property_neighborhood_neighborhood ON property_neighborhood (neighborhood_id);
@@ -0,0 +1,3 @@
+-- Date-range bookings: overlap checks and "available from X to Y" searches
+-- probe one property's stays that end after X, reading start dates from the index.
+CREATE INDEX idx_rent_property_dates ON rent (property_id, end_date, start_date);
@@ -0,0 +1,4 @@
+-- The lease sweeper walks leases that ended, and stays that began, since
+-- its last run in (date, property_id) order, reading only these indexes.
+CREATE INDEX idx_rent_end_date ON rent (end_date, property_id);
+CREATE INDEX idx_rent_start_date ON rent (start_date, property_id);
@@ -0,0 +1,31 @@
+-- Saved search filter sets and the per-user queue of listings that matched them.
+CREATE TABLE IF NOT EXISTS saved_search (
+  search_id INT NOT NULL AUTO_INCREMENT,
+  user_id INT NOT NULL,
+  name VARCHAR(64) DEFAULT NULL,
+  city VARCHAR(32) DEFAULT NULL,
+  state VARCHAR(3) DEFAULT NULL,
+  min_price DECIMAL(10, 2) DEFAULT NULL,
+  max_price DECIMAL(10, 2) DEFAULT NULL,
+  min_sqft INT DEFAULT NULL,
+  min_rooms INT DEFAULT NULL,
+  created_at DATETIME NOT NULL,
+  PRIMARY KEY (search_id),
+  KEY idx_saved_search_user (user_id),
+  CONSTRAINT fk_saved_search_user FOREIGN KEY (user_id) REFERENCES user (user_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS search_notification (
+  notification_id INT NOT NULL AUTO_INCREMENT,
+  user_id INT NOT NULL,
+  search_id INT NOT NULL,
+  property_id INT NOT NULL,
+  created_at DATETIME NOT NULL,
+  seen TINYINT(1) NOT NULL DEFAULT 0,
+  PRIMARY KEY (notification_id),
+  -- A user's unseen matches, oldest first.
+  KEY idx_search_notification_user (user_id, seen, notification_id),
+  KEY idx_search_notification_search (search_id),
+  CONSTRAINT fk_search_notification_search FOREIGN KEY (search_id) REFERENCES saved_search (search_id),
+  CONSTRAINT fk_search_notification_property FOREIGN KEY (property_id) REFERENCES properties (property_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,19 @@
+-- Listing counts, vacancy and rent sketches per city, zip code and
+-- neighborhood, kept up to date incrementally by src/market.py.
+CREATE TABLE IF NOT EXISTS market_stats (
+  kind VARCHAR(16) NOT NULL,
+  group_key VARCHAR(64) NOT NULL,
+  label VARCHAR(64) NOT NULL,
+  listings INT NOT NULL DEFAULT 0,
+  vacant INT NOT NULL DEFAULT 0,
+  rent_p25 DECIMAL(10, 2) DEFAULT NULL,
+  rent_median DECIMAL(10, 2) DEFAULT NULL,
+  rent_p75 DECIMAL(10, 2) DEFAULT NULL,
+  ppsf_p25 DECIMAL(10, 2) DEFAULT NULL,
+  ppsf_median DECIMAL(10, 2) DEFAULT NULL,
+  ppsf_p75 DECIMAL(10, 2) DEFAULT NULL,
+  rent_sketch TEXT NOT NULL,
+  ppsf_sketch TEXT NOT NULL,
+  updated_at DATETIME NOT NULL,
+  PRIMARY KEY (kind, group_key)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,4 @@
+-- Phone numbers are not unique: signups without one store ''. Keep the
+-- lookup index from 002 but drop its uniqueness.
+DROP INDEX uq_user_phone ON user;
+CREATE INDEX idx_user_phone ON user (phone);
@@ -0,0 +1,6 @@
+-- Date-range searches also match listings that are let today, so they do
+-- not filter on for_rent and cannot use the 002 indexes that lead with it.
+-- Equality on city/state, then a price range.
+CREATE INDEX idx_properties_city_price ON properties (city, state, price);
+-- Unfiltered date searches walk every listing in (price, property_id) order.
+CREATE INDEX idx_properties_price_id ON properties (price, property_id);
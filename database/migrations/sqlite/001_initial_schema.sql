@@ -0,0 +1,94 @@
+-- Core rental system schema, SQLite edition of ../001_initial_schema.sql.
+-- Text columns that MySQL compares case-insensitively use COLLATE NOCASE.
+
+CREATE TABLE IF NOT EXISTS user_auth (
+  auth_id INTEGER PRIMARY KEY,
+  username VARCHAR(255) NOT NULL COLLATE NOCASE UNIQUE,
+  password_hash VARCHAR(255) NOT NULL,
+  salt VARCHAR(64) NOT NULL,
+  last_login DATETIME DEFAULT NULL
+);
+
+CREATE TABLE IF NOT EXISTS user (
+  user_id INTEGER PRIMARY KEY,
+  auth_id INT NOT NULL UNIQUE REFERENCES user_auth (auth_id),
+  first_name VARCHAR(64) NOT NULL,
+  last_name VARCHAR(64) NOT NULL,
+  phone VARCHAR(32) DEFAULT NULL,
+  email VARCHAR(255) NOT NULL COLLATE NOCASE
+);
+
+CREATE TABLE IF NOT EXISTS landlord (
+  user_id INTEGER PRIMARY KEY REFERENCES user (user_id)
+);
+
+CREATE TABLE IF NOT EXISTS tenant (
+  user_id INTEGER PRIMARY KEY REFERENCES user (user_id)
+);
+
+CREATE TABLE IF NOT EXISTS us_citizen (
+  user_id INTEGER PRIMARY KEY REFERENCES user (user_id),
+  ssn VARCHAR(11) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS international_student (
+  user_id INTEGER PRIMARY KEY REFERENCES user (user_id),
+  passport_id VARCHAR(32) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS student (
+  user_id INTEGER PRIMARY KEY REFERENCES user (user_id),
+  transcript VARCHAR(255) DEFAULT NULL
+);
+
+CREATE TABLE IF NOT EXISTS broker (
+  broker_id INTEGER PRIMARY KEY,
+  first_name VARCHAR(64) NOT NULL,
+  last_name VARCHAR(64) NOT NULL,
+  phone VARCHAR(32) DEFAULT NULL,
+  email VARCHAR(255) DEFAULT NULL
+);
+
+CREATE TABLE IF NOT EXISTS broker_tenant (
+  broker_id INT NOT NULL REFERENCES broker (broker_id),
+  tenant_id INT NOT NULL REFERENCES tenant (user_id),
+  PRIMARY KEY (broker_id, tenant_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS neighborhood (
+  neighborhood_id INTEGER PRIMARY KEY,
+  name VARCHAR(64) NOT NULL COLLATE NOCASE
+);
+
+CREATE TABLE IF NOT EXISTS properties (
+  property_id INTEGER PRIMARY KEY,
+  landlord_id INT NOT NULL REFERENCES landlord (user_id),
+  street_number INT NOT NULL,
+  street_name VARCHAR(64) NOT NULL COLLATE NOCASE,
+  city VARCHAR(32) NOT NULL COLLATE NOCASE,
+  state VARCHAR(3) NOT NULL COLLATE NOCASE,
+  zip INT DEFAULT NULL,
+  room_number INT DEFAULT NULL,
+  square_foot INT DEFAULT NULL,
+  price DECIMAL(10, 2) NOT NULL,
+  room_amount INT DEFAULT NULL,
+  for_rent TINYINT(1) NOT NULL DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS property_neighborhood (
+  property_id INT NOT NULL REFERENCES properties (property_id),
+  neighborhood_id INT NOT NULL REFERENCES neighborhood (neighborhood_id),
+  PRIMARY KEY (property_id, neighborhood_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rent (
+  rent_id INTEGER PRIMARY KEY,
+  tenant_id INT NOT NULL REFERENCES tenant (user_id),
+  property_id INT NOT NULL REFERENCES properties (property_id),
+  contract_length INT NOT NULL,
+  price DECIMAL(10, 2) NOT NULL,
+  broker_fee DECIMAL(10, 2) DEFAULT NULL,
+  broker_id INT DEFAULT NULL REFERENCES broker (broker_id),
+  start_date DATE NOT NULL,
+  end_date DATE NOT NULL
+);
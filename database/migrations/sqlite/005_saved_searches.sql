@@ -0,0 +1,25 @@
+-- SQLite edition of ../005_saved_searches.sql.
+CREATE TABLE IF NOT EXISTS saved_search (
+  search_id INTEGER PRIMARY KEY,
+  user_id INT NOT NULL REFERENCES user (user_id),
+  name VARCHAR(64) DEFAULT NULL,
+  city VARCHAR(32) DEFAULT NULL COLLATE NOCASE,
+  state VARCHAR(3) DEFAULT NULL COLLATE NOCASE,
+  min_price DECIMAL(10, 2) DEFAULT NULL,
+  max_price DECIMAL(10, 2) DEFAULT NULL,
+  min_sqft INT DEFAULT NULL,
+  min_rooms INT DEFAULT NULL,
+  created_at DATETIME NOT NULL
+);
+CREATE INDEX idx_saved_search_user ON saved_search (user_id);
+
+CREATE TABLE IF NOT EXISTS search_notification (
+  notification_id INTEGER PRIMARY KEY,
+  user_id INT NOT NULL,
+  search_id INT NOT NULL REFERENCES saved_search (search_id),
+  property_id INT NOT NULL REFERENCES properties (property_id),
+  created_at DATETIME NOT NULL,
+  seen TINYINT(1) NOT NULL DEFAULT 0
+);
+CREATE INDEX idx_search_notification_user ON search_notification (user_id, seen, notification_id);
+CREATE INDEX idx_search_notification_search ON search_notification (search_id);
@@ -0,0 +1,3 @@
+-- SQLite edition of ../007_plain_phone_index.sql.
+DROP INDEX IF EXISTS uq_user_phone;
+CREATE INDEX IF NOT EXISTS idx_user_phone ON user (phone);
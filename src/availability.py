@@ -0,0 +1,222 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:  # the index is optional; availability checks fall back to SQL
+    np = None
+
+
+# Leases that have not ended yet; past ones cannot overlap a future stay.
+BOOKING_QUERY = """
+    SELECT rent_id, property_id, start_date, end_date
+    FROM rent
+    WHERE end_date > CURRENT_DATE
+"""
+
+
+def _day(value):
+    return value.toordinal() if isinstance(value, date) else int(value)
+
+
+class AvailabilityIndex:
+    """In-memory interval index of booked stays, as [start_date, end_date).
+
+    Each property's stays are kept in a sorted list, so checking one
+    property for an overlap is a binary search. For "which properties are
+    booked at some point between X and Y" every stay also sits in arrays
+    sorted by start date, under an implicit interval tree (a segment tree
+    of the latest end date below each node). A query descends only into
+    subtrees holding a stay that starts before Y and ends after X, one
+    vectorized step per tree level. New stays go to a small unsorted tail
+    that is scanned directly and merged into the tree once it fills up.
+
+    ``catch_up`` reads stays committed by other processes. rent_ids are
+    not committed in order, so an id it skips over is remembered as a gap
+    and read again by later catch-ups for ``gap_timeout`` seconds, longer
+    than any transaction that could still commit it.
+    """
+
+    def __init__(self, merge_every=4096, gap_timeout=600.0):
+        if np is None:
+            raise RuntimeError("AvailabilityIndex requires numpy.")
+        self.merge_every = merge_every
+        self.gap_timeout = gap_timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._stays = {}
+        self._tail = []
+        # Highest rent_id read from the database, the ids below it that
+        # were missing then ({rent_id: when first missed}), and ids above
+        # it that this process booked itself.
+        self.max_rent_id = 0
+        self._gaps = {}
+        self._local = set()
+        self._build_tree(np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64))
+
+    def _build_tree(self, starts, ends, property_ids):
+        order = np.argsort(starts, kind='stable')
+        self._start, self._end, self._property_id = starts[order], ends[order], property_ids[order]
+        leaves = 1
+        while leaves < len(order):
+            leaves *= 2
+        self._leaves = leaves
+        # tree[1] is the root and tree[leaves + i] the i-th stay; padding
+        # leaves end before any date so they never match.
+        tree = np.full(2 * leaves, -1, dtype=np.int32)
+        tree[leaves:leaves + len(order)] = self._end
+        level = leaves
+        while level > 1:
+            tree[level // 2:level] = np.maximum(tree[level:2 * level:2], tree[level + 1:2 * level:2])
+            level //= 2
+        self._tree = tree
+
+    def _merge_tail(self):
+        tail = np.array(self._tail, dtype=np.int64).reshape(-1, 3)
+        self._build_tree(np.concatenate([self._start, tail[:, 0].astype(np.int32)]),
+                         np.concatenate([self._end, tail[:, 1].astype(np.int32)]),
+                         np.concatenate([self._property_id, tail[:, 2]]))
+        self._tail = []
+
+    def _insert(self, property_id, start, end):
+        insort(self._stays.setdefault(property_id, []), (start, end))
+        self._tail.append((start, end, property_id))
+
+    def load(self, rows):
+        """Replace the contents with (rent_id, property_id, start_date, end_date) rows."""
+        with self._lock:
+            self._reset()
+            for rent_id, property_id, start, end in rows:
+                self._insert(property_id, _day(start), _day(end))
+                self.max_rent_id = max(self.max_rent_id, rent_id)
+            self._merge_tail()
+
+    def build(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(BOOKING_QUERY)
+        self.load(cursor.fetchall())
+        return len(self)
+
+    def add(self, property_id, start_date, end_date, rent_id=None):
+        """Record a stay this process booked.
+
+        It does not move the catch_up watermark, as other processes may
+        still commit lower rent_ids; catch_up skips rent_id when it reads it.
+        """
+        with self._lock:
+            if rent_id in self._gaps:
+                del self._gaps[rent_id]
+            elif rent_id is not None and rent_id <= self.max_rent_id:
+                return  # a catch_up in the booking's own transaction read it
+            elif rent_id is not None:
+                self._local.add(rent_id)
+            self._insert(property_id, _day(start_date), _day(end_date))
+            if len(self._tail) >= self.merge_every:
+                self._merge_tail()
+
+    def catch_up(self, conn):
+        """Add stays booked by other processes since the last build; returns how many."""
+        now = time.monotonic()
+        with self._lock:
+            self._gaps = {rent_id: since for rent_id, since in self._gaps.items()
+                          if now - since < self.gap_timeout}
+            after, gaps = self.max_rent_id, sorted(self._gaps)
+        query, params = BOOKING_QUERY + " AND (rent_id > %s", [after]
+        if gaps:
+            query += f" OR rent_id IN ({', '.join(['%s'] * len(gaps))})"
+            params.extend(gaps)
+        cursor = conn.cursor()
+        cursor.execute(query + ")", params)
+        rows = cursor.fetchall()
+        added = 0
+        with self._lock:
+            read = {rent_id for rent_id, _, _, _ in rows}
+            for rent_id, property_id, start, end in rows:
+                if rent_id in self._local or (rent_id <= self.max_rent_id and rent_id not in self._gaps):
+                    continue
+                self._insert(property_id, _day(start), _day(end))
+                self._gaps.pop(rent_id, None)
+                added += 1
+            top = max(read | {self.max_rent_id})
+            for rent_id in range(self.max_rent_id + 1, top):
+                if rent_id not in read and rent_id not in self._local:
+                    self._gaps[rent_id] = now
+            self.max_rent_id = top
+            self._local = {rent_id for rent_id in self._local if rent_id > top}
+            if len(self._tail) >= self.merge_every:
+                self._merge_tail()
+        return added
+
+    def prune(self, today=None):
+        """Drop stays that ended on or before today; returns how many."""
+        day = _day(today or date.today())
+        with self._lock:
+            dropped = 0
+            for property_id in list(self._stays):
+                stays = self._stays[property_id]
+                kept = [stay for stay in stays if stay[1] > day]
+                dropped += len(stays) - len(kept)
+                if not kept:
+                    del self._stays[property_id]
+                elif len(kept) < len(stays):
+                    self._stays[property_id] = kept
+            if dropped:
+                self._tail = [stay for stay in self._tail if stay[1] > day]
+                keep = self._end > day
+                self._build_tree(self._start[keep], self._end[keep], self._property_id[keep])
+        return dropped
+
+    def conflicts(self, property_id, start_date, end_date):
+        """The property's booked (start_date, end_date) stays overlapping the range."""
+        start, end = _day(start_date), _day(end_date)
+        with self._lock:
+            stays = self._stays.get(property_id, [])
+            # Stays never overlap each other, so ends are sorted too and the
+            # overlapping ones are contiguous just before the first stay
+            # starting at or after `end`.
+            i = bisect_left(stays, (end,))
+            found = []
+            while i > 0 and stays[i - 1][1] > start:
+                i -= 1
+                found.append(stays[i])
+        return [(date.fromordinal(s), date.fromordinal(e)) for s, e in reversed(found)]
+
+    def is_free(self, property_id, start_date, end_date):
+        return not self.conflicts(property_id, start_date, end_date)
+
+    def bookings(self, property_id):
+        """The property's current and future stays, in date order."""
+        with self._lock:
+            stays = list(self._stays.get(property_id, []))
+        return [(date.fromordinal(s), date.fromordinal(e)) for s, e in stays]
+
+    def busy(self, start_date, end_date):
+        """Sorted array of property_ids with a stay overlapping [start_date, end_date)."""
+        start, end = _day(start_date), _day(end_date)
+        with self._lock:
+            # Only the stays sorted before `limit` start before the range ends.
+            limit = int(np.searchsorted(self._start, end, side='left'))
+            found = [np.zeros(0, dtype=np.int64)]
+            if limit:
+                tree, leaves = self._tree, self._leaves
+                nodes = np.array([1] if tree[1] > start else [], dtype=np.int64)
+                width = leaves
+                while width > 1:
+                    width //= 2
+                    children = np.concatenate([2 * nodes, 2 * nodes + 1])
+                    # Keep subtrees whose first stay is in range and whose
+                    # latest end date is after the range starts.
+                    first = children * width - leaves
+                    nodes = children[(first < limit) & (tree[children] > start)]
+                found.append(self._property_id[nodes - leaves])
+            found.append(np.array([property_id for s, e, property_id in self._tail if s < end and e > start],
+                                  dtype=np.int64))
+            return np.unique(np.concatenate(found))
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(stays) for stays in self._stays.values())
@@ -0,0 +1,227 @@
+"""Run menu operations from a JSON lines file, without prompts.
+
+Each input line is one operation object with an ``op`` field and that
+operation's arguments; an optional ``id`` is copied to the result:
+
+    {"op": "signup", "email": "a@example.com", "password": "pw", "first_name": "A", "last_name": "B", "phone": "555-0101"}
+    {"op": "login", "email": "a@example.com", "password": "pw"}
+    {"op": "profile", "email": "a@example.com"}
+    {"op": "update_profile", "user_id": 7, "phone": "555-0199", "new_email": "b@example.com"}
+    {"op": "register_tenant", "user_id": 7}
+    {"op": "search", "city": "Boston", "max_price": 2000, "page_size": 20}
+    {"op": "text_search", "q": "beacon st bostn", "limit": 10}
+    {"op": "similar", "property_id": 42, "limit": 5}
+    {"op": "availability", "property_id": 42, "available_from": "2026-06-01", "available_to": "2026-09-01"}
+    {"op": "my_rentals", "user_id": 7}
+    {"op": "save_search", "user_id": 7, "name": "Cheap Boston", "city": "Boston", "max_price": 1500}
+    {"op": "notifications", "user_id": 7, "limit": 20}
+    {"op": "brokers", "q": "smi", "page_size": 10}
+    {"op": "market", "kind": "city", "name": "Boston, MA"}
+    {"op": "rent", "user_id": 7, "property_id": 42, "start_date": "2026-07-01", "contract_length": 12, "broker_id": 3, "broker_fee": 500}
+
+Operations that act for a user take ``user_id`` or ``email``. Operations are
+spread over --workers threads by that user (or by email for signup/login),
+so one user's operations run in file order; refer to each user the same way
+throughout a file. Every worker commits once per --commit-every operations,
+with each operation in its own savepoint so a failed one only undoes itself.
+The listing indexes are built at startup as the server builds them (see
+listings.load_listing_indexes), so searches take the same paths.
+
+The result file has one JSON line per input line, in input order:
+
+    {"line": 1, "op": "signup", "ok": true, "result": {"user_id": 1001}}
+    {"line": 2, "op": "login", "ok": false, "error": "Incorrect password. Please try again."}
+
+    python batch.py operations.jsonl results.jsonl --workers 8
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+import pymysql
+
+from db import create_pool
+from listings import load_listing_indexes
+from operations import Operations
+from passwords import close_hash_pool, start_hash_pool
+from render import json_default
+from write_behind import last_login_buffer
+
+# Errors after which the database may have discarded the whole transaction
+# (deadlock, lost connection, SQLite busy), not just the failing operation.
+TRANSACTION_ERRORS = (pymysql.err.OperationalError, sqlite3.OperationalError)
+
+
+class TransactionLost(Exception):
+    """The batch's open transaction failed and must be replayed."""
+
+
+class BatchConnection:
+    """A pooled connection whose commits are deferred to the end of the batch.
+
+    Business functions call commit() and rollback() as usual: commit() is a
+    no-op until the worker flushes, and rollback() only undoes the current
+    operation's savepoint. Work meant for after a commit (cache.after_commit:
+    cache invalidation, in-memory index updates) is queued until the batch
+    really commits, and an operation's share is dropped with its savepoint.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.pending = []
+        self._mark = 0
+
+    def begin_operation(self):
+        self.conn.cursor().execute("SAVEPOINT batch_op")
+        self._mark = len(self.pending)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.conn.cursor().execute("ROLLBACK TO SAVEPOINT batch_op")
+        del self.pending[self._mark:]
+
+    def defer(self, callback, *args):
+        self.pending.append((callback, args))
+
+    def run_pending(self):
+        pending, self.pending = self.pending, []
+        for callback, args in pending:
+            callback(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def shard_key(op):
+    """Operations with the same key run on the same worker, in file order."""
+    for name in ('user_id', 'email'):
+        if op.get(name) is not None:
+            return str(op[name]).lower()
+    return None
+
+
+class BatchRunner:
+    def __init__(self, pool, operations, commit_every=100):
+        self.pool = pool
+        self.operations = operations
+        self.commit_every = commit_every
+
+    def execute(self, batch_conn, op):
+        handler = self.operations.get(op.get('op'))
+        if handler is None:
+            return {'ok': False, 'error': f"Unknown operation {op.get('op')!r}."}
+        batch_conn.begin_operation()
+        try:
+            return {'ok': True, 'result': handler(batch_conn, op)}
+        except TRANSACTION_ERRORS as e:
+            raise TransactionLost(str(e)) from e
+        except Exception as e:
+            batch_conn.rollback()
+            return {'ok': False, 'error': str(e)}
+
+    def run_batch(self, conn, items):
+        """Run (line, op) pairs in one transaction; returns [(line, outcome)]."""
+        batch_conn = BatchConnection(conn)
+        try:
+            outcomes = [(line, self.execute(batch_conn, op)) for line, op in items]
+            conn.commit()
+        except (TransactionLost, *TRANSACTION_ERRORS) as e:
+            # The queued after-commit work goes with the lost transaction.
+            conn.rollback()
+            if len(items) == 1:
+                return [(items[0][0], {'ok': False, 'error': str(e)})]
+        else:
+            batch_conn.run_pending()
+            return outcomes
+        # Replay the lost batch one operation per transaction.
+        return [outcome for item in items for outcome in self.run_batch(conn, [item])]
+
+    def run_shard(self, items, results):
+        for start in range(0, len(items), self.commit_every):
+            with self.pool.connection() as conn:
+                for line, outcome in self.run_batch(conn, items[start:start + self.commit_every]):
+                    results[line] = outcome
+
+    def run(self, ops, workers):
+        """Run [(line, op)] pairs; returns {line: outcome}."""
+        shards = [[] for _ in range(workers)]
+        for n, (line, op) in enumerate(ops):
+            key = shard_key(op)
+            index = zlib.crc32(key.encode()) % workers if key is not None else n % workers
+            shards[index].append((line, op))
+        results = {}
+        threads = [threading.Thread(target=self.run_shard, args=(shard, results)) for shard in shards if shard]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+
+def read_operations(path):
+    """Return ([(line, op)], {line: outcome}) with unparseable lines as failures."""
+    ops, invalid = [], {}
+    with open(path, encoding='utf-8') as f:
+        for line, text in enumerate(f, 1):
+            if not text.strip():
+                continue
+            try:
+                op = json.loads(text)
+                if not isinstance(op, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                invalid[line] = {'ok': False, 'error': f"Invalid JSON: {e}"}
+                continue
+            ops.append((line, op))
+    return ops, invalid
+
+
+def write_results(path, ops, results):
+    by_line = {line: op for line, op in ops}
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in sorted(results):
+            op = by_line.get(line, {})
+            record = {'line': line, 'op': op.get('op')}
+            if 'id' in op:
+                record['id'] = op['id']
+            record.update(results[line])
+            f.write(json.dumps(record, default=json_default) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('operations', help="JSON lines file of operations")
+    parser.add_argument('results', help="where to write one JSON result line per operation")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--commit-every', type=int, default=100, help="operations per transaction")
+    args = parser.parse_args()
+
+    ops, results = read_operations(args.operations)
+    pool = create_pool(min_size=args.workers, max_size=args.workers + 1)
+    last_logins = last_login_buffer(pool)
+    last_logins.start()
+    start_hash_pool()
+    try:
+        indexes = load_listing_indexes(pool)
+        started = time.perf_counter()
+        runner = BatchRunner(pool, Operations(last_logins, indexes), max(1, args.commit_every))
+        results.update(runner.run(ops, max(1, args.workers)))
+    finally:
+        last_logins.close()
+        close_hash_pool()
+        pool.close()
+    elapsed = time.perf_counter() - started
+
+    write_results(args.results, ops, results)
+    failed = sum(1 for outcome in results.values() if not outcome['ok'])
+    total = len(results)
+    print(f"Ran {total} operations in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} ops/s); {failed} failed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Concurrency benchmark for the booking engine.
+
+Many simulated renters race to book a small set of hot properties from
+today. Each round re-lists the hot properties, lets every renter try to
+book a random one, and then checks that no property was booked twice for
+overlapping dates. Rent rows created by a round are deleted after it, and
+the properties restored at the end.
+
+    python bench_booking.py --renters 64 --hot 5 --rounds 20
+"""
+import argparse
+import random
+import threading
+import time
+
+from booking import BookingRequest, PropertyUnavailable, book_property
+from db import create_pool
+from market import record_vacancy
+
+
+def pick_ids(pool, hot, renters):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        # Properties without current or future stays, so every round starts free.
+        cursor.execute("""
+            SELECT p.property_id, p.for_rent FROM properties p
+            WHERE NOT EXISTS (SELECT 1 FROM rent r WHERE r.property_id = p.property_id
+                              AND r.end_date > CURRENT_DATE)
+            ORDER BY p.property_id LIMIT %s
+        """, (hot,))
+        properties = cursor.fetchall()
+        cursor.execute("SELECT user_id FROM tenant ORDER BY user_id LIMIT %s", (renters,))
+        tenants = [row[0] for row in cursor.fetchall()]
+    if len(properties) < hot or not tenants:
+        raise SystemExit("Not enough properties or tenants; load some listings and tenants first.")
+    return properties, tenants
+
+
+def set_for_rent(conn, for_rent):
+    """Set for_rent per property ({property_id: 0 or 1}), keeping market_stats in step."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT property_id, for_rent FROM properties WHERE property_id IN "
+                   f"({', '.join(['%s'] * len(for_rent))})", list(for_rent))
+    current = dict(cursor.fetchall())
+    for change in (1, -1):
+        record_vacancy(conn, [pid for pid, value in for_rent.items() if value - current[pid] == change], change)
+    cursor.executemany("UPDATE properties SET for_rent = %s WHERE property_id = %s",
+                       [(value, pid) for pid, value in for_rent.items()])
+    conn.commit()
+
+
+def run_round(pool, property_ids, tenants, renters):
+    with pool.connection() as conn:
+        set_for_rent(conn, dict.fromkeys(property_ids, 1))
+
+    start_gate = threading.Barrier(renters)
+    booked = []
+    lost = [0]
+    lock = threading.Lock()
+
+    def renter(n):
+        request = BookingRequest(
+            tenant_id=tenants[n % len(tenants)],
+            property_id=random.choice(property_ids),
+            contract_length=random.randint(1, 12),
+        )
+        with pool.connection() as conn:
+            start_gate.wait()
+            try:
+                rent_id = book_property(conn, request)
+            except PropertyUnavailable:
+                with lock:
+                    lost[0] += 1
+                return
+        with lock:
+            booked.append((request.property_id, rent_id))
+
+    threads = [threading.Thread(target=renter, args=(n,)) for n in range(renters)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return booked, lost[0], time.perf_counter() - started
+
+
+def release(pool, rent_ids):
+    """Delete the benchmark's bookings so the dates are free again."""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("DELETE FROM rent WHERE rent_id = %s", [(rid,) for rid in rent_ids])
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--renters', type=int, default=32, help="concurrent renters per round")
+    parser.add_argument('--hot', type=int, default=5, help="number of contended properties")
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    pool = create_pool(min_size=args.renters, max_size=args.renters)
+    properties, tenants = pick_ids(pool, args.hot, args.renters)
+    property_ids = [row[0] for row in properties]
+
+    total_booked = 0
+    total_attempts = 0
+    total_time = 0.0
+    double_bookings = 0
+    rent_ids = []
+    try:
+        for _ in range(args.rounds):
+            booked, lost, elapsed = run_round(pool, property_ids, tenants, args.renters)
+            per_property = {}
+            for property_id, rent_id in booked:
+                per_property[property_id] = per_property.get(property_id, 0) + 1
+                rent_ids.append(rent_id)
+            double_bookings += sum(count - 1 for count in per_property.values() if count > 1)
+            total_booked += len(booked)
+            total_attempts += len(booked) + lost
+            total_time += elapsed
+            release(pool, rent_ids)
+            rent_ids = []
+    finally:
+        release(pool, rent_ids)
+        with pool.connection() as conn:
+            set_for_rent(conn, dict(properties))
+        pool.close()
+
+    print(f"Renters per round:    {args.renters}")
+    print(f"Hot properties:       {args.hot}")
+    print(f"Rounds:               {args.rounds}")
+    print(f"Booking attempts:     {total_attempts}")
+    print(f"Successful bookings:  {total_booked}")
+    print(f"Attempts/second:      {total_attempts / total_time:.1f}")
+    print(f"Bookings/second:      {total_booked / total_time:.1f}")
+    print(f"Double bookings:      {double_bookings}")
+    if double_bookings:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
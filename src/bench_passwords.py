@@ -0,0 +1,106 @@
+"""Calibrate the password hashing cost and measure verification throughput.
+
+Finds the largest cost for the chosen scheme (scrypt's n, a power of two,
+or PBKDF2's iteration count) whose median hashing time stays within
+--target-ms on this machine, then verifies --logins passwords from
+--threads concurrent threads, hashing inline and on a pool of
+--workers processes, and reports logins per second for each.
+
+    python bench_passwords.py --scheme scrypt --target-ms 50
+    python bench_passwords.py --scheme pbkdf2_sha256 --target-ms 100 --workers 8
+
+Print the suggested settings and put them in the environment of the
+processes that create accounts (RENTAL_SCRYPT_N or
+RENTAL_PBKDF2_ITERATIONS); existing hashes are upgraded on login.
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+
+from passwords import PasswordHasher, PBKDF2Hasher, ScryptHasher, encode
+
+
+def median_ms(hasher, samples=5):
+    times = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        encode(hasher, 'calibration-password')
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def calibrate(scheme, target_ms):
+    """(hasher, median ms) with the highest cost within target_ms."""
+    if scheme == ScryptHasher.name:
+        best = ScryptHasher(2 ** 10)
+        best_ms = median_ms(best)
+        n = 2 ** 11
+        while n <= 2 ** 20:
+            elapsed = median_ms(ScryptHasher(n))
+            if elapsed > target_ms:
+                break
+            best, best_ms = ScryptHasher(n), elapsed
+            n *= 2
+        return best, best_ms
+    # PBKDF2's time is linear in the iteration count: measure once and scale.
+    probe = PBKDF2Hasher(100000)
+    iterations = max(10000, int(probe.params['iterations'] * target_ms / median_ms(probe)) // 1000 * 1000)
+    hasher = PBKDF2Hasher(iterations)
+    return hasher, median_ms(hasher)
+
+
+def throughput(hasher, stored_hash, logins, threads, workers):
+    """Verifications per second from `threads` threads, on `workers` processes (0: inline)."""
+    passwords = PasswordHasher(hasher, workers=workers)
+    try:
+        passwords.verify('calibration-password', stored_hash)  # start the workers
+        remaining = [logins]
+        lock = threading.Lock()
+
+        def run():
+            while True:
+                with lock:
+                    if remaining[0] == 0:
+                        return
+                    remaining[0] -= 1
+                if not passwords.verify('calibration-password', stored_hash):
+                    raise AssertionError("verification failed")
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=run) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return logins / (time.perf_counter() - started)
+    finally:
+        passwords.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scheme', choices=(ScryptHasher.name, PBKDF2Hasher.name), default=ScryptHasher.name)
+    parser.add_argument('--target-ms', type=float, default=50.0, help="hashing time to aim for per password")
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--threads', type=int, default=16, help="concurrent logins, e.g. the DB pool size")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="hashing processes")
+    args = parser.parse_args()
+
+    hasher, elapsed = calibrate(args.scheme, args.target_ms)
+    print(f"Cost: {hasher.params} takes {elapsed:.1f} ms per hash (target {args.target_ms:.0f} ms).")
+    if args.scheme == ScryptHasher.name:
+        print(f"  RENTAL_PASSWORD_HASHER=scrypt RENTAL_SCRYPT_N={hasher.params['n']}")
+    else:
+        print(f"  RENTAL_PASSWORD_HASHER=pbkdf2_sha256 RENTAL_PBKDF2_ITERATIONS={hasher.params['iterations']}")
+
+    stored_hash = encode(hasher, 'calibration-password')
+    for workers in (0, args.workers):
+        rate = throughput(hasher, stored_hash, args.logins, args.threads, workers)
+        where = f"{workers} worker processes" if workers else "inline"
+        print(f"Verification, {args.threads} threads, {where}: {rate:.1f} logins/s")
+
+
+if __name__ == "__main__":
+    main()
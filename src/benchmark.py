@@ -0,0 +1,215 @@
+"""End-to-end benchmark of the rental system's core operations.
+
+Drives login, signup, property search, my-rentals and rent through the same
+functions the menu uses, from several worker threads against a database
+populated by datagen.py, and reports throughput and p50/p95/p99 latency
+per operation.
+
+    python datagen.py --scale 100000 --truncate
+    python benchmark.py --workers 8 --duration 30 --json results.json
+    python benchmark.py --workers 8 --duration 30 --baseline results.json
+
+With --baseline, the run fails if any operation's p95 latency is more than
+--tolerance (default 20%) worse than the baseline's. The benchmark writes
+to the database (signups, bookings), so run it against a scratch copy.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+
+from booking import BookingRequest, PropertyUnavailable, book_property
+from datagen import CITIES, is_tenant
+from db import create_pool
+from main import authenticate, create_account, fetch_rentals, search_properties_page
+from passwords import close_hash_pool, start_hash_pool
+from write_behind import last_login_buffer
+
+DEFAULT_MIX = 'login=30,search=40,my_rentals=15,rent=10,signup=5'
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    position = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[position]
+
+
+class Workload:
+    """The benchmark operations; each takes a pooled connection and an RNG."""
+
+    def __init__(self, max_user_id, max_property_id, last_logins):
+        self.max_user_id = max_user_id
+        self.max_property_id = max_property_id
+        self.last_logins = last_logins
+
+    def random_tenant(self, rng):
+        while True:
+            user_id = rng.randint(1, self.max_user_id)
+            if is_tenant(user_id):
+                return user_id
+
+    def login(self, conn, rng):
+        user_id = rng.randint(1, self.max_user_id)
+        authenticate(conn, f"user{user_id}@example.com", f"password{user_id}", self.last_logins)
+
+    def signup(self, conn, rng):
+        token = uuid.uuid4().hex
+        create_account(conn, f"bench-{token}@example.com", 'benchmark', 'Bench', 'User', f"b-{token[:24]}")
+
+    def search(self, conn, rng):
+        filters = {'city': None, 'state': None, 'min_price': None, 'max_price': None,
+                   'min_sqft': None, 'min_rooms': None}
+        if rng.random() < 0.7:
+            filters['city'], filters['state'] = rng.choice(CITIES)
+        if rng.random() < 0.5:
+            filters['min_price'] = rng.randrange(300, 2000, 50)
+            filters['max_price'] = filters['min_price'] + rng.randrange(200, 2000, 50)
+        if rng.random() < 0.3:
+            filters['min_rooms'] = rng.randint(1, 3)
+        search_properties_page(conn, filters, page_size=20)
+
+    def my_rentals(self, conn, rng):
+        fetch_rentals(conn, self.random_tenant(rng))
+
+    def rent(self, conn, rng):
+        request = BookingRequest(
+            tenant_id=self.random_tenant(rng),
+            property_id=rng.randint(1, self.max_property_id),
+            contract_length=rng.randint(1, 12),
+        )
+        try:
+            book_property(conn, request)
+        except PropertyUnavailable:
+            # Losing the race (or picking a rented listing) is a normal outcome.
+            pass
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def run(pool, workload, mix, workers, duration, seed):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            operation = getattr(workload, name)
+            started = time.perf_counter()
+            try:
+                with pool.connection() as conn:
+                    operation(conn, rng)
+            except Exception:
+                local_errors[name] += 1
+            local[name].append((time.perf_counter() - started) * 1000)
+        with lock:
+            for name in names:
+                latencies[name].extend(local[name])
+                errors[name] += local_errors[name]
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for name in names:
+        values = sorted(latencies[name])
+        results[name] = {
+            'count': len(values),
+            'errors': errors[name],
+            'ops_per_sec': len(values) / elapsed,
+            'p50_ms': percentile(values, 0.50),
+            'p95_ms': percentile(values, 0.95),
+            'p99_ms': percentile(values, 0.99),
+        }
+    return results, elapsed
+
+
+def compare(results, baseline, tolerance):
+    """Return the operations whose p95 regressed beyond tolerance."""
+    regressions = []
+    for name, stats in results.items():
+        before = baseline.get('operations', {}).get(name)
+        if before and before['p95_ms'] > 0 and stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append((name, before['p95_ms'], stats['p95_ms']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="write results to this file")
+    parser.add_argument('--baseline', help="fail if p95 latency regressed against this results file")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    pool = create_pool(min_size=args.workers, max_size=args.workers)
+    last_logins = last_login_buffer(pool)
+    last_logins.start()
+    start_hash_pool()
+    try:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            # Only generated users have a known password; signups from
+            # earlier runs are numbered after them.
+            cursor.execute("SELECT MAX(user_id) FROM user WHERE email LIKE 'user%@example.com'")
+            max_user_id = cursor.fetchone()[0]
+            cursor.execute("SELECT MAX(property_id) FROM properties")
+            max_property_id = cursor.fetchone()[0]
+        if not max_user_id or not max_property_id:
+            raise SystemExit("The database is empty; load it with datagen.py first.")
+
+        workload = Workload(max_user_id, max_property_id, last_logins)
+        results, elapsed = run(pool, workload, parse_mix(args.mix), args.workers, args.duration, args.seed)
+    finally:
+        last_logins.close()
+        close_hash_pool()
+        pool.close()
+
+    total = sum(stats['count'] for stats in results.values())
+    print(f"{'operation':<12}{'count':>9}{'errors':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in results.items():
+        print(f"{name:<12}{stats['count']:>9}{stats['errors']:>8}{stats['ops_per_sec']:>10.1f}"
+              f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+    print(f"{total} operations in {elapsed:.1f}s ({total / elapsed:.1f} ops/s) with {args.workers} workers.")
+
+    report = {'workers': args.workers, 'duration': elapsed, 'mix': args.mix, 'operations': results}
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: p95 {before:.2f} ms -> {after:.2f} ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
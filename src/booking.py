@@ -0,0 +1,135 @@
+import calendar
+import random
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+import pymysql
+
+from cache import invalidate
+from market import record_vacancy
+
+# MySQL error codes worth retrying: deadlock found, lock wait timeout.
+RETRYABLE_ERRORS = (1213, 1205)
+
+
+class BookingError(Exception):
+    """Base class for bookings that could not be completed."""
+
+
+class PropertyUnavailable(BookingError):
+    """The property does not exist or is already booked for part of the stay."""
+
+
+def add_months(start, months):
+    """The same day `months` calendar months later, clamped to the month's end."""
+    month = start.month - 1 + months
+    year, month = start.year + month // 12, month % 12 + 1
+    return date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+
+@dataclass
+class BookingRequest:
+    """Everything needed to book a property, collected before any write."""
+    tenant_id: int
+    property_id: int
+    contract_length: int
+    broker_id: Optional[int] = None
+    broker_fee: Optional[float] = None
+    start_date: Optional[date] = None
+
+    @property
+    def end_date(self):
+        """First day after the stay; stays are [start_date, end_date)."""
+        return add_months(self.start_date, self.contract_length)
+
+
+# Locks the property row, so bookings of one property are serialized.
+LOCK_PROPERTY = "SELECT for_rent FROM properties WHERE property_id = %s FOR UPDATE"
+
+# Any stay overlapping [start, end); a range probe on rent's (property_id, end_date, start_date) index.
+OVERLAPPING_STAY = """
+    SELECT start_date, end_date FROM rent
+    WHERE property_id = %s AND end_date > %s AND start_date < %s
+    ORDER BY end_date
+    LIMIT 1
+"""
+
+# for_rent means "vacant today"; a stay that has begun takes the listing off the market.
+OCCUPY_PROPERTY = "UPDATE properties SET for_rent = 0 WHERE property_id = %s"
+
+INSERT_RENT = """
+    INSERT INTO rent (tenant_id, property_id, contract_length, price, broker_fee, broker_id, start_date, end_date)
+    SELECT %s, property_id, %s, price, %s, %s, %s, %s
+    FROM properties
+    WHERE property_id = %s
+"""
+
+LINK_BROKER = """
+    INSERT INTO broker_tenant (broker_id, tenant_id)
+    SELECT %s, %s FROM DUAL
+    WHERE NOT EXISTS (
+        SELECT 1 FROM broker_tenant WHERE broker_id = %s AND tenant_id = %s
+    )
+"""
+
+
+def _book_once(conn, request):
+    cursor = conn.cursor()
+    # Lock the property before checking for overlaps, so two renters racing
+    # for the same dates cannot both see them free.
+    cursor.execute(LOCK_PROPERTY, (request.property_id,))
+    row = cursor.fetchone()
+    if row is None:
+        raise PropertyUnavailable(f"Property {request.property_id} does not exist.")
+    cursor.execute(OVERLAPPING_STAY, (request.property_id, request.start_date, request.end_date))
+    stay = cursor.fetchone()
+    if stay is not None:
+        raise PropertyUnavailable(
+            f"Property {request.property_id} is already booked from {stay[0]} to {stay[1]}.")
+
+    cursor.execute(INSERT_RENT, (
+        request.tenant_id, request.contract_length, request.broker_fee, request.broker_id,
+        request.start_date, request.end_date, request.property_id,
+    ))
+    rent_id = cursor.lastrowid
+    occupied = request.start_date <= date.today() and row[0]
+    if occupied:
+        cursor.execute(OCCUPY_PROPERTY, (request.property_id,))
+
+    if request.broker_id:
+        cursor.execute(LINK_BROKER, (request.broker_id, request.tenant_id,
+                                     request.broker_id, request.tenant_id))
+    if occupied:
+        # Last, so the area's market_stats rows stay locked only until the commit
+        record_vacancy(conn, [request.property_id], -1)
+    conn.commit()
+    return rent_id
+
+
+def book_property(conn, request, retries=3, backoff=0.05):
+    """Book a property in one short transaction and return the new rent_id.
+
+    Raises PropertyUnavailable if the property is already booked for any
+    part of the stay. Deadlocks and lock wait timeouts are retried with
+    jittered exponential backoff.
+    """
+    if request.start_date is None:
+        request.start_date = date.today()
+    attempt = 0
+    while True:
+        try:
+            rent_id = _book_once(conn, request)
+            break
+        except pymysql.err.OperationalError as e:
+            conn.rollback()
+            if e.args[0] not in RETRYABLE_ERRORS or attempt >= retries:
+                raise
+            attempt += 1
+            time.sleep(backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+        except Exception:
+            conn.rollback()
+            raise
+    invalidate(conn, 'properties', 'rent', 'broker_tenant')
+    return rent_id
@@ -0,0 +1,119 @@
+"""Broker lookup, prefix search and paging for the rent flow.
+
+``BrokerDirectory`` keeps the broker table in memory so picking a broker
+does not query for every keystroke or page.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+
+Broker = namedtuple('Broker', 'broker_id first_name last_name phone email tenants')
+
+# Every broker with the number of tenants linked to them.
+BROKER_QUERY = """
+    SELECT b.broker_id, b.first_name, b.last_name, b.phone, b.email, COUNT(bt.tenant_id)
+    FROM broker b
+    LEFT JOIN broker_tenant bt ON b.broker_id = bt.broker_id
+"""
+BROKER_GROUP = " GROUP BY b.broker_id, b.first_name, b.last_name, b.phone, b.email"
+
+
+class BrokerDirectory:
+    """Cached directory of brokers for picking one when renting.
+
+    Holds every broker by id, for O(1) lookups, and sorted name keys
+    (first name, last name and "first last", lower-cased) for prefix
+    search by bisection. Brokers are listed a page at a time in last,
+    first name order, with the tenant counts from broker_tenant.
+
+    The directory loads on first use and reloads after ``ttl`` seconds; a
+    broker added since is looked up on its own. tenant_linked() keeps a
+    broker's count current after a booking.
+    """
+
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._keys = []
+        self._key_ids = []
+        self._order = []
+        self._loaded_at = None
+
+    def load(self, rows):
+        """Replace the directory with BROKER_QUERY rows."""
+        brokers = [Broker(*row) for row in rows]
+        entries = sorted((key, broker.broker_id) for broker in brokers
+                         for key in {broker.first_name.lower(), broker.last_name.lower(),
+                                     f"{broker.first_name} {broker.last_name}".lower()})
+        order = [broker.broker_id for broker in
+                 sorted(brokers, key=lambda b: (b.last_name.lower(), b.first_name.lower(), b.broker_id))]
+        with self._lock:
+            self._by_id = {broker.broker_id: broker for broker in brokers}
+            self._keys = [key for key, _ in entries]
+            self._key_ids = [broker_id for _, broker_id in entries]
+            self._order = order
+            self._loaded_at = time.monotonic()
+
+    def build(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(BROKER_QUERY + BROKER_GROUP)
+        self.load(cursor.fetchall())
+        return len(self)
+
+    def _current(self, conn):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            self.build(conn)
+
+    def get(self, conn, broker_id):
+        """The Broker with this id, or None."""
+        self._current(conn)
+        broker = self._by_id.get(broker_id)
+        if broker is None:
+            # Added since the directory was loaded?
+            cursor = conn.cursor()
+            cursor.execute(BROKER_QUERY + " WHERE b.broker_id = %s" + BROKER_GROUP, (broker_id,))
+            row = cursor.fetchone()
+            if row is not None:
+                broker = self._by_id[broker_id] = Broker(*row)
+        return broker
+
+    def search(self, conn, prefix, offset=0, limit=10):
+        """Brokers whose first name, last name or full name starts with prefix.
+
+        Returns (brokers, more) for the page at offset, in order of the
+        matching name.
+        """
+        self._current(conn)
+        prefix = prefix.strip().lower()
+        with self._lock:
+            keys, key_ids, by_id = self._keys, self._key_ids, self._by_id
+        found, seen = [], set()
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix) and len(found) <= offset + limit:
+            if key_ids[i] not in seen:
+                seen.add(key_ids[i])
+                found.append(by_id[key_ids[i]])
+            i += 1
+        return found[offset:offset + limit], len(found) > offset + limit
+
+    def page(self, conn, offset=0, limit=10):
+        """(brokers, more) for one page of the whole directory, by name."""
+        self._current(conn)
+        with self._lock:
+            ids, by_id = self._order[offset:offset + limit + 1], self._by_id
+        return [by_id[broker_id] for broker_id in ids[:limit]], len(ids) > limit
+
+    def tenant_linked(self, conn, broker_id):
+        """Re-count a broker's tenants after a booking may have linked a new one."""
+        broker = self._by_id.get(broker_id)
+        if broker is None:
+            return
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM broker_tenant WHERE broker_id = %s", (broker_id,))
+        self._by_id[broker_id] = broker._replace(tenants=cursor.fetchone()[0])
+
+    def __len__(self):
+        with self._lock:
+            return len(self._by_id)
@@ -0,0 +1,134 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_WHITESPACE = re.compile(r'\s+')
+_TABLES = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+`?(\w+)`?', re.IGNORECASE)
+
+
+def normalize_sql(sql):
+    """Collapse whitespace so differently formatted copies of a query share a key."""
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def tables_in(sql):
+    """Lower-cased names of the tables a statement reads or writes."""
+    return frozenset(name.lower() for name in _TABLES.findall(sql))
+
+
+class QueryCache:
+    """In-process LRU cache of query results with a TTL and a size bound.
+
+    Entries are keyed by normalized SQL plus parameters and remember which
+    tables the query touched, so a write can drop every cached result that
+    depends on the tables it changed.
+    """
+
+    def __init__(self, max_entries=1024, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(sql, params=None):
+        return normalize_sql(sql), tuple(params or ())
+
+    def get(self, key):
+        """Return the cached rows for key, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, _, rows = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rows
+
+    def set(self, key, rows, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires, tables_in(key[0]), rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *tables):
+        """Drop cached results that read any of the given tables (all if none given)."""
+        tables = {table.lower() for table in tables}
+        with self._lock:
+            if not tables:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                stale = [key for key, (_, used, _) in self._entries.items() if used & tables]
+                for key in stale:
+                    del self._entries[key]
+                dropped = len(stale)
+            self.invalidations += dropped
+            return dropped
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+def cached_fetchall(conn, sql, params=None, ttl=None):
+    """fetchall() through the connection's query cache, if it has one."""
+    cache = getattr(conn, 'cache', None)
+    if cache is not None:
+        key = cache.key(sql, params)
+        rows = cache.get(key)
+        if rows is not None:
+            return rows
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    rows = tuple(cursor.fetchall())
+    if cache is not None:
+        cache.set(key, rows, ttl)
+    return rows
+
+
+def cached_fetchone(conn, sql, params=None, ttl=None):
+    rows = cached_fetchall(conn, sql, params, ttl)
+    return rows[0] if rows else None
+
+
+def after_commit(conn, callback, *args):
+    """Call callback(*args) once conn's writes are committed.
+
+    That is now, unless conn defers its commits (batch.BatchConnection),
+    which queues the call until the real commit and drops it if the work
+    is rolled back instead.
+    """
+    defer = getattr(conn, 'defer', None)
+    if defer is not None:
+        defer(callback, *args)
+    else:
+        callback(*args)
+
+
+def invalidate(conn, *tables):
+    """Tell the connection's query cache that a committed write changed these tables."""
+    cache = getattr(conn, 'cache', None)
+    if cache is not None:
+        after_commit(conn, cache.invalidate, *tables)
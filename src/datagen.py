@@ -0,0 +1,235 @@
+"""Seeded synthetic data generator for benchmarking.
+
+Fills an empty (or --truncate'd) database with users, auth records, role
+tables, brokers, neighborhoods, properties and rentals. ``--scale`` is the
+number of users and properties; every other table is sized from it:
+
+    users, user_auth, properties   scale
+    landlords                      scale / 20   (every 20th user)
+    tenants                        60% of users (user_id % 5 in 1..3)
+    us_citizen / students          ~70% / ~30% of users
+    brokers                        scale / 200
+    neighborhoods                  scale / 100, between 5 and 1000
+    rentals                        scale / 4    (every 4th property)
+
+market_stats is then rebuilt from the generated listings.
+
+The same seed always produces the same data, and every user can log in
+as user<id>@example.com with password ``password<id>``.
+
+    python datagen.py --scale 100000 --truncate
+"""
+import argparse
+import hashlib
+import random
+import time
+from datetime import date, timedelta
+
+from booking import add_months
+from db import create_pool
+from market import rebuild
+
+CITIES = [
+    ('Boston', 'MA'), ('Cambridge', 'MA'), ('Somerville', 'MA'), ('Brookline', 'MA'),
+    ('New York', 'NY'), ('Brooklyn', 'NY'), ('Jersey City', 'NJ'), ('Philadelphia', 'PA'),
+    ('Providence', 'RI'), ('Hartford', 'CT'), ('Chicago', 'IL'), ('Seattle', 'WA'),
+    ('San Jose', 'CA'), ('Oakland', 'CA'), ('Austin', 'TX'), ('Denver', 'CO'),
+]
+STREETS = ['Pine Street', 'Maple Avenue', 'Elm Road', 'Cedar Lane', 'Birch Boulevard',
+           'Willow Street', 'Chestnut Lane', 'Beacon Street', 'Harvard Road', 'Huntington Avenue',
+           'Commonwealth Avenue', 'Tremont Street', 'Boylston Street', 'Washington Street']
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Riley', 'Casey', 'Jamie',
+               'Avery', 'Quinn', 'Priya', 'Wei', 'Carlos', 'Fatima', 'Noah', 'Mia']
+LAST_NAMES = ['Smith', 'Chen', 'Patel', 'Garcia', 'Kim', 'Nguyen', 'Brown', 'Lopez',
+              'Singh', 'Murphy', 'Cohen', 'Okafor', 'Rossi', 'Silva', 'Wong', 'Khan']
+NEIGHBORHOOD_WORDS = (['Back', 'North', 'South', 'West', 'East', 'Old', 'Upper', 'Lower'],
+                      ['Bay', 'End', 'Hill', 'Square', 'Park', 'Point', 'Village', 'Harbor'])
+
+TABLES = ('rent', 'property_neighborhood', 'properties', 'neighborhood', 'broker_tenant', 'broker',
+          'student', 'international_student', 'us_citizen', 'tenant', 'landlord', 'user', 'user_auth')
+
+
+def is_landlord(user_id):
+    return user_id % 20 == 0
+
+
+def is_tenant(user_id):
+    return user_id % 5 in (1, 2, 3)
+
+
+def property_is_rented(property_id):
+    return property_id % 4 == 0
+
+
+def rental_is_current(property_id):
+    # Two thirds of rentals are still running; the rest have ended.
+    return (property_id // 4) % 3 != 0
+
+
+def users(rng, count):
+    for user_id in range(1, count + 1):
+        # Legacy SHA-256 hashes: a work-factor KDF would take hours at scale.
+        # Each one is upgraded on the user's first login.
+        salt = '%032x' % rng.getrandbits(128)
+        password_hash = hashlib.sha256((salt + f"password{user_id}").encode()).hexdigest()
+        email = f"user{user_id}@example.com"
+        yield ('user_auth', (user_id, email, password_hash, salt))
+        yield ('user', (user_id, user_id, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                        f"555-{user_id:07d}", email))
+        if is_landlord(user_id):
+            yield ('landlord', (user_id,))
+        if is_tenant(user_id):
+            yield ('tenant', (user_id,))
+        roll = rng.random()
+        if roll < 0.7:
+            yield ('us_citizen', (user_id, f"{user_id:09d}"))
+            if roll < 0.2:
+                yield ('student', (user_id, 'PDF'))
+        elif roll < 0.8:
+            yield ('international_student', (user_id, f"P{user_id:08d}"))
+            yield ('student', (user_id, 'PDF'))
+
+
+def random_tenant(rng, user_count):
+    while True:
+        user_id = rng.randint(1, user_count)
+        if is_tenant(user_id):
+            return user_id
+
+
+def listings(rng, count, user_count, neighborhood_count, broker_count):
+    landlords = max(1, user_count // 20)
+    today = date.today()
+    for property_id in range(1, count + 1):
+        city, state = rng.choice(CITIES)
+        square_foot = rng.randint(250, 2500)
+        rooms = max(1, min(6, square_foot // 400 + rng.randint(-1, 1)))
+        price = round(square_foot * rng.uniform(1.2, 3.5), -1)
+        rented = property_is_rented(property_id)
+        current = rented and rental_is_current(property_id)
+        yield ('properties', (property_id, 20 * rng.randint(1, landlords), rng.randint(1, 999),
+                              rng.choice(STREETS), city, state, rng.randint(1000, 99999),
+                              rng.randint(1, 60), square_foot, price, rooms, 0 if current else 1))
+        yield ('property_neighborhood', (property_id, rng.randint(1, neighborhood_count)))
+        if rented:
+            months = rng.randint(1, 12)
+            if current:
+                start = today - timedelta(days=rng.randint(0, 28 * months - 1))
+            else:
+                start = today - timedelta(days=31 * months + rng.randint(1, 720))
+            tenant_id = random_tenant(rng, user_count)
+            broker_id = rng.randint(1, broker_count) if rng.random() < 0.3 else None
+            fee = round(price * 0.5, 2) if broker_id else None
+            yield ('rent', (property_id // 4, tenant_id, property_id, months, price, fee, broker_id,
+                            start, add_months(start, months)))
+            if broker_id:
+                yield ('broker_tenant', (broker_id, tenant_id))
+
+
+INSERTS = {
+    'user_auth': "INSERT INTO user_auth (auth_id, username, password_hash, salt) VALUES (%s, %s, %s, %s)",
+    'user': "INSERT INTO user (user_id, auth_id, first_name, last_name, phone, email) VALUES (%s, %s, %s, %s, %s, %s)",
+    'landlord': "INSERT INTO landlord (user_id) VALUES (%s)",
+    'tenant': "INSERT INTO tenant (user_id) VALUES (%s)",
+    'us_citizen': "INSERT INTO us_citizen (user_id, ssn) VALUES (%s, %s)",
+    'international_student': "INSERT INTO international_student (user_id, passport_id) VALUES (%s, %s)",
+    'student': "INSERT INTO student (user_id, transcript) VALUES (%s, %s)",
+    'broker': "INSERT INTO broker (broker_id, first_name, last_name, phone, email) VALUES (%s, %s, %s, %s, %s)",
+    'broker_tenant': "INSERT IGNORE INTO broker_tenant (broker_id, tenant_id) VALUES (%s, %s)",
+    'neighborhood': "INSERT INTO neighborhood (neighborhood_id, name) VALUES (%s, %s)",
+    'properties': ("INSERT INTO properties (property_id, landlord_id, street_number, street_name, city, state, "
+                   "zip, room_number, square_foot, price, room_amount, for_rent) "
+                   "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"),
+    'property_neighborhood': "INSERT INTO property_neighborhood (property_id, neighborhood_id) VALUES (%s, %s)",
+    'rent': ("INSERT INTO rent (rent_id, tenant_id, property_id, contract_length, price, broker_fee, broker_id, "
+             "start_date, end_date) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"),
+}
+
+
+class BatchWriter:
+    """Buffer generated rows per table and write them with executemany."""
+
+    def __init__(self, conn, batch_size):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.batch_size = batch_size
+        self.pending = {}
+        self.counts = {}
+
+    def add(self, table, row):
+        rows = self.pending.setdefault(table, [])
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush(table)
+
+    def flush(self, table=None):
+        for name in ([table] if table else list(self.pending)):
+            rows = self.pending.get(name)
+            if rows:
+                self.cursor.executemany(INSERTS[name], rows)
+                self.counts[name] = self.counts.get(name, 0) + len(rows)
+                self.pending[name] = []
+        self.conn.commit()
+
+
+def generate(conn, scale, seed=42, batch_size=5000, truncate=False):
+    """Populate the database; returns {table: rows written}."""
+    rng = random.Random(seed)
+    cursor = conn.cursor()
+    cursor.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+    if truncate:
+        for table in TABLES:
+            cursor.execute(f"TRUNCATE TABLE {table}")
+
+    broker_count = max(1, scale // 200)
+    neighborhood_count = max(5, min(1000, scale // 100))
+    writer = BatchWriter(conn, batch_size)
+
+    for broker_id in range(1, broker_count + 1):
+        writer.add('broker', (broker_id, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                              f"555-9{broker_id:06d}", f"broker{broker_id}@example.com"))
+    names = set()
+    for neighborhood_id in range(1, neighborhood_count + 1):
+        first, second = NEIGHBORHOOD_WORDS
+        name = f"{rng.choice(first)} {rng.choice(second)}"
+        if name in names:
+            name = f"{name} {neighborhood_id}"
+        names.add(name)
+        writer.add('neighborhood', (neighborhood_id, name))
+    for table, row in users(rng, scale):
+        writer.add(table, row)
+    for table, row in listings(rng, scale, scale, neighborhood_count, broker_count):
+        writer.add(table, row)
+    writer.flush()
+
+    cursor.execute("SET SESSION unique_checks = 1, foreign_key_checks = 1")
+    conn.commit()
+    rebuild(conn)
+    return writer.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=1000, help="number of users and properties (10^3 to 10^7)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--truncate', action='store_true', help="empty every table first")
+    args = parser.parse_args()
+
+    pool = create_pool(replicas=(), min_size=1, max_size=1)
+    started = time.perf_counter()
+    try:
+        with pool.connection() as conn:
+            counts = generate(conn, args.scale, args.seed, args.batch_size, args.truncate)
+    finally:
+        pool.close()
+    elapsed = time.perf_counter() - started
+
+    total = sum(counts.values())
+    for table in reversed(TABLES):
+        print(f"{table:<24}{counts.get(table, 0):>12}")
+    print(f"Wrote {total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,562 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, nullcontext
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+
+import sqlite_backend
+from instrument import InstrumentedCursor
+
+# 'mysql' (the default) or 'sqlite' for a single-file embedded database.
+BACKENDS = ('mysql', 'sqlite')
+
+
+def load_config():
+    """Read database settings from the environment, falling back to the local defaults."""
+    return {
+        'host': os.environ.get('RENTAL_DB_HOST', 'localhost'),
+        'port': int(os.environ.get('RENTAL_DB_PORT', '3306')),
+        'database': os.environ.get('RENTAL_DB_NAME', 'rental_system'),
+        'user': os.environ.get('RENTAL_DB_USER', 'root'),
+        'password': os.environ.get('RENTAL_DB_PASSWORD', 'red'),
+        'charset': 'utf8mb4',
+        'cursorclass': pymysql.cursors.Cursor,
+    }
+
+
+def load_backend():
+    backend = os.environ.get('RENTAL_DB_BACKEND', 'mysql').lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"RENTAL_DB_BACKEND must be one of {', '.join(BACKENDS)}, not {backend!r}.")
+    return backend
+
+
+def load_replicas():
+    """Replica addresses from RENTAL_DB_REPLICAS, comma-separated.
+
+    For MySQL each is host or host:port (same database and credentials as
+    the primary); for SQLite each is a database file, opened read-only.
+    """
+    return [entry.strip() for entry in os.environ.get('RENTAL_DB_REPLICAS', '').split(',') if entry.strip()]
+
+
+def _pool(backend, config, **kwargs):
+    if backend == 'sqlite':
+        return ConnectionPool(config=config, connect=sqlite_backend.connect, backend=backend, **kwargs)
+    return ConnectionPool(config=config, backend=backend, **kwargs)
+
+
+def create_pool(backend=None, config=None, replicas=None, **kwargs):
+    """Build a ConnectionPool for the configured backend.
+
+    SQLite databases live in the file named by RENTAL_SQLITE_PATH
+    (default rental_system.db); ``config`` only applies to MySQL. With
+    replicas (default: load_replicas()) the result is a RoutedPool over the
+    primary and one pool per replica; pass ``replicas=()`` for tools that
+    must only talk to the primary.
+    """
+    backend = backend or load_backend()
+    if backend == 'sqlite':
+        config = {'path': os.environ.get('RENTAL_SQLITE_PATH', 'rental_system.db')}
+    else:
+        config = config or load_config()
+    primary = _pool(backend, config, **kwargs)
+    replicas = load_replicas() if replicas is None else replicas
+    if not replicas:
+        return primary
+
+    # Replicas share the instrumentation but not the query cache, which the
+    # router serves from the primary pool. They connect on first use so one
+    # that is down does not stop startup.
+    replica_kwargs = dict(kwargs, cache=None, min_size=0)
+    replica_pools = []
+    for address in replicas:
+        if backend == 'sqlite':
+            replica_config = {'path': address, 'readonly': True}
+        else:
+            host, _, port = address.partition(':')
+            replica_config = dict(config, host=host, port=int(port or config['port']))
+        replica_pools.append(_pool(backend, replica_config, **replica_kwargs))
+    return RoutedPool(primary, replica_pools,
+                      sticky_seconds=float(os.environ.get('RENTAL_REPLICA_STICKY_SECONDS', '5')))
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection becomes free before the checkout timeout."""
+
+
+class PooledConnection:
+    """A database connection owned by a ConnectionPool."""
+
+    def __init__(self, pool, raw):
+        self.pool = pool
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def cursor(self, cursorclass=None):
+        cursor = self.raw.cursor() if cursorclass is None else self.raw.cursor(cursorclass)
+        if self.pool.metrics is not None:
+            return InstrumentedCursor(cursor, self.pool.metrics)
+        return cursor
+
+    def _timed(self, label, call):
+        if self.pool.metrics is None:
+            return call()
+        started = time.perf_counter()
+        try:
+            return call()
+        finally:
+            self.pool.metrics.record(label, time.perf_counter() - started)
+
+    def commit(self):
+        self._timed("COMMIT", self.raw.commit)
+
+    def rollback(self):
+        self._timed("ROLLBACK", self.raw.rollback)
+
+    @property
+    def cache(self):
+        return self.pool.cache
+
+    @property
+    def open(self):
+        return self.raw.open
+
+    @property
+    def in_transaction(self):
+        if isinstance(self.raw, sqlite_backend.SQLiteConnection):
+            return self.raw.in_transaction
+        return bool(self.raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS)
+
+    def close(self):
+        try:
+            self.raw.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Bounded pool of database connections with health checks and idle reaping.
+
+    At most ``max_size`` connections exist at once. Idle connections are
+    pinged (and transparently reconnected) before being handed out if they
+    have been unused for longer than ``health_check_after`` seconds, and are
+    closed once they have been idle for longer than ``idle_timeout``.
+    """
+
+    def __init__(self, config=None, min_size=1, max_size=8, idle_timeout=300,
+                 health_check_after=30, checkout_timeout=10, connect=None, cache=None,
+                 metrics=None, backend='mysql'):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.config = config or load_config()
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.checkout_timeout = checkout_timeout
+        self._connect = connect or pymysql.connect
+        # Which SQL dialect the connections speak; see create_pool().
+        self.backend = backend
+        # Optional shared query-result cache (see cache.QueryCache).
+        self.cache = cache
+        # Optional per-statement instrumentation (see instrument.Metrics).
+        self.metrics = metrics
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        for _ in range(self.min_size):
+            self._idle.append(self._open())
+            self._size += 1
+
+    def _open(self):
+        return PooledConnection(self, self._connect(**self.config))
+
+    def _discard(self, conn):
+        conn.close()
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _healthy(self, conn):
+        """Ping connections that sat idle for a while, reconnecting dropped ones."""
+        if time.monotonic() - conn.last_used < self.health_check_after:
+            return True
+        try:
+            conn.raw.ping(reconnect=True)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolExhausted("Connection pool is closed.")
+                    if self._idle:
+                        conn = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        # Reserve the slot now and connect outside the lock.
+                        self._size += 1
+                        conn = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolExhausted(
+                            f"No database connection available after {self.checkout_timeout}s "
+                            f"(pool size {self.max_size})."
+                        )
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    return self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            if self._healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn, broken=False):
+        with self._cond:
+            if broken or self._closed or not conn.open:
+                self._discard(conn)
+            else:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, user_id=None):
+        """Check out a connection, rolling back and returning it to the pool afterwards.
+
+        ``user_id`` is only used by RoutedPool and is accepted here so the two
+        are interchangeable.
+        """
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except pymysql.err.OperationalError:
+            broken = True
+            raise
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        else:
+            # Never hand the next borrower a half-finished transaction.
+            if conn.in_transaction:
+                conn.rollback()
+        finally:
+            self.release(conn, broken)
+
+    def reap_idle(self):
+        """Close idle connections past idle_timeout, keeping at least min_size open."""
+        now = time.monotonic()
+        reaped = 0
+        with self._cond:
+            keep = deque()
+            while self._idle:
+                conn = self._idle.popleft()
+                if now - conn.last_used > self.idle_timeout and self._size > self.min_size:
+                    self._discard(conn)
+                    reaped += 1
+                else:
+                    keep.append(conn)
+            self._idle = keep
+        return reaped
+
+    def start_reaper(self, interval=60):
+        """Run reap_idle periodically on a daemon thread."""
+        def run():
+            while not self._closed:
+                time.sleep(interval)
+                self.reap_idle()
+        thread = threading.Thread(target=run, name="pool-reaper", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self._cond:
+            return {'size': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._discard(self._idle.pop())
+            self._cond.notify_all()
+
+
+class AsyncPool:
+    """Await database work from asyncio code without blocking the event loop.
+
+    ``run(fn, *args)`` calls ``fn(conn, *args)`` with a pooled connection on
+    a thread pool sized to the connection pool, so every call that gets a
+    thread also gets a connection without waiting.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._executor = ThreadPoolExecutor(max_workers=pool.max_size, thread_name_prefix='db')
+
+    def _call(self, action, user_id, fn, args):
+        # Executor threads don't inherit the caller's context, so the metrics
+        # action is entered here, on the thread that runs the queries.
+        metrics = self.pool.metrics
+        with metrics.action(action) if metrics and action else nullcontext():
+            with self.pool.connection(user_id=user_id) as conn:
+                return fn(conn, *args)
+
+    async def run(self, fn, *args, action=None, user_id=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, action, user_id, fn, args)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+
+
+# Statements a replica can serve. Locking reads (FOR UPDATE, FOR SHARE,
+# LOCK IN SHARE MODE) and anything else go to the primary.
+_READ_STATEMENT = re.compile(r'^\s*\(?\s*(SELECT|SHOW|EXPLAIN|DESCRIBE|DESC)\b', re.IGNORECASE)
+_LOCKING_READ = re.compile(r'\bFOR\s+(UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b', re.IGNORECASE)
+
+
+def is_read_only(sql):
+    return bool(_READ_STATEMENT.match(sql)) and not _LOCKING_READ.search(sql)
+
+
+class ReplicaCacheView:
+    """A QueryCache whose keys are tagged as read from a replica.
+
+    Entries share the cache's size bound and table invalidation with the
+    primary's, but a lookup never crosses between the two.
+    """
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def key(self, sql, params=None):
+        return self._cache.key(sql, params) + ('replica',)
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+
+class RoutedCursor:
+    """Cursor that sends each statement where its RoutedConnection routes it."""
+
+    def __init__(self, conn, cursorclass=None):
+        self._conn = conn
+        self._cursorclass = cursorclass
+        self._cursor = None
+
+    def execute(self, query, args=None):
+        self._cursor = self._conn.route(query).cursor(self._cursorclass)
+        return self._cursor.execute(query, args)
+
+    def executemany(self, query, args):
+        self._cursor = self._conn.route(query).cursor(self._cursorclass)
+        return self._cursor.executemany(query, args)
+
+    def __getattr__(self, name):
+        if self._cursor is None:
+            raise AttributeError(name)
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._cursor is not None:
+            self._cursor.close()
+
+
+class RoutedConnection:
+    """One unit of work against a primary and its replicas.
+
+    Reads go to a replica until the first write; from then on every
+    statement, reads included, goes to the primary so the work sees its own
+    writes. Work for a user who wrote within the last ``sticky_seconds``
+    starts on the primary. Connections are checked out lazily, on first use.
+    """
+
+    def __init__(self, router, user_id=None):
+        self.router = router
+        self.user_id = user_id
+        self.wrote = False
+        self._stack = ExitStack()
+        self._primary = None
+        self._replica = None
+        if router.is_sticky(user_id):
+            self._writer()
+
+    def _writer(self):
+        if self._primary is None:
+            self._primary = self._stack.enter_context(self.router.primary.connection())
+        return self._primary
+
+    def _reader(self):
+        if self._primary is not None:
+            return self._primary
+        if self._replica is None:
+            for replica in self.router.replicas_in_order():
+                try:
+                    self._replica = self._stack.enter_context(replica.connection())
+                    break
+                except PoolExhausted:
+                    continue
+                except Exception:
+                    self.router.mark_down(replica)
+            else:
+                return self._writer()
+        return self._replica
+
+    def route(self, sql):
+        if is_read_only(sql):
+            return self._reader()
+        self.wrote = True
+        return self._writer()
+
+    def cursor(self, cursorclass=None):
+        return RoutedCursor(self, cursorclass)
+
+    def commit(self):
+        for conn in (self._primary, self._replica):
+            if conn is not None:
+                conn.commit()
+
+    def rollback(self):
+        for conn in (self._primary, self._replica):
+            if conn is not None:
+                conn.rollback()
+
+    @property
+    def cache(self):
+        """The query cache as seen from where this work's reads go.
+
+        Reads served by a replica are cached under their own keys: a lagging
+        replica could otherwise put rows back into an entry a write has just
+        invalidated, and a sticky user would read them from the cache.
+        """
+        cache = self.router.cache
+        if cache is None or self._primary is not None:
+            return cache
+        return ReplicaCacheView(cache)
+
+    @property
+    def in_transaction(self):
+        return any(conn is not None and conn.in_transaction for conn in (self._primary, self._replica))
+
+
+class RoutedPool:
+    """Read/write splitting over a primary pool and replica pools.
+
+    ``connection(user_id)`` yields a RoutedConnection: read-only statements
+    run on the replicas in round-robin order and writes on the primary. After
+    a user's own write their work stays on the primary for ``sticky_seconds``
+    so they read their writes despite replication lag. A replica that fails
+    to connect is skipped for ``retry_after`` seconds; with none available,
+    reads fall back to the primary.
+    """
+
+    def __init__(self, primary, replicas, sticky_seconds=5.0, retry_after=30.0):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.sticky_seconds = sticky_seconds
+        self.retry_after = retry_after
+        self._sticky = {}
+        self._down_until = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return self.primary.backend
+
+    @property
+    def cache(self):
+        return self.primary.cache
+
+    @property
+    def metrics(self):
+        return self.primary.metrics
+
+    @property
+    def max_size(self):
+        return self.primary.max_size
+
+    def is_sticky(self, user_id):
+        if user_id is None:
+            return False
+        with self._lock:
+            until = self._sticky.get(user_id)
+            if until is None:
+                return False
+            if until < time.monotonic():
+                del self._sticky[user_id]
+                return False
+            return True
+
+    def stick(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._sticky) > 10000:
+                self._sticky = {user: until for user, until in self._sticky.items() if until > now}
+            self._sticky[user_id] = now + self.sticky_seconds
+
+    def replicas_in_order(self):
+        """Healthy replicas, starting from the next one in round-robin order."""
+        now = time.monotonic()
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+            down = dict(self._down_until)
+        ordered = self.replicas[start:] + self.replicas[:start]
+        return [replica for replica in ordered if down.get(id(replica), 0) <= now]
+
+    def mark_down(self, replica):
+        with self._lock:
+            self._down_until[id(replica)] = time.monotonic() + self.retry_after
+
+    @contextmanager
+    def connection(self, user_id=None):
+        conn = RoutedConnection(self, user_id)
+        # Exceptions reach the pooled connections' own context managers,
+        # which roll back or discard them as usual.
+        with conn._stack:
+            yield conn
+        if conn.wrote and user_id is not None:
+            self.stick(user_id)
+
+    def start_reaper(self, interval=60):
+        for pool in [self.primary] + self.replicas:
+            pool.start_reaper(interval)
+
+    def stats(self):
+        return {'primary': self.primary.stats(), 'replicas': [pool.stats() for pool in self.replicas]}
+
+    def close(self):
+        for pool in [self.primary] + self.replicas:
+            pool.close()
@@ -0,0 +1,219 @@
+"""Export listings and rental history to CSV or Parquet.
+
+Two datasets can be exported:
+
+    listings  properties with their landlord's name and contact details
+              and their neighborhoods (comma-separated), one row each
+    rentals   rent rows with the property's address and the broker's
+              name and contact details
+
+Rows are read through an unbuffered server-side cursor ``--chunk-rows``
+at a time and each chunk is written before the next is read, so memory
+use does not grow with the table. Parquet output (which needs pyarrow)
+gets one row group per chunk.
+
+With ``--workers`` above 1 the property_id range is split into
+``--partitions`` (default: one per worker) equal ranges, exported in
+parallel on separate connections, and the output path is a directory of
+one part file per range, in property_id order. Each connection reads its
+own snapshot, so a dump taken while bookings run may mix moments.
+
+    python export.py listings listings.csv
+    python export.py rentals rentals.parquet --chunk-rows 50000
+    python export.py listings listings_parquet --format parquet --workers 4 --partitions 16
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pymysql
+
+from db import create_pool
+from render import Renderer
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # CSV export only
+    pa = pq = None
+
+LISTINGS_QUERY = """
+    SELECT p.property_id, p.landlord_id, u.first_name, u.last_name, u.email, u.phone,
+           p.street_number, p.street_name, p.city, p.state, p.zip, p.room_number,
+           p.square_foot, p.price, p.room_amount, p.for_rent,
+           (SELECT GROUP_CONCAT(n.name) FROM property_neighborhood pn
+            JOIN neighborhood n ON pn.neighborhood_id = n.neighborhood_id
+            WHERE pn.property_id = p.property_id) AS neighborhoods
+    FROM properties p
+    LEFT JOIN user u ON p.landlord_id = u.user_id
+    WHERE p.property_id > %s AND p.property_id <= %s
+    ORDER BY p.property_id
+"""
+
+# Ordered like rent's (property_id, end_date, start_date) index, so each
+# range is read in index order without a sort.
+RENTALS_QUERY = """
+    SELECT r.rent_id, r.tenant_id, r.property_id, p.street_number, p.street_name, p.city, p.state,
+           r.start_date, r.end_date, r.contract_length, r.price, r.broker_fee,
+           r.broker_id, b.first_name, b.last_name, b.email, b.phone
+    FROM rent r
+    JOIN properties p ON r.property_id = p.property_id
+    LEFT JOIN broker b ON r.broker_id = b.broker_id
+    WHERE r.property_id > %s AND r.property_id <= %s
+    ORDER BY r.property_id, r.end_date, r.start_date
+"""
+
+# (query, ((column, type), ...)) per dataset; types are int, str, money and date.
+DATASETS = {
+    'listings': (LISTINGS_QUERY, (
+        ('property_id', 'int'), ('landlord_id', 'int'), ('landlord_first_name', 'str'),
+        ('landlord_last_name', 'str'), ('landlord_email', 'str'), ('landlord_phone', 'str'),
+        ('street_number', 'int'), ('street_name', 'str'), ('city', 'str'), ('state', 'str'), ('zip', 'int'),
+        ('room_number', 'int'), ('square_foot', 'int'), ('price', 'money'), ('room_amount', 'int'),
+        ('for_rent', 'int'), ('neighborhoods', 'str'),
+    )),
+    'rentals': (RENTALS_QUERY, (
+        ('rent_id', 'int'), ('tenant_id', 'int'), ('property_id', 'int'), ('street_number', 'int'),
+        ('street_name', 'str'), ('city', 'str'), ('state', 'str'), ('start_date', 'date'), ('end_date', 'date'),
+        ('contract_length', 'int'), ('price', 'money'), ('broker_fee', 'money'), ('broker_id', 'int'),
+        ('broker_first_name', 'str'), ('broker_last_name', 'str'), ('broker_email', 'str'),
+        ('broker_phone', 'str'),
+    )),
+}
+
+FORMATS = ('csv', 'parquet')
+
+CENTS = Decimal('0.01')
+
+
+def parquet_available():
+    return pa is not None
+
+
+class _CSVWriter:
+    def __init__(self, path, columns, chunk_rows):
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._out = Renderer('csv', self._file, chunk_rows)
+        self._fields = [name for name, _ in columns]
+        self._header = True
+
+    def write(self, rows):
+        self._out.rows(self._fields, rows, header=self._header)
+        self._header = False
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    """Writes each chunk as a row group under a fixed schema."""
+
+    def __init__(self, path, columns, chunk_rows):
+        if pa is None:
+            raise RuntimeError("Parquet export requires pyarrow.")
+        types = {'int': pa.int64(), 'str': pa.string(), 'money': pa.decimal128(12, 2), 'date': pa.date32()}
+        self._schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        # SQLite hands back DECIMAL columns as int or float
+        self._money = [kind == 'money' for _, kind in columns]
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write(self, rows):
+        arrays = []
+        for values, money, field in zip(zip(*rows), self._money, self._schema):
+            if money:
+                values = [Decimal(str(value)).quantize(CENTS) if value is not None else None for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def export_range(pool, dataset, path, fmt, low, high, chunk_rows=10000):
+    """Write the dataset's rows with property_id in (low, high] to path; returns the row count."""
+    query, columns = DATASETS[dataset]
+    writer = (_ParquetWriter if fmt == 'parquet' else _CSVWriter)(path, columns, chunk_rows)
+    count = 0
+    try:
+        with pool.connection() as conn:
+            cursor = conn.cursor(pymysql.cursors.SSCursor)
+            try:
+                cursor.execute(query, (low, high))
+                while True:
+                    rows = cursor.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    writer.write(rows)
+                    count += len(rows)
+            finally:
+                cursor.close()
+    finally:
+        writer.close()
+    return count
+
+
+def partition(low, high, parts):
+    """Split the property_id range (low, high] into up to `parts` (low, high] ranges."""
+    parts = max(1, min(parts, high - low))
+    bounds = [low + (high - low) * i // parts for i in range(parts + 1)]
+    return list(zip(bounds, bounds[1:]))
+
+
+def export(pool, dataset, path, fmt='csv', workers=1, partitions=None, chunk_rows=10000):
+    """Export a dataset; returns (rows, files).
+
+    With one worker and one partition path is the output file, otherwise
+    a directory that receives part-00000.<fmt>, part-00001.<fmt>, ...
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Unknown dataset {dataset!r}; use one of {', '.join(DATASETS)}.")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; use one of {', '.join(FORMATS)}.")
+    if fmt == 'parquet' and pa is None:
+        raise RuntimeError("Parquet export requires pyarrow.")
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MIN(property_id), 1), COALESCE(MAX(property_id), 0) FROM properties")
+        first, last = cursor.fetchone()
+    ranges = partition(first - 1, last, partitions or workers)
+
+    if workers == 1 and len(ranges) == 1:
+        return export_range(pool, dataset, path, fmt, *ranges[0], chunk_rows), [path]
+    os.makedirs(path, exist_ok=True)
+    files = [os.path.join(path, f"part-{i:05d}.{fmt}") for i in range(len(ranges))]
+    with ThreadPoolExecutor(workers) as executor:
+        counts = executor.map(lambda job: export_range(pool, dataset, job[0], fmt, *job[1], chunk_rows),
+                              zip(files, ranges))
+        return sum(counts), files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dataset', choices=tuple(DATASETS))
+    parser.add_argument('path', help="output file, or directory with --workers/--partitions above 1")
+    parser.add_argument('--format', choices=FORMATS, help="output format (default: from the file extension)")
+    parser.add_argument('--chunk-rows', type=int, default=10000, help="rows read and written at a time")
+    parser.add_argument('--workers', type=int, default=1, help="parallel connections")
+    parser.add_argument('--partitions', type=int, help="property_id ranges to split the export into")
+    args = parser.parse_args()
+
+    fmt = args.format or ('parquet' if args.path.endswith('.parquet') else 'csv')
+    if fmt == 'parquet' and not parquet_available():
+        parser.error("Parquet export requires pyarrow (pip install pyarrow).")
+
+    pool = create_pool(min_size=1, max_size=max(1, args.workers))
+    started = time.perf_counter()
+    try:
+        rows, files = export(pool, args.dataset, args.path, fmt, max(1, args.workers), args.partitions,
+                             max(1, args.chunk_rows))
+    finally:
+        pool.close()
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed else 0
+    print(f"Exported {rows} {args.dataset} rows to {len(files)} file(s) in {elapsed:.1f}s ({rate:.0f} rows/s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""Bulk-load property listings from CSV files or MySQL dumps.
+
+Listings are streamed from the input file, mapped onto the ``properties``
+table, validated, and inserted in fixed-size batches, so memory use does
+not grow with the file size. Rejected rows are counted and optionally
+written to a CSV file for inspection. The new listings are then added to
+the market statistics and matched against users' saved searches.
+
+    python ingest.py listings.csv --landlord-id 7
+    python ingest.py ../database/property.sql --landlord-id 7 --batch-size 5000
+    python ingest.py listings.csv --landlord-id 7 --method load-data --defer-indexes
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import tempfile
+import time
+
+from db import create_pool, load_backend, load_config
+from market import record_listings
+from saved_searches import SavedSearchIndex
+
+# Columns written to the properties table, in insert order.
+COLUMNS = ('landlord_id', 'street_number', 'street_name', 'city', 'state', 'zip',
+           'room_number', 'square_foot', 'price', 'room_amount', 'for_rent')
+
+# Source column names that mean the same thing as a properties column.
+ALIASES = {
+    'bedrooms': 'room_amount',
+    'rooms': 'room_amount',
+    'sqft': 'square_foot',
+    'square_feet': 'square_foot',
+    'zipcode': 'zip',
+    'zip_code': 'zip',
+    'rent': 'price',
+}
+
+INT_COLUMNS = ('landlord_id', 'street_number', 'zip', 'room_number', 'square_foot', 'room_amount', 'for_rent')
+REQUIRED = ('landlord_id', 'street_number', 'street_name', 'city', 'state', 'price')
+
+INSERT_SQL = f"INSERT INTO properties ({', '.join(COLUMNS)}) VALUES ({', '.join(['%s'] * len(COLUMNS))})"
+
+
+class RejectedRow(ValueError):
+    """A source row that cannot be mapped onto the properties table."""
+
+
+def read_csv(path):
+    """Yield one dict per CSV row, keyed by lower-cased header names."""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader)]
+        for values in reader:
+            if values:
+                yield dict(zip(header, values))
+
+
+_CREATE_TABLE = re.compile(r'CREATE TABLE `?(\w+)`?', re.IGNORECASE)
+_COLUMN_DEF = re.compile(r'^\s*`(\w+)`\s')
+_INSERT = re.compile(r'INSERT INTO `?(\w+)`?\s*(?:\(([^)]*)\))?\s*VALUES\s*', re.IGNORECASE)
+
+
+def _parse_tuples(text, start):
+    """Yield the value lists of a multi-row VALUES clause beginning at start."""
+    i, n = start, len(text)
+    while i < n:
+        while i < n and text[i] in ' ,\n\r\t':
+            i += 1
+        if i >= n or text[i] != '(':
+            return
+        i += 1
+        values, token, quoted = [], [], False
+        while i < n:
+            ch = text[i]
+            if ch == "'":
+                i += 1
+                while i < n and text[i] != "'":
+                    if text[i] == '\\' and i + 1 < n:
+                        i += 1
+                        token.append({'n': '\n', 'r': '\r', 't': '\t', '0': '\0'}.get(text[i], text[i]))
+                    else:
+                        token.append(text[i])
+                    i += 1
+                quoted = True
+            elif ch in ',)':
+                raw = ''.join(token)
+                values.append(raw if quoted else (None if raw.strip() == 'NULL' else raw.strip()))
+                token, quoted = [], False
+                if ch == ')':
+                    i += 1
+                    break
+            else:
+                token.append(ch)
+            i += 1
+        yield values
+
+
+def read_sql_dump(path, table='property'):
+    """Yield one dict per row inserted into `table` by a mysqldump file.
+
+    Column names come from the INSERT column list when present, otherwise
+    from the table's CREATE TABLE statement earlier in the dump.
+    """
+    table = table.lower()
+    columns = {}
+    current = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            created = _CREATE_TABLE.search(line)
+            if created:
+                current = created.group(1).lower()
+                columns[current] = []
+                continue
+            if current is not None:
+                column = _COLUMN_DEF.match(line)
+                if column:
+                    columns[current].append(column.group(1).lower())
+                    continue
+                if line.lstrip().startswith(')'):
+                    current = None
+            insert = _INSERT.search(line)
+            if not insert or insert.group(1).lower() != table:
+                continue
+            if insert.group(2):
+                names = [name.strip(' `').lower() for name in insert.group(2).split(',')]
+            else:
+                names = columns.get(table, [])
+            for values in _parse_tuples(line, insert.end()):
+                yield dict(zip(names, values))
+
+
+def map_row(source, defaults):
+    """Map a source dict onto a properties tuple, raising RejectedRow if invalid."""
+    record = dict(defaults)
+    for name, value in source.items():
+        name = ALIASES.get(name, name)
+        if name in COLUMNS and value not in (None, ''):
+            record[name] = value.strip() if isinstance(value, str) else value
+
+    missing = [name for name in REQUIRED if record.get(name) in (None, '')]
+    if missing:
+        raise RejectedRow(f"missing {', '.join(missing)}")
+
+    try:
+        for name in INT_COLUMNS:
+            if record.get(name) is not None:
+                record[name] = int(float(record[name]))
+        record['price'] = float(record['price'])
+    except (TypeError, ValueError) as e:
+        raise RejectedRow(f"bad number: {e}")
+
+    if record['price'] < 0 or (record.get('square_foot') or 0) < 0 or (record.get('room_amount') or 0) < 0:
+        raise RejectedRow("negative price, square footage or room count")
+    if len(record['state']) > 3:
+        raise RejectedRow(f"state {record['state']!r} is too long")
+    if record.get('for_rent') not in (0, 1):
+        raise RejectedRow(f"for_rent must be 0 or 1, got {record.get('for_rent')!r}")
+    return tuple(record.get(name) for name in COLUMNS)
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def secondary_indexes(cursor, table):
+    """Return {index_name: CREATE INDEX statement} for non-unique indexes on table."""
+    cursor.execute("""
+        SELECT index_name, column_name, sub_part
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND non_unique = 1
+        ORDER BY index_name, seq_in_index
+    """, (table,))
+    columns = {}
+    for name, column, sub_part in cursor.fetchall():
+        columns.setdefault(name, []).append(f"`{column}`({sub_part})" if sub_part else f"`{column}`")
+    return {name: f"CREATE INDEX `{name}` ON `{table}` ({', '.join(cols)})"
+            for name, cols in columns.items()}
+
+
+def known_landlords(cursor, landlord_ids):
+    """The subset of landlord_ids that are registered landlords."""
+    landlord_ids = sorted(landlord_ids)
+    if not landlord_ids:
+        return set()
+    cursor.execute(f"SELECT user_id FROM landlord WHERE user_id IN ({', '.join(['%s'] * len(landlord_ids))})",
+                   landlord_ids)
+    return {row[0] for row in cursor.fetchall()}
+
+
+def insert_batch(cursor, batch):
+    # pymysql rewrites an INSERT ... VALUES executemany into multi-row INSERTs.
+    cursor.executemany(INSERT_SQL, batch)
+
+
+def load_data_batch(cursor, batch):
+    """Load a batch through LOAD DATA LOCAL INFILE via a temporary CSV file."""
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', delete=False) as f:
+        writer = csv.writer(f, lineterminator='\n')
+        for row in batch:
+            writer.writerow(['NULL' if value is None else value for value in row])
+        path = f.name
+    try:
+        cursor.execute(
+            "LOAD DATA LOCAL INFILE %s INTO TABLE properties "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+            "LINES TERMINATED BY '\\n' "
+            f"({', '.join(COLUMNS)})",
+            (path,),
+        )
+    finally:
+        os.unlink(path)
+
+
+def ingest(pool, rows, defaults, batch_size=1000, method='insert', defer_indexes=False,
+           rejects=None, progress_every=100000):
+    """Validate and load rows; returns (loaded, rejected, seconds)."""
+    write_batch = load_data_batch if method == 'load-data' else insert_batch
+    loaded = rejected = 0
+    started = time.perf_counter()
+    next_report = progress_every
+
+    def reject(number, reason, source):
+        nonlocal rejected
+        rejected += 1
+        if rejects is not None:
+            rejects.writerow([number, reason, source])
+
+    def valid_rows():
+        for number, source in enumerate(rows, start=1):
+            try:
+                yield number, source, map_row(source, defaults)
+            except RejectedRow as e:
+                reject(number, str(e), source)
+
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        dropped = {}
+        landlords, strangers = set(), set()
+        # Skip per-row uniqueness and foreign key checks for the bulk session;
+        # landlord_id, the one foreign key, is checked once per batch instead.
+        cursor.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+        try:
+            if defer_indexes:
+                dropped = secondary_indexes(cursor, 'properties')
+                for name in dropped:
+                    cursor.execute(f"DROP INDEX `{name}` ON properties")
+            for batch in batches(valid_rows(), batch_size):
+                unseen = {row[0] for _, _, row in batch} - landlords - strangers
+                found = known_landlords(cursor, unseen)
+                landlords |= found
+                strangers |= unseen - found
+                good = []
+                for number, source, row in batch:
+                    if row[0] in landlords:
+                        good.append(row)
+                    else:
+                        reject(number, f"unknown landlord_id {row[0]}", source)
+                if not good:
+                    continue
+                write_batch(cursor, good)
+                conn.commit()
+                loaded += len(good)
+                if progress_every and loaded >= next_report:
+                    elapsed = time.perf_counter() - started
+                    print(f"  {loaded} rows loaded ({loaded / elapsed:.0f} rows/s)")
+                    next_report += progress_every
+        finally:
+            # Rebuilding each index once is much cheaper than maintaining it per row.
+            for statement in dropped.values():
+                cursor.execute(statement)
+            cursor.execute("SET SESSION unique_checks = 1, foreign_key_checks = 1")
+            conn.commit()
+    return loaded, rejected, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help="CSV file or .sql dump")
+    parser.add_argument('--format', choices=('csv', 'sql'), help="input format (default: from file extension)")
+    parser.add_argument('--table', default='property', help="table to read from a SQL dump")
+    parser.add_argument('--landlord-id', type=int, help="landlord for rows that do not name one")
+    parser.add_argument('--for-rent', type=int, default=1, choices=(0, 1))
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--method', choices=('insert', 'load-data'), default='insert')
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help="drop secondary indexes on properties during the load and rebuild them after")
+    parser.add_argument('--rejects', help="write rejected rows to this CSV file")
+    parser.add_argument('--no-notify', action='store_true',
+                        help="do not match the new listings against users' saved searches")
+    args = parser.parse_args()
+
+    fmt = args.format or ('sql' if args.path.endswith('.sql') else 'csv')
+    rows = read_sql_dump(args.path, args.table) if fmt == 'sql' else read_csv(args.path)
+    defaults = {'landlord_id': args.landlord_id, 'for_rent': args.for_rent}
+
+    backend = load_backend()
+    if backend == 'sqlite' and (args.method == 'load-data' or args.defer_indexes):
+        parser.error("--method load-data and --defer-indexes need the MySQL backend.")
+    config = dict(load_config(), local_infile=True) if args.method == 'load-data' else None
+    pool = create_pool(backend, config, replicas=(), min_size=1, max_size=1)
+
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(property_id), 0) FROM properties")
+        last_property_id = cursor.fetchone()[0]
+
+    reject_file = open(args.rejects, 'w', newline='') if args.rejects else None
+    try:
+        rejects = csv.writer(reject_file) if reject_file else None
+        loaded, rejected, seconds = ingest(pool, rows, defaults, args.batch_size, args.method,
+                                           args.defer_indexes, rejects)
+        if loaded:
+            with pool.connection() as conn:
+                record_listings(conn, last_property_id)
+        if loaded and not args.no_notify:
+            saved_searches = SavedSearchIndex()
+            with pool.connection() as conn:
+                saved_searches.build(conn)
+                queued = saved_searches.notify_inserted(conn, last_property_id)
+            print(f"Queued {queued} saved-search matches.")
+    finally:
+        if reject_file:
+            reject_file.close()
+        pool.close()
+
+    rate = loaded / seconds if seconds else 0
+    print(f"Loaded {loaded} rows in {seconds:.1f}s ({rate:.0f} rows/s); rejected {rejected}.")
+    if rejected and not loaded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
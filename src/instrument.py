@@ -0,0 +1,261 @@
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from cache import normalize_sql
+
+# Upper bounds (milliseconds) of the latency histogram buckets.
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Upper bounds of the per-action round trip histogram.
+ROUND_TRIP_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34)
+
+_action = contextvars.ContextVar('action', default=None)
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts[i] holds observations <= bounds[i] (last is +Inf)."""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return float('inf')
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'buckets': dict(zip([str(b) for b in self.bounds] + ['+Inf'], self.counts)),
+        }
+
+
+class StatementStats:
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+
+
+class ActionStats:
+    def __init__(self):
+        self.calls = 0
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+        self.round_trips = Histogram(ROUND_TRIP_BUCKETS)
+        self.statements = {}
+
+
+class Metrics:
+    """Per-action query statistics, a slow-query log and file exporters.
+
+    Statements are attributed to the action active in the current context
+    (see ``action()``); anything issued outside an action is grouped
+    under ``"other"``.
+    """
+
+    def __init__(self, slow_query_ms=None, slow_log_path=None):
+        self.slow_query_ms = slow_query_ms
+        self.slow_log_path = slow_log_path
+        self.actions = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _action_stats(self, name):
+        stats = self.actions.get(name)
+        if stats is None:
+            stats = self.actions[name] = ActionStats()
+        return stats
+
+    @contextmanager
+    def action(self, name):
+        """Attribute statements run inside this block to the named action."""
+        invocation = {'name': name, 'round_trips': 0}
+        token = _action.set(invocation)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            _action.reset(token)
+            with self._lock:
+                stats = self._action_stats(name)
+                stats.calls += 1
+                stats.latency.observe(elapsed_ms)
+                stats.round_trips.observe(invocation['round_trips'])
+
+    def record(self, sql, seconds, rows=0):
+        """Record one round trip to the database."""
+        invocation = _action.get()
+        name = invocation['name'] if invocation else 'other'
+        if invocation:
+            invocation['round_trips'] += 1
+        elapsed_ms = seconds * 1000
+        statement = normalize_sql(sql)
+        with self._lock:
+            stats = self._action_stats(name)
+            entry = stats.statements.get(statement)
+            if entry is None:
+                entry = stats.statements[statement] = StatementStats()
+            entry.calls += 1
+            entry.rows += max(rows or 0, 0)
+            entry.latency.observe(elapsed_ms)
+        if self.slow_query_ms is not None and elapsed_ms >= self.slow_query_ms:
+            self._log_slow(name, statement, elapsed_ms, rows)
+
+    def _log_slow(self, action, statement, elapsed_ms, rows):
+        line = json.dumps({
+            'ts': time.time(), 'action': action, 'ms': round(elapsed_ms, 3),
+            'rows': rows, 'sql': statement,
+        })
+        if self.slow_log_path:
+            with self._lock, open(self.slow_log_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        else:
+            print(f"[slow query] {line}")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    'calls': stats.calls,
+                    'latency_ms': stats.latency.to_dict(),
+                    'round_trips': stats.round_trips.to_dict(),
+                    'statements': {
+                        sql: {'calls': s.calls, 'rows': s.rows, 'latency_ms': s.latency.to_dict()}
+                        for sql, s in stats.statements.items()
+                    },
+                }
+                for name, stats in self.actions.items()
+            }
+
+    def report(self):
+        """Human-readable per-action summary."""
+        lines = [f"{'action':<28}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'trips p95':>11}"]
+        with self._lock:
+            for name, stats in sorted(self.actions.items()):
+                lines.append(f"{name:<28}{stats.calls:>7}{stats.latency.quantile(0.5):>9}"
+                             f"{stats.latency.quantile(0.95):>9}{stats.round_trips.quantile(0.95):>11}")
+        return '\n'.join(lines)
+
+    def to_json_lines(self):
+        now = time.time()
+        lines = []
+        for name, action in self.snapshot().items():
+            statements = action.pop('statements')
+            lines.append(json.dumps({'ts': now, 'action': name, **action}))
+            for sql, stats in statements.items():
+                lines.append(json.dumps({'ts': now, 'action': name, 'sql': sql, **stats}))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def to_prometheus(self):
+        families = {
+            'rental_action_latency_ms': ('histogram', []),
+            'rental_action_round_trips': ('histogram', []),
+            'rental_statement_latency_ms': ('histogram', []),
+            'rental_statement_rows_total': ('counter', []),
+        }
+
+        def histogram(metric, labels, data):
+            samples = families[metric][1]
+            running = 0
+            for bound, count in data['buckets'].items():
+                running += count
+                samples.append(f'{metric}_bucket{{{labels},le="{bound}"}} {running}')
+            samples.append(f'{metric}_sum{{{labels}}} {data["sum"]}')
+            samples.append(f'{metric}_count{{{labels}}} {data["count"]}')
+
+        for name, action in sorted(self.snapshot().items()):
+            labels = f'action="{name}"'
+            histogram('rental_action_latency_ms', labels, action['latency_ms'])
+            histogram('rental_action_round_trips', labels, action['round_trips'])
+            for sql, stats in action['statements'].items():
+                escaped = sql.replace('\\', '\\\\').replace('"', '\\"')
+                statement_labels = f'{labels},sql="{escaped}"'
+                histogram('rental_statement_latency_ms', statement_labels, stats['latency_ms'])
+                families['rental_statement_rows_total'][1].append(
+                    f'rental_statement_rows_total{{{statement_labels}}} {stats["rows"]}')
+
+        # Prometheus expects each metric family's samples in one group after its TYPE line.
+        out = []
+        for metric, (kind, samples) in families.items():
+            out.append(f"# TYPE {metric} {kind}")
+            out.extend(samples)
+        return '\n'.join(out) + '\n'
+
+    def export(self, path):
+        """Write metrics to path: Prometheus text for *.prom, JSON lines otherwise."""
+        text = self.to_prometheus() if path.endswith('.prom') else self.to_json_lines()
+        # Write then rename so a scraper never reads a half-written file.
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def start_exporter(self, path, interval=15.0):
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.export(path)
+                except Exception as e:
+                    print(f"Error exporting metrics: {e}")
+        thread = threading.Thread(target=run, name="metrics-exporter", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that reports every execute to a Metrics collector."""
+
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            self._metrics.record(query, time.perf_counter() - started, self._cursor.rowcount)
+
+    def executemany(self, query, args):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            self._metrics.record(query, time.perf_counter() - started, self._cursor.rowcount)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
@@ -0,0 +1,221 @@
+"""Put properties back on the market when their lease ends.
+
+A property is taken off the market (for_rent = 0) when a stay begins, but
+nothing re-lists it when the stay ends. The sweeper does both sides on a
+schedule: it re-lists properties whose leases have ended and that have no
+other stay today, and takes off the market properties whose booked future
+stay has begun.
+
+Each run walks only the leases that ended, and the stays that began,
+since the previous run, through the (end_date, property_id) and
+(start_date, property_id) indexes. Properties are changed in chunks of
+``batch_size``, each in its own short transaction that locks just those
+property rows, so bookings are never held up for long. After each chunk
+the query cache is invalidated, the in-memory listing indexes updated and
+every ``on_change`` listener called with (conn, event, property_ids),
+where event is 'available' or 'occupied'.
+
+Run a single sweep, e.g. from cron:
+
+    python lease_sweeper.py --batch-size 500
+"""
+import argparse
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+
+from cache import invalidate
+from db import create_pool
+from listings import ListingIndexes
+from market import record_vacancy
+from saved_searches import SavedSearchIndex
+
+ENDED_LEASES = """
+    SELECT end_date, property_id FROM rent
+    WHERE end_date <= %s AND (end_date > %s OR (end_date = %s AND property_id > %s))
+    ORDER BY end_date, property_id
+    LIMIT %s
+"""
+
+STARTED_STAYS = """
+    SELECT start_date, property_id FROM rent
+    WHERE start_date <= %s AND end_date > %s
+      AND (start_date > %s OR (start_date = %s AND property_id > %s))
+    ORDER BY start_date, property_id
+    LIMIT %s
+"""
+
+# Re-checked under the row locks: a booking may have run since the scan.
+CURRENT_STAY = """
+    EXISTS (SELECT 1 FROM rent r WHERE r.property_id = p.property_id
+            AND r.start_date <= %s AND r.end_date > %s)
+"""
+
+LOCK_VACANT = "SELECT p.property_id FROM properties p WHERE p.property_id IN ({}) AND p.for_rent = 0 AND NOT" \
+    + CURRENT_STAY + "FOR UPDATE"
+LOCK_OCCUPIED = "SELECT p.property_id FROM properties p WHERE p.property_id IN ({}) AND p.for_rent = 1 AND" \
+    + CURRENT_STAY + "FOR UPDATE"
+
+SET_FOR_RENT = "UPDATE properties SET for_rent = %s WHERE property_id IN ({})"
+
+
+@dataclass
+class SweepResult:
+    relisted: int
+    occupied: int
+    seconds: float
+
+    def __str__(self):
+        return (f"Lease sweep: {self.relisted} properties re-listed, {self.occupied} taken off the market "
+                f"in {self.seconds:.2f}s.")
+
+
+class LeaseSweeper:
+    """Keep properties.for_rent in step with the rent table's dates.
+
+    The sweeper remembers the day it last swept through, so later runs read
+    only leases ending and stays starting after it; the first run in a
+    process covers the whole table.
+    """
+
+    def __init__(self, pool, indexes=None, batch_size=500, interval=3600.0, on_change=(), log=None):
+        self.pool = pool
+        self.indexes = indexes
+        self.batch_size = batch_size
+        self.interval = interval
+        self.on_change = list(on_change)
+        # Called with each background run's SweepResult, e.g. print.
+        self.log = log
+        self.ended_through = date.min
+        self.started_through = date.min
+        self.last = None
+        self.sweeps = 0
+        self._sweep_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _candidates(self, conn, sql, params, since):
+        """Yield chunks of distinct property_ids from ENDED_LEASES or STARTED_STAYS.
+
+        ``params`` fill the query's leading placeholders; the rest walk the
+        (date, property_id) keyset after ``since``.
+        """
+        cursor = conn.cursor()
+        last_day, last_id = since, 0
+        while True:
+            cursor.execute(sql, (*params, last_day, last_day, last_id, self.batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            yield sorted({row[1] for row in rows})
+            last_day, last_id = rows[-1]
+            if len(rows) < self.batch_size:
+                return
+
+    def _flip(self, conn, lock_sql, property_ids, for_rent, today):
+        """Set for_rent on the property_ids that still qualify; returns those ids."""
+        marks = ', '.join(['%s'] * len(property_ids))
+        cursor = conn.cursor()
+        try:
+            cursor.execute(lock_sql.format(marks), (*property_ids, today, today))
+            changed = [row[0] for row in cursor.fetchall()]
+            if changed:
+                cursor.execute(SET_FOR_RENT.format(', '.join(['%s'] * len(changed))), (for_rent, *changed))
+                record_vacancy(conn, changed, 1 if for_rent else -1)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return changed
+
+    def _changed(self, conn, event, property_ids):
+        invalidate(conn, 'properties')
+        if self.indexes is not None:
+            if event == 'available':
+                # Also queues matches for users' saved searches
+                self.indexes.available(conn, property_ids)
+            else:
+                for property_id in property_ids:
+                    self.indexes.remove(property_id)
+        for listener in self.on_change:
+            listener(conn, event, property_ids)
+
+    def sweep(self, today=None):
+        """Run one sweep; returns a SweepResult."""
+        today = today or date.today()
+        started = time.perf_counter()
+        relisted = occupied = 0
+        with self._sweep_lock, self.pool.connection() as conn:
+            for property_ids in self._candidates(conn, ENDED_LEASES, (today,), self.ended_through):
+                changed = self._flip(conn, LOCK_VACANT, property_ids, 1, today)
+                if changed:
+                    self._changed(conn, 'available', changed)
+                relisted += len(changed)
+            self.ended_through = max(self.ended_through, today)
+            for property_ids in self._candidates(conn, STARTED_STAYS, (today, today), self.started_through):
+                changed = self._flip(conn, LOCK_OCCUPIED, property_ids, 0, today)
+                if changed:
+                    self._changed(conn, 'occupied', changed)
+                occupied += len(changed)
+            self.started_through = max(self.started_through, today)
+            if self.indexes is not None and self.indexes.availability is not None:
+                self.indexes.availability.prune(today)
+        self.last = SweepResult(relisted, occupied, time.perf_counter() - started)
+        self.sweeps += 1
+        return self.last
+
+    def start(self):
+        """Sweep on a daemon thread now and then every `interval` seconds."""
+        def run():
+            while not self._stop.is_set():
+                try:
+                    result = self.sweep()
+                    if self.log is not None:
+                        self.log(result)
+                except Exception as e:
+                    print(f"Error sweeping expired leases: {e}")
+                self._stop.wait(self.interval)
+        self._thread = threading.Thread(target=run, name="lease-sweeper", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+def lease_sweeper(pool, indexes=None, log=None):
+    """A LeaseSweeper configured from the environment, or None if disabled.
+
+    RENTAL_LEASE_SWEEP_SECONDS is the time between sweeps (default 3600,
+    0 turns the sweeper off) and RENTAL_LEASE_SWEEP_BATCH the number of
+    leases read and properties changed per transaction.
+    """
+    interval = float(os.environ.get('RENTAL_LEASE_SWEEP_SECONDS', '3600'))
+    if interval <= 0:
+        return None
+    return LeaseSweeper(pool, indexes, batch_size=int(os.environ.get('RENTAL_LEASE_SWEEP_BATCH', '500')),
+                        interval=interval, log=log)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=500, help="leases read and properties changed per transaction")
+    args = parser.parse_args()
+
+    pool = create_pool(min_size=1, max_size=2)
+    try:
+        # Re-listed properties still reach users' saved searches
+        indexes = ListingIndexes(saved_searches=SavedSearchIndex())
+        with pool.connection() as conn:
+            indexes.build(conn)
+        print(LeaseSweeper(pool, indexes, batch_size=max(1, args.batch_size)).sweep())
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
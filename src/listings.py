@@ -0,0 +1,91 @@
+import os
+from datetime import date
+
+from availability import AvailabilityIndex
+from saved_searches import SavedSearchIndex
+from search_index import PropertySearchIndex, numpy_available
+from similar_index import SimilarityIndex
+from trigram_index import TrigramIndex
+
+
+class ListingIndexes:
+    """A process's in-memory listing indexes, kept in step together.
+
+    ``search`` (PropertySearchIndex), ``text`` (TrigramIndex) and
+    ``similar`` (SimilarityIndex) are each optional; code that changes a
+    listing calls remove() or refresh_property() here once instead of on
+    every index. ``availability`` (AvailabilityIndex), also optional, holds
+    bookings rather than listings and is updated through booked().
+    ``saved_searches`` (SavedSearchIndex) is told about listings that come
+    on the market through available().
+    """
+
+    def __init__(self, search=None, text=None, similar=None, availability=None, saved_searches=None):
+        self.search = search
+        self.text = text
+        self.similar = similar
+        self.availability = availability
+        self.saved_searches = saved_searches
+
+    def __iter__(self):
+        return (index for index in (self.search, self.text, self.similar) if index is not None)
+
+    def build(self, conn):
+        for index in self:
+            index.build(conn)
+        for index in (self.availability, self.saved_searches):
+            if index is not None:
+                index.build(conn)
+
+    def booked(self, request, rent_id):
+        """A BookingRequest was booked; a stay that has begun takes the listing off the market."""
+        if self.availability is not None:
+            self.availability.add(request.property_id, request.start_date, request.end_date, rent_id)
+        if request.start_date <= date.today():
+            self.remove(request.property_id)
+
+    def remove(self, property_id):
+        """A listing is no longer for rent."""
+        for index in self:
+            index.remove(property_id)
+
+    def refresh_property(self, conn, property_id):
+        """A listing was added, changed, or became available again."""
+        for index in self:
+            index.refresh_property(conn, property_id)
+
+    def available(self, conn, property_ids):
+        """Listings were added or put back on the market; returns the saved-search matches queued."""
+        for property_id in property_ids:
+            self.refresh_property(conn, property_id)
+        if self.saved_searches is None:
+            return 0
+        return self.saved_searches.notify(conn, property_ids)
+
+
+def load_listing_indexes(pool, search=True):
+    """Build the indexes enabled in the environment.
+
+    RENTAL_SEARCH_INDEX, RENTAL_TEXT_INDEX, RENTAL_SIMILAR_INDEX,
+    RENTAL_AVAILABILITY_INDEX and RENTAL_SAVED_SEARCH_INDEX set to 0 turn
+    an index off; the NumPy-based ones are skipped without numpy.
+    ``search=False`` leaves out the search index regardless.
+    RENTAL_SEARCH_INDEX_TTL is how often, in seconds, the search index is
+    rebuilt to pick up other processes' changes (default 60).
+    """
+    def enabled(name):
+        return os.environ.get(name, '1') != '0'
+
+    search_ttl = float(os.environ.get('RENTAL_SEARCH_INDEX_TTL', '60'))
+    indexes = ListingIndexes(
+        search=(PropertySearchIndex(ttl=search_ttl) if search and numpy_available() and enabled('RENTAL_SEARCH_INDEX')
+                else None),
+        text=TrigramIndex() if enabled('RENTAL_TEXT_INDEX') else None,
+        similar=SimilarityIndex() if numpy_available() and enabled('RENTAL_SIMILAR_INDEX') else None,
+        availability=(AvailabilityIndex() if numpy_available() and enabled('RENTAL_AVAILABILITY_INDEX')
+                      else None),
+        saved_searches=SavedSearchIndex() if enabled('RENTAL_SAVED_SEARCH_INDEX') else None,
+    )
+    with pool.connection() as conn:
+        indexes.build(conn)
+    return indexes
@@ -1,34 +1,56 @@
 import pymysql
-from tabulate import tabulate
 import os
 from getpass import getpass
-import hashlib
-import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import re
+from dataclasses import asdict, dataclass, fields
+from typing import Optional
 
-def signup(cursor, conn):
-    print("\n=== Signup ===")
-    email = input("Enter your email: ").strip()
-    # Verify that the email is unique by checking the user table.
-    cursor.execute("SELECT * FROM user WHERE email = %s", (email,))
-    if cursor.fetchone() is not None:
-        print("An account with this email already exists. Please log in instead or use a different email.\n")
-        return None
+from db import create_pool
+from instrument import Metrics
+from cache import QueryCache, cached_fetchall, cached_fetchone, invalidate
+from booking import BookingRequest, PropertyUnavailable, add_months, book_property
+from brokers import BrokerDirectory
+from write_behind import last_login_buffer
+from migrate import migrate
+from render import Renderer
+from search_index import LISTING_FIELDS, LISTING_QUERY, LISTING_SELECT
+from lease_sweeper import lease_sweeper
+from market import KINDS, MARKET_FIELDS, MarketStats
+from listings import load_listing_indexes
+from passwords import password_hasher
+from saved_searches import (count_notifications, delete_saved_search, list_saved_searches, save_search,
+                            take_notifications)
 
-    password = getpass("Enter your password: ")
-    confirm_password = getpass("Confirm your password: ")
-    if password != confirm_password:
-        print("Passwords do not match. Please try again.\n")
-        return None
+# Number of listings shown per page of search results.
+PAGE_SIZE = int(os.environ.get('RENTAL_PAGE_SIZE', '20'))
 
-    first_name = input("Enter your first name: ").strip()
-    last_name = input("Enter your last name: ").strip()
-    phone = input("Enter your phone number: ").strip()
+class SignupError(Exception):
+    """Signup was rejected; the message is suitable for showing to the user."""
+
+class AuthenticationError(Exception):
+    """Login was rejected; the message is suitable for showing to the user."""
+
+class ProfileError(Exception):
+    """A profile change was rejected; the message is suitable for showing to the user."""
 
-    # Generate a salt and hash the password using SHA-256.
-    salt = uuid.uuid4().hex
-    password_hash = hashlib.sha256((salt + password).encode()).hexdigest()
+SSN_PATTERN = re.compile(r'^(\d{3}-\d{2}-\d{4}|\d{9})$')
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+def email_registered(conn, email):
+    """Check whether an account already uses this email."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT user_id FROM user WHERE email = %s", (email,))
+    return cursor.fetchone() is not None
+
+def create_account(conn, email, password, first_name, last_name, phone):
+    """Create the auth and user records for a new account and return its user_id."""
+    if email_registered(conn, email):
+        raise SignupError("An account with this email already exists. Please log in instead or use a different email.")
+    
+    cursor = conn.cursor()
+    # Salted, versioned hash in the configured scheme (see passwords.py).
+    password_hash, salt = password_hasher().hash(password)
 
     # Insert authentication record into user_auth (using email as username).
     cursor.execute(
@@ -42,42 +64,88 @@ def signup(cursor, conn):
         "INSERT INTO user (auth_id, first_name, last_name, phone, email) VALUES (%s, %s, %s, %s, %s)",
         (auth_id, first_name, last_name, phone, email)
     )
+    user_id = cursor.lastrowid
     conn.commit()
-    print("Signup successful! You can now log in.\n")
-    return email
+    invalidate(conn, 'user', 'user_auth')
+    return user_id
 
-def login(cursor):
-    print("\n=== Login ===")
+def signup(conn):
+    print("\n=== Signup ===")
     email = input("Enter your email: ").strip()
+    # Verify that the email is unique before asking for anything else.
+    if email_registered(conn, email):
+        print("An account with this email already exists. Please log in instead or use a different email.\n")
+        return None
+
     password = getpass("Enter your password: ")
+    confirm_password = getpass("Confirm your password: ")
+    if password != confirm_password:
+        print("Passwords do not match. Please try again.\n")
+        return None
+
+    first_name = input("Enter your first name: ").strip()
+    last_name = input("Enter your last name: ").strip()
+    phone = input("Enter your phone number: ").strip()
 
-    # Retrieve the user record using the email.
-    cursor.execute("SELECT * FROM user WHERE email = %s", (email,))
-    user_record = cursor.fetchone()
-    if user_record is None:
-        print("No account found with that email. Please sign up first.\n")
+    try:
+        create_account(conn, email, password, first_name, last_name, phone)
+    except SignupError as e:
+        print(f"{e}\n")
         return None
+    print("Signup successful! You can now log in.\n")
+    return email
 
-    # The user table is expected to have: user_id, auth_id, first_name, last_name, phone, email.
-    auth_id = user_record[1]
-    cursor.execute("SELECT * FROM user_auth WHERE auth_id = %s", (auth_id,))
-    auth_record = cursor.fetchone()
-    stored_password_hash = auth_record[2]
-    salt = auth_record[3]
-    
-    # Hash the provided password with the retrieved salt.
-    password_hash = hashlib.sha256((salt + password).encode()).hexdigest()
-    if password_hash == stored_password_hash:
-        # Update last login timestamp
-        cursor.execute("UPDATE user_auth SET last_login = NOW() WHERE auth_id = %s", (auth_id,))
-        print("Login successful!\n")
-        return user_record[0]  # Return user_id instead of email
+def authenticate(conn, email, password, login_buffer=None):
+    """Check an email/password pair and return the user_id, or raise AuthenticationError."""
+    cursor = conn.cursor()
+    # Retrieve the user and their auth record in one lookup on the email index.
+    cursor.execute("""
+        SELECT u.user_id, ua.auth_id, ua.password_hash, ua.salt
+        FROM user u
+        JOIN user_auth ua ON u.auth_id = ua.auth_id
+        WHERE u.email = %s
+    """, (email,))
+    record = cursor.fetchone()
+    if record is None:
+        raise AuthenticationError("No account found with that email. Please sign up first.")
+
+    user_id, auth_id, stored_password_hash, salt = record
+    
+    hasher = password_hasher()
+    if not hasher.verify(password, stored_password_hash, salt):
+        raise AuthenticationError("Incorrect password. Please try again.")
+    
+    # Upgrade legacy SHA-256 and outdated hashes while the password is at hand
+    if hasher.needs_rehash(stored_password_hash):
+        cursor.execute("UPDATE user_auth SET password_hash = %s, salt = %s WHERE auth_id = %s",
+                       (*hasher.hash(password), auth_id))
+        conn.commit()
+        invalidate(conn, 'user_auth')
+    
+    # Update last login timestamp, batched with other logins when buffered
+    if login_buffer is not None:
+        login_buffer.record(auth_id, datetime.now())
     else:
-        print("Incorrect password. Please try again.\n")
+        cursor.execute("UPDATE user_auth SET last_login = NOW() WHERE auth_id = %s", (auth_id,))
+        conn.commit()
+    return user_id
+
+def login(conn, login_buffer=None):
+    print("\n=== Login ===")
+    email = input("Enter your email: ").strip()
+    password = getpass("Enter your password: ")
+
+    try:
+        user_id = authenticate(conn, email, password, login_buffer)
+    except AuthenticationError as e:
+        print(f"{e}\n")
         return None
+    print("Login successful!\n")
+    return user_id
 
-def get_user_info(cursor, user_id):
+def get_user_info(conn, user_id):
     """Get comprehensive user information."""
+    cursor = conn.cursor()
     cursor.execute("""
         SELECT u.user_id, u.first_name, u.last_name, u.email, u.phone, 
                ua.username, ua.last_login
@@ -87,32 +155,81 @@ def get_user_info(cursor, user_id):
     """, (user_id,))
     return cursor.fetchone()
 
-def check_tenant_status(cursor, user_id):
+@dataclass
+class UserProfile:
+    """A user's account details together with every role they hold."""
+    user_id: int
+    first_name: str
+    last_name: str
+    phone: str
+    email: str
+    username: str
+    last_login: Optional[datetime]
+    is_landlord: bool
+    is_tenant: bool
+    is_us_citizen: bool
+    ssn: Optional[str]
+    is_international_student: bool
+    passport_id: Optional[str]
+    is_student: bool
+
+PROFILE_QUERY = """
+    SELECT u.user_id, u.first_name, u.last_name, u.phone, u.email,
+           ua.username, ua.last_login,
+           l.user_id IS NOT NULL, t.user_id IS NOT NULL,
+           uc.user_id IS NOT NULL, uc.ssn,
+           ist.user_id IS NOT NULL, ist.passport_id,
+           s.user_id IS NOT NULL
+    FROM user u
+    JOIN user_auth ua ON u.auth_id = ua.auth_id
+    LEFT JOIN landlord l ON l.user_id = u.user_id
+    LEFT JOIN tenant t ON t.user_id = u.user_id
+    LEFT JOIN us_citizen uc ON uc.user_id = u.user_id
+    LEFT JOIN international_student ist ON ist.user_id = u.user_id
+    LEFT JOIN student s ON s.user_id = u.user_id
+    WHERE u.user_id = %s
+"""
+
+def get_user_profile(conn, user_id):
+    """Resolve a user and all of their roles in a single query."""
+    row = cached_fetchone(conn, PROFILE_QUERY, (user_id,))
+    if row is None:
+        return None
+    return UserProfile(
+        user_id=row[0], first_name=row[1], last_name=row[2], phone=row[3],
+        email=row[4], username=row[5], last_login=row[6],
+        is_landlord=bool(row[7]), is_tenant=bool(row[8]),
+        is_us_citizen=bool(row[9]), ssn=row[10],
+        is_international_student=bool(row[11]), passport_id=row[12],
+        is_student=bool(row[13]),
+    )
+
+def check_tenant_status(conn, user_id):
     """Check if the user is registered as a tenant."""
+    cursor = conn.cursor()
     cursor.execute("SELECT * FROM tenant WHERE user_id = %s", (user_id,))
     return cursor.fetchone() is not None
 
-def check_landlord_status(cursor, user_id):
+def check_landlord_status(conn, user_id):
     """Check if the user is registered as a landlord."""
+    cursor = conn.cursor()
     cursor.execute("SELECT * FROM landlord WHERE user_id = %s", (user_id,))
     return cursor.fetchone() is not None
 
-def register_as_tenant(cursor, conn, user_id):
+def register_as_tenant(conn, user_id):
     """Register the user as a tenant if not already registered."""
-    if not check_tenant_status(cursor, user_id):
+    if not check_tenant_status(conn, user_id):
+        cursor = conn.cursor()
         cursor.execute("INSERT INTO tenant (user_id) VALUES (%s)", (user_id,))
         conn.commit()
-        print("You have been registered as a tenant.")
+        invalidate(conn, 'tenant')
         return True
     return False
 
 def validate_ssn(ssn):
     """Validate Social Security Number format."""
-    # Check for XXX-XX-XXXX format
-    if re.match(r'^\d{3}-\d{2}-\d{4}$', ssn):
-        return True
-    # Check for XXXXXXXXX format
-    elif re.match(r'^\d{9}$', ssn):
+    # XXX-XX-XXXX or XXXXXXXXX
+    if SSN_PATTERN.match(ssn):
         return True
     else:
         print("Invalid SSN format. Please use XXX-XX-XXXX or XXXXXXXXX format.")
@@ -120,137 +237,142 @@ def validate_ssn(ssn):
 
 def validate_email(email):
     """Validate email format."""
-    if re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
+    if EMAIL_PATTERN.match(email):
         return True
     else:
         print("Invalid email format. Please enter a valid email address.")
         return False
 
-def view_profile(cursor, user_id):
+# Profile fields that must be unique across users: column -> (table, message).
+UNIQUE_PROFILE_FIELDS = {
+    'phone': ('user', "This phone number is already in use by another user."),
+    'email': ('user', "This email is already in use by another user."),
+    'ssn': ('us_citizen', "This SSN is already in use by another user."),
+    'passport_id': ('international_student', "This passport ID is already in use by another user."),
+}
+
+def update_profile(conn, user_id, first_name=None, last_name=None, phone=None, email=None,
+                   ssn=None, passport_id=None):
+    """Change the given profile fields after checking formats, roles and uniqueness.
+
+    Fields left as None are unchanged. Raises ProfileError.
+    """
+    if email is not None and not EMAIL_PATTERN.match(email):
+        raise ProfileError("Invalid email format. Please enter a valid email address.")
+    if ssn is not None and not SSN_PATTERN.match(ssn):
+        raise ProfileError("Invalid SSN format. Please use XXX-XX-XXXX or XXXXXXXXX format.")
+
+    cursor = conn.cursor()
+    if ssn is not None:
+        cursor.execute("SELECT 1 FROM us_citizen WHERE user_id = %s", (user_id,))
+        if cursor.fetchone() is None:
+            raise ProfileError("You are not registered as a US Citizen.")
+    if passport_id is not None:
+        cursor.execute("SELECT 1 FROM international_student WHERE user_id = %s", (user_id,))
+        if cursor.fetchone() is None:
+            raise ProfileError("You are not registered as an International Student.")
+
+    values = {'phone': phone, 'email': email, 'ssn': ssn, 'passport_id': passport_id}
+    for column, (table, message) in UNIQUE_PROFILE_FIELDS.items():
+        if values[column] is not None:
+            cursor.execute(f"SELECT 1 FROM {table} WHERE {column} = %s AND user_id != %s",
+                           (values[column], user_id))
+            if cursor.fetchone():
+                raise ProfileError(message)
+
+    changes = {'first_name': first_name, 'last_name': last_name, 'phone': phone, 'email': email}
+    changes = {column: value for column, value in changes.items() if value is not None}
+    if changes:
+        assignments = ', '.join(f"{column} = %s" for column in changes)
+        cursor.execute(f"UPDATE user SET {assignments} WHERE user_id = %s", (*changes.values(), user_id))
+    if ssn is not None:
+        cursor.execute("UPDATE us_citizen SET ssn = %s WHERE user_id = %s", (ssn, user_id))
+    if passport_id is not None:
+        cursor.execute("UPDATE international_student SET passport_id = %s WHERE user_id = %s",
+                       (passport_id, user_id))
+    conn.commit()
+    invalidate(conn, 'user', 'us_citizen', 'international_student')
+
+def format_profile(profile):
+    """A UserProfile as "Label: value" lines, with only the roles held."""
+    lines = [f"Name: {profile.first_name} {profile.last_name}",
+             f"Username: {profile.username}",
+             f"Email: {profile.email}",
+             f"Phone: {profile.phone}",
+             f"Last Login: {profile.last_login}"]
+    if profile.is_landlord:
+        lines.append("Registered as: Landlord")
+    if profile.is_tenant:
+        lines.append("Registered as: Tenant")
+    if profile.is_us_citizen:
+        lines += ["Status: US Citizen", f"SSN: {profile.ssn}"]
+    if profile.is_international_student:
+        lines += ["Status: International Student", f"Passport ID: {profile.passport_id}"]
+    if profile.is_student:
+        lines.append("Status: Student")
+    return '\n'.join(lines) + '\n'
+
+def view_profile(conn, user_id):
     """View user profile information."""
     if not user_id:
         print("You need to login first.")
         return
     
     try:
-        # Get basic user information
-        cursor.execute("""
-        SELECT u.user_id, u.first_name, u.last_name, u.phone, u.email, 
-               ua.username, ua.last_login
-        FROM user u
-        JOIN user_auth ua ON u.auth_id = ua.auth_id
-        WHERE u.user_id = %s
-        """, (user_id,))
-        user_info = cursor.fetchone()
+        profile = get_user_profile(conn, user_id)
         
-        if not user_info:
+        if not profile:
             print("User information not found.")
             return
         
-        print("\n===== USER PROFILE =====")
-        print(f"Name: {user_info[1]} {user_info[2]}")
-        print(f"Username: {user_info[5]}")
-        print(f"Email: {user_info[4]}")
-        print(f"Phone: {user_info[3]}")
-        print(f"Last Login: {user_info[6]}")
-        
-        # Check for landlord status
-        cursor.execute("SELECT * FROM landlord WHERE user_id = %s", (user_id,))
-        landlord_data = cursor.fetchone()
-        
-        if landlord_data:
-            print("Registered as: Landlord")
-        
-        # Check for tenant status
-        cursor.execute("SELECT * FROM tenant WHERE user_id = %s", (user_id,))
-        tenant_data = cursor.fetchone()
-        
-        if tenant_data:
-            print("Registered as: Tenant")
-        
-        # Check for US Citizen status
-        cursor.execute("SELECT ssn FROM us_citizen WHERE user_id = %s", (user_id,))
-        us_citizen = cursor.fetchone()
-        
-        if us_citizen:
-            print("Status: US Citizen")
-            print(f"SSN: {us_citizen[0]}")
-        
-        # Check for International Student status
-        cursor.execute("SELECT passport_id FROM international_student WHERE user_id = %s", (user_id,))
-        intl_student = cursor.fetchone()
-        
-        if intl_student:
-            print("Status: International Student")
-            print(f"Passport ID: {intl_student[0]}")
-        
-        # Check for Student status
-        cursor.execute("SELECT * FROM student WHERE user_id = %s", (user_id,))
-        student = cursor.fetchone()
-        
-        if student:
-            print("Status: Student")
+        out = Renderer()
+        out.heading("USER PROFILE")
+        out.rows([field.name for field in fields(UserProfile)], [tuple(asdict(profile).values())],
+                 lambda row: format_profile(profile))
             
     except Exception as e:
         print(f"Error retrieving profile: {e}")
 
-def update_personal_info(cursor, conn, user_id):
+def update_personal_info(conn, user_id):
     """Update personal information."""
     if not user_id:
         print("You need to login first.")
         return
     
     try:
-        # Get current user information
-        cursor.execute("""
-        SELECT u.user_id, u.first_name, u.last_name, u.phone, u.email, ua.username
-        FROM user u
-        JOIN user_auth ua ON u.auth_id = ua.auth_id
-        WHERE u.user_id = %s
-        """, (user_id,))
-        user_info = cursor.fetchone()
+        cursor = conn.cursor()
+        # Get current user information and roles in one round trip
+        profile = get_user_profile(conn, user_id)
         
-        if not user_info:
+        if not profile:
             print("User information not found.")
             return
         
         print("\n===== UPDATE PERSONAL INFORMATION =====")
-        print(f"Current Name: {user_info[1]} {user_info[2]}")
-        print(f"Current Phone: {user_info[3]}")
-        print(f"Current Email: {user_info[4]}")
+        print(f"Current Name: {profile.first_name} {profile.last_name}")
+        print(f"Current Phone: {profile.phone}")
+        print(f"Current Email: {profile.email}")
         
         print("\nWhich field would you like to update?")
         print("1. Name")
         print("2. Phone")
         print("3. Email")
         
-        # Check for additional user statuses
-        # Check for US Citizen status
-        cursor.execute("SELECT * FROM us_citizen WHERE user_id = %s", (user_id,))
-        us_citizen_data = cursor.fetchone()
-        
-        if us_citizen_data:
+        # Options for additional user statuses
+        if profile.is_us_citizen:
             print("4. SSN (US Citizen)")
         
-        # Check for International Student status
-        cursor.execute("SELECT * FROM international_student WHERE user_id = %s", (user_id,))
-        intl_student_data = cursor.fetchone()
-        
-        if intl_student_data:
+        if profile.is_international_student:
             print("5. Passport ID (International Student)")
         
-        # Check for Student status
-        cursor.execute("SELECT * FROM student WHERE user_id = %s", (user_id,))
-        student_data = cursor.fetchone()
-        
-        if student_data:
+        if profile.is_student:
             print("6. Transcript (Student)")
             
         # Offer additional registration options
-        if not us_citizen_data and not intl_student_data:
+        if not profile.is_us_citizen and not profile.is_international_student:
             print("7. Register as US Citizen or International Student")
         
-        if not student_data:
+        if not profile.is_student:
             print("8. Register as Student")
         
         while True:
@@ -259,19 +381,19 @@ def update_personal_info(cursor, conn, user_id):
                 field_choice = int(field_choice)
                 
                 # Check if choice is valid for the user's status
-                if field_choice == 4 and not us_citizen_data:
+                if field_choice == 4 and not profile.is_us_citizen:
                     print("You are not registered as a US Citizen.")
                     continue
-                if field_choice == 5 and not intl_student_data:
+                if field_choice == 5 and not profile.is_international_student:
                     print("You are not registered as an International Student.")
                     continue
-                if field_choice == 6 and not student_data:
+                if field_choice == 6 and not profile.is_student:
                     print("You are not registered as a Student.")
                     continue
-                if field_choice == 7 and (us_citizen_data or intl_student_data):
+                if field_choice == 7 and (profile.is_us_citizen or profile.is_international_student):
                     print("You are already registered as a US Citizen or International Student.")
                     continue
-                if field_choice == 8 and student_data:
+                if field_choice == 8 and profile.is_student:
                     print("You are already registered as a Student.")
                     continue
                 
@@ -281,11 +403,13 @@ def update_personal_info(cursor, conn, user_id):
         
         if field_choice == 0:
             return
-        elif field_choice == 1:
+        # Fields 1-5 are collected here and written by update_profile().
+        changes = {}
+        if field_choice == 1:
             while True:
-                first_name_input = input(f"First Name [{user_info[1]}]: ")
+                first_name_input = input(f"First Name [{profile.first_name}]: ")
                 if not first_name_input:
-                    first_name = user_info[1]
+                    first_name = profile.first_name
                     break
                 elif first_name_input.strip() and all(c.isalpha() or c.isspace() for c in first_name_input):
                     first_name = first_name_input
@@ -294,9 +418,9 @@ def update_personal_info(cursor, conn, user_id):
                     print("Invalid first name. Please use only letters and spaces.")
             
             while True:
-                last_name_input = input(f"Last Name [{user_info[2]}]: ")
+                last_name_input = input(f"Last Name [{profile.last_name}]: ")
                 if not last_name_input:
-                    last_name = user_info[2]
+                    last_name = profile.last_name
                     break
                 elif last_name_input.strip() and all(c.isalpha() or c.isspace() or c == '-' for c in last_name_input):
                     last_name = last_name_input
@@ -304,76 +428,50 @@ def update_personal_info(cursor, conn, user_id):
                 else:
                     print("Invalid last name. Please use only letters, spaces, and hyphens.")
             
-            update_query = """
-            UPDATE user 
-            SET first_name = %s, last_name = %s
-            WHERE user_id = %s
-            """
-            cursor.execute(update_query, (first_name, last_name, user_id))
+            changes = {'first_name': first_name, 'last_name': last_name}
             
         elif field_choice == 2:
             while True:
-                phone_input = input(f"Phone [{user_info[3]}]: ")
+                phone_input = input(f"Phone [{profile.phone}]: ")
                 if not phone_input:
-                    phone = user_info[3]
+                    phone = profile.phone
                     break
                 else:
                     # Simple validation - could be enhanced
                     phone = phone_input
                     break
             
-            # Check if phone already exists
-            cursor.execute("SELECT * FROM user WHERE phone = %s AND user_id != %s", (phone, user_id))
-            if cursor.fetchone():
-                print("This phone number is already in use by another user.")
-                return
-            
-            update_query = "UPDATE user SET phone = %s WHERE user_id = %s"
-            cursor.execute(update_query, (phone, user_id))
+            changes = {'phone': phone}
             
         elif field_choice == 3:
             while True:
-                email_input = input(f"Email [{user_info[4]}]: ")
+                email_input = input(f"Email [{profile.email}]: ")
                 if not email_input:
-                    email = user_info[4]
+                    email = profile.email
                     break
                 elif validate_email(email_input):
                     email = email_input
                     break
             
-            # Check if email already exists
-            cursor.execute("SELECT * FROM user WHERE email = %s AND user_id != %s", (email, user_id))
-            if cursor.fetchone():
-                print("This email is already in use by another user.")
-                return
-            
-            update_query = "UPDATE user SET email = %s WHERE user_id = %s"
-            cursor.execute(update_query, (email, user_id))
+            changes = {'email': email}
             
-        elif field_choice == 4 and us_citizen_data:
+        elif field_choice == 4 and profile.is_us_citizen:
             while True:
-                ssn_input = input(f"SSN [{us_citizen_data[1]}]: ")
+                ssn_input = input(f"SSN [{profile.ssn}]: ")
                 if not ssn_input:
-                    ssn = us_citizen_data[1]
+                    ssn = profile.ssn
                     break
                 elif validate_ssn(ssn_input):
                     ssn = ssn_input
                     break
             
-            # Check if SSN already exists
-            cursor.execute("SELECT * FROM us_citizen WHERE ssn = %s AND user_id != %s", (ssn, user_id))
-            if cursor.fetchone():
-                print("This SSN is already in use by another user.")
-                return
+            changes = {'ssn': ssn}
             
-            update_query = "UPDATE us_citizen SET ssn = %s WHERE user_id = %s"
-            cursor.execute(update_query, (ssn, user_id))
-            
-        elif field_choice == 5 and intl_student_data:
+        elif field_choice == 5 and profile.is_international_student:
             while True:
-                passport_id_input = input(f"Passport ID [{intl_student_data[1]}]: ")
+                passport_id_input = input(f"Passport ID [{profile.passport_id}]: ")
                 if not passport_id_input:
-                    passport_id = intl_student_data[1]
+                    passport_id = profile.passport_id
                     break
                 elif passport_id_input.strip():
                     passport_id = passport_id_input
@@ -381,23 +479,16 @@ def update_personal_info(cursor, conn, user_id):
                 else:
                     print("Passport ID cannot be empty.")
             
-            # Check if passport ID already exists
-            cursor.execute("SELECT * FROM international_student WHERE passport_id = %s AND user_id != %s", (passport_id, user_id))
-            if cursor.fetchone():
-                print("This passport ID is already in use by another user.")
-                return
-            
-            update_query = "UPDATE international_student SET passport_id = %s WHERE user_id = %s"
-            cursor.execute(update_query, (passport_id, user_id))
+            changes = {'passport_id': passport_id}
             
-        elif field_choice == 6 and student_data:
+        elif field_choice == 6 and profile.is_student:
             # In a real application, you would have a file upload mechanism
             # For this example, we'll just update a placeholder
             update_query = "UPDATE student SET transcript = 'UPDATED_PDF' WHERE user_id = %s"
             cursor.execute(update_query, (user_id,))
             print("Transcript updated. (In a real application, you would upload a file.)")
             
-        elif field_choice == 7 and not us_citizen_data and not intl_student_data:
+        elif field_choice == 7 and not profile.is_us_citizen and not profile.is_international_student:
             print("\nRegister as:")
             print("1. US Citizen")
             print("2. International Student")
@@ -454,7 +545,7 @@ def update_personal_info(cursor, conn, user_id):
                 
                 print("Registered as International Student successfully.")
         
-        elif field_choice == 8 and not student_data:
+        elif field_choice == 8 and not profile.is_student:
             # In a real application, you would have a file upload mechanism
             # For this example, we'll just insert a placeholder
             insert_query = "INSERT INTO student (user_id, transcript) VALUES (%s, 'PDF')"
@@ -462,145 +553,533 @@ def update_personal_info(cursor, conn, user_id):
             print("Registered as Student successfully.")
             print("Transcript placeholder added. (In a real application, you would upload a file.)")
         
-        conn.commit()
+        if changes:
+            update_profile(conn, user_id, **changes)
+        else:
+            conn.commit()
+            invalidate(conn, 'user', 'us_citizen', 'international_student', 'student')
         print("Information updated successfully!")
             
+    except ProfileError as e:
+        print(e)
     except Exception as e:
         print(f"Error updating information: {e}")
 
-def view_available_properties(cursor):
-    """View properties available for rent."""
+def prompt_property_filters(dates=True):
+    """Ask for property search filters; blank answers skip a filter."""
+    # Prepare filters
+    print("\n===== PROPERTY SEARCH FILTERS =====")
+    print("(Leave blank to skip filter)")
+    
+    city = input("City: ")
+    state = input("State: ")
+    
+    min_price = None
+    max_price = None
+    min_sqft = None
+    min_rooms = None
+    
+    min_price_input = input("Minimum Price: ")
+    if min_price_input:
+        try:
+            min_price = float(min_price_input)
+            if min_price < 0:
+                print("Minimum price cannot be negative. Using 0 instead.")
+                min_price = 0
+        except ValueError:
+            print("Invalid input for minimum price. Skipping this filter.")
+    
+    max_price_input = input("Maximum Price: ")
+    if max_price_input:
+        try:
+            max_price = float(max_price_input)
+            if max_price < 0:
+                print("Maximum price cannot be negative. Skipping this filter.")
+                max_price = None
+            elif min_price is not None and max_price < min_price:
+                print("Maximum price cannot be less than minimum price. Skipping this filter.")
+                max_price = None
+        except ValueError:
+            print("Invalid input for maximum price. Skipping this filter.")
+    
+    min_sqft_input = input("Minimum Square Footage: ")
+    if min_sqft_input:
+        try:
+            min_sqft = float(min_sqft_input)
+            if min_sqft < 0:
+                print("Minimum square footage cannot be negative. Using 0 instead.")
+                min_sqft = 0
+        except ValueError:
+            print("Invalid input for minimum square footage. Skipping this filter.")
+    
+    min_rooms_input = input("Minimum Number of Rooms: ")
+    if min_rooms_input:
+        try:
+            min_rooms = int(min_rooms_input)
+            if min_rooms < 1:
+                print("Minimum rooms cannot be less than 1. Using 1 instead.")
+                min_rooms = 1
+        except ValueError:
+            print("Invalid input for minimum rooms. Skipping this filter.")
+    
+    available_from = prompt_date("Available From (YYYY-MM-DD): ") if dates else None
+    available_to = prompt_date("Available Until (YYYY-MM-DD): ") if available_from else None
+    if available_from and (available_to is None or available_to <= available_from):
+        # A single day unless a later end date was given
+        available_to = available_from + timedelta(days=1)
+    
+    return {
+        'city': city,
+        'state': state,
+        'min_price': min_price,
+        'max_price': max_price,
+        'min_sqft': min_sqft,
+        'min_rooms': min_rooms,
+        'available_from': available_from,
+        'available_to': available_to,
+    }
+
+def prompt_date(prompt):
+    """Ask for an optional YYYY-MM-DD date; returns None when skipped or invalid."""
+    text = input(prompt).strip()
+    if not text:
+        return None
     try:
-        # Prepare filters
-        print("\n===== PROPERTY SEARCH FILTERS =====")
-        print("(Leave blank to skip filter)")
-        
-        city = input("City: ")
-        state = input("State: ")
+        return date.fromisoformat(text)
+    except ValueError:
+        print("Invalid date. Please use YYYY-MM-DD. Skipping this filter.")
+        return None
+
+def build_property_search(filters):
+    """Build the listing search SQL and parameters for a filter set."""
+    city = filters.get('city')
+    state = filters.get('state')
+    min_price = filters.get('min_price')
+    max_price = filters.get('max_price')
+    min_sqft = filters.get('min_sqft')
+    min_rooms = filters.get('min_rooms')
+    
+    # Build query with filters
+    if filters.get('available_from'):
+        # Free for the dates asked about, even if let today: no stay
+        # overlapping [available_from, available_to)
+        query = LISTING_SELECT + (" WHERE NOT EXISTS (SELECT 1 FROM rent r WHERE r.property_id = p.property_id"
+                                  " AND r.end_date > %s AND r.start_date < %s)")
+        params = [filters['available_from'], filters['available_to']]
+    else:
+        query = LISTING_QUERY
+        params = []
+    
+    # Add filters to query
+    if city:
+        query += " AND p.city = %s"
+        params.append(city)
+    
+    if state:
+        query += " AND p.state = %s"
+        params.append(state)
+    
+    if min_price is not None:
+        query += " AND p.price >= %s"
+        params.append(min_price)
+    
+    if max_price is not None:
+        query += " AND p.price <= %s"
+        params.append(max_price)
+    
+    if min_sqft is not None:
+        query += " AND p.square_foot >= %s"
+        params.append(min_sqft)
+    
+    if min_rooms is not None:
+        query += " AND p.room_amount >= %s"
+        params.append(min_rooms)
+    
+    return query, params
+
+def index_filters(conn, filters, availability):
+    """Search filters for PropertySearchIndex, or None if it cannot apply them.
+
+    A date range becomes the list of properties the AvailabilityIndex has
+    booked during it, and listings let today can match; without that
+    index, date searches go to SQL.
+    """
+    filters = dict(filters)
+    start = filters.pop('available_from', None)
+    end = filters.pop('available_to', None)
+    if start:
+        if availability is None:
+            return None
+        availability.catch_up(conn)
+        filters['exclude'] = availability.busy(start, end)
+        filters['for_rent'] = False
+    return filters
+
+def search_available_properties(conn, filters, index=None, availability=None):
+    """Return for-rent listings (or with dates, those free then) matching filters, by price."""
+    if index is not None:
+        index.catch_up(conn)
+        in_memory = index_filters(conn, filters, availability)
+        if in_memory is not None:
+            return index.search(**in_memory)
+    
+    query, params = build_property_search(filters)
+    
+    # Order by price
+    query += " ORDER BY p.price, p.property_id"
+    
+    return cached_fetchall(conn, query, params)
+
+def search_properties_page(conn, filters, after=None, page_size=PAGE_SIZE, index=None, availability=None):
+    """Return one page of listings after the (price, property_id) key `after`.
+
+    Keyset pagination lets MySQL seek straight to the next page instead of
+    skipping OFFSET rows, so every page costs the same. A page can run past
+    page_size to include all of its last listing's neighborhood rows.
+    """
+    if index is not None:
+        index.catch_up(conn)
+        in_memory = index_filters(conn, filters, availability)
+        if in_memory is not None:
+            return index.search_page(after=after, limit=page_size, **in_memory)
+    
+    query, params = build_property_search(filters)
+    
+    if after is not None:
+        query += " AND (p.price > %s OR (p.price = %s AND p.property_id > %s))"
+        params.extend([after[0], after[0], after[1]])
+    
+    query += " ORDER BY p.price, p.property_id LIMIT %s"
+    params.append(page_size)
+    
+    page = cached_fetchall(conn, query, params)
+    if len(page) == page_size:
+        # A listing in several neighborhoods has a row per neighborhood. The
+        # next page starts after the last listing's key, so fetch all of its
+        # rows rather than end the page part way through them.
+        last_id = page[-1][0]
+        query, params = build_property_search(filters)
+        rest = cached_fetchall(conn, query + " AND p.property_id = %s", params + [last_id])
+        page = tuple(row for row in page if row[0] != last_id) + tuple(rest)
+    return page
+
+def paginate_properties(conn, filters, page_size=PAGE_SIZE, index=None, availability=None):
+    """Yield pages of matching listings until the results run out."""
+    after = None
+    while True:
+        page = search_properties_page(conn, filters, after, page_size, index, availability)
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+        after = (last[7], last[0])
+
+def stream_properties(conn, filters, page_size=PAGE_SIZE):
+    """Yield pages of matching listings from an unbuffered server-side cursor.
+
+    Rows are read off the socket as they are consumed, so memory use does
+    not depend on how many listings match.
+    """
+    query, params = build_property_search(filters)
+    query += " ORDER BY p.price, p.property_id"
+    
+    cursor = conn.cursor(pymysql.cursors.SSCursor)
+    try:
+        cursor.execute(query, params)
+        while True:
+            page = cursor.fetchmany(page_size)
+            if not page:
+                return
+            yield page
+    finally:
+        cursor.close()
+
+def format_property(prop):
+    """One listing row as a "Label: value" block."""
+    text = (f"\nProperty ID: {prop[0]}\n"
+            f"Address: {prop[1]} {prop[2]}, {prop[3]}, {prop[4]}\n"
+            f"Room: {prop[5]}\n"
+            f"Square Footage: {prop[6]} sq ft\n"
+            f"Price: ${prop[7]}\n"
+            f"Number of Rooms: {prop[8]}\n"
+            f"Landlord: {prop[9]} {prop[10]}\n")
+    if prop[11]:
+        text += f"Neighborhood: {prop[11]}\n"
+    return text
+
+def view_available_properties(conn, index=None, page_size=PAGE_SIZE, stream=False, availability=None):
+    """View properties available for rent, one page at a time."""
+    try:
+        filters = prompt_property_filters()
         
-        min_price = None
-        max_price = None
-        min_sqft = None
-        min_rooms = None
+        if stream:
+            pages = stream_properties(conn, filters, page_size)
+        else:
+            pages = paginate_properties(conn, filters, page_size, index, availability)
+        
+        out = Renderer()
+        shown = 0
+        try:
+            for page_number, properties in enumerate(pages, start=1):
+                out.heading(f"AVAILABLE PROPERTIES (page {page_number})")
+                shown += out.rows(LISTING_FIELDS, properties, format_property, header=shown == 0)
+                
+                if len(properties) < page_size:
+                    break
+                if out.machine_readable:
+                    # JSON lines and CSV are written out in full, without paging
+                    continue
+                more = input(f"\nShowing {shown} so far. Press Enter for more or 'q' to stop: ")
+                if more.strip().lower() == 'q':
+                    break
+        finally:
+            pages.close()
         
-        min_price_input = input("Minimum Price: ")
-        if min_price_input:
-            try:
-                min_price = float(min_price_input)
-                if min_price < 0:
-                    print("Minimum price cannot be negative. Using 0 instead.")
-                    min_price = 0
-            except ValueError:
-                print("Invalid input for minimum price. Skipping this filter.")
+        if shown == 0:
+            print("No available properties found matching your criteria.")
         
-        max_price_input = input("Maximum Price: ")
-        if max_price_input:
-            try:
-                max_price = float(max_price_input)
-                if max_price < 0:
-                    print("Maximum price cannot be negative. Skipping this filter.")
-                    max_price = None
-                elif min_price is not None and max_price < min_price:
-                    print("Maximum price cannot be less than minimum price. Skipping this filter.")
-                    max_price = None
-            except ValueError:
-                print("Invalid input for maximum price. Skipping this filter.")
+    except Exception as e:
+        print(f"Error retrieving available properties: {e}")
+
+def search_properties_text(conn, text, limit=PAGE_SIZE, text_index=None):
+    """Return listings whose street, city, zip or neighborhood match free text.
+
+    With a TrigramIndex the matches are fuzzy and ranked best first;
+    without one every word must appear somewhere, which scans the listings.
+    """
+    if text_index is not None:
+        text_index.catch_up(conn)
+        return text_index.search(text, limit)
+    
+    query = LISTING_QUERY
+    params = []
+    for word in text.split():
+        query += (" AND (p.street_name LIKE %s OR p.city LIKE %s"
+                  " OR CAST(p.zip AS CHAR) LIKE %s OR n.name LIKE %s)")
+        params.extend([f"%{word}%"] * 4)
+    query += " ORDER BY p.price, p.property_id LIMIT %s"
+    params.append(limit)
+    
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+def view_properties_by_text(conn, text_index=None):
+    """Search available properties by address, city, zip or neighborhood."""
+    try:
+        text = input("Search (street, city, zip or neighborhood): ").strip()
+        if not text:
+            print("Please enter something to search for.")
+            return
         
-        min_sqft_input = input("Minimum Square Footage: ")
-        if min_sqft_input:
-            try:
-                min_sqft = float(min_sqft_input)
-                if min_sqft < 0:
-                    print("Minimum square footage cannot be negative. Using 0 instead.")
-                    min_sqft = 0
-            except ValueError:
-                print("Invalid input for minimum square footage. Skipping this filter.")
+        properties = search_properties_text(conn, text, text_index=text_index)
+        if not properties:
+            print("No available properties found matching your search.")
+            return
         
-        min_rooms_input = input("Minimum Number of Rooms: ")
-        if min_rooms_input:
-            try:
-                min_rooms = int(min_rooms_input)
-                if min_rooms < 1:
-                    print("Minimum rooms cannot be less than 1. Using 1 instead.")
-                    min_rooms = 1
-            except ValueError:
-                print("Invalid input for minimum rooms. Skipping this filter.")
+        out = Renderer()
+        out.heading(f"PROPERTIES MATCHING '{text}'")
+        out.rows(LISTING_FIELDS, properties, format_property)
         
-        # Build query with filters
+    except Exception as e:
+        print(f"Error searching properties: {e}")
+
+def find_similar_properties(conn, property_id, limit=5, similar_index=None):
+    """Return listing rows of the for-rent properties most like property_id, closest first.
+
+    A SimilarityIndex scores the whole catalogue in memory on price, size,
+    rooms, zip and neighborhood; without one, listings in the same zip come
+    first, then the closest in price.
+    """
+    if similar_index is not None:
+        ids = [pid for pid, _ in similar_index.similar(property_id, limit, conn)]
+    else:
         query = """
-        SELECT p.property_id, p.street_number, p.street_name, p.city, p.state, 
-               p.room_number, p.square_foot, p.price, p.room_amount,
-               u.first_name AS landlord_first_name, u.last_name AS landlord_last_name,
-               n.name AS neighborhood_name
-        FROM properties p
-        JOIN landlord l ON p.landlord_id = l.user_id
-        JOIN user u ON l.user_id = u.user_id
-        LEFT JOIN property_neighborhood pn ON p.property_id = pn.property_id
-        LEFT JOIN neighborhood n ON pn.neighborhood_id = n.neighborhood_id
-        WHERE p.for_rent = 1
+        SELECT p.property_id
+        FROM properties a
+        JOIN properties p ON p.for_rent = 1 AND p.property_id <> a.property_id
+        WHERE a.property_id = %s
+        ORDER BY (p.zip = a.zip) DESC, ABS(p.price - a.price), p.property_id
+        LIMIT %s
         """
+        cursor = conn.cursor()
+        cursor.execute(query, (property_id, limit))
+        ids = [row[0] for row in cursor.fetchall()]
+    if not ids:
+        return []
+    
+    query = LISTING_QUERY + f" AND p.property_id IN ({', '.join(['%s'] * len(ids))})"
+    cursor = conn.cursor()
+    cursor.execute(query, ids)
+    rank = {pid: n for n, pid in enumerate(ids)}
+    return sorted(cursor.fetchall(), key=lambda row: rank[row[0]])
+
+def view_similar_properties(conn, similar_index=None):
+    """Show available properties similar to a given one."""
+    try:
+        property_id = input("Enter the Property ID to find similar listings for: ")
+        if not property_id.isdigit():
+            print("Invalid property ID. Please enter a number.")
+            return
         
-        # Add filters to query
-        params = []
-        
-        if city:
-            query += " AND p.city = %s"
-            params.append(city)
-        
-        if state:
-            query += " AND p.state = %s"
-            params.append(state)
-        
-        if min_price is not None:
-            query += " AND p.price >= %s"
-            params.append(min_price)
-        
-        if max_price is not None:
-            query += " AND p.price <= %s"
-            params.append(max_price)
-        
-        if min_sqft is not None:
-            query += " AND p.square_foot >= %s"
-            params.append(min_sqft)
+        properties = find_similar_properties(conn, int(property_id), similar_index=similar_index)
+        if not properties:
+            print("No similar properties found.")
+            return
         
-        if min_rooms is not None:
-            query += " AND p.room_amount >= %s"
-            params.append(min_rooms)
-            
-        # Order by price
-        query += " ORDER BY p.price"
+        out = Renderer()
+        out.heading(f"PROPERTIES SIMILAR TO #{property_id}")
+        out.rows(LISTING_FIELDS, properties, format_property)
         
-        cursor.execute(query, params)
-        properties = cursor.fetchall()
+    except Exception as e:
+        print(f"Error finding similar properties: {e}")
+
+def describe_search(search):
+    """One-line summary of a SavedSearch's filters."""
+    parts = [', '.join(part for part in (search.city, search.state) if part)]
+    if search.min_price is not None and search.max_price is not None:
+        parts.append(f"${search.min_price}-${search.max_price}")
+    elif search.min_price is not None:
+        parts.append(f"from ${search.min_price}")
+    elif search.max_price is not None:
+        parts.append(f"up to ${search.max_price}")
+    if search.min_sqft is not None:
+        parts.append(f"{search.min_sqft}+ sq ft")
+    if search.min_rooms is not None:
+        parts.append(f"{search.min_rooms}+ rooms")
+    return ', '.join(part for part in parts if part) or "any listing"
+
+def manage_saved_searches(conn, user_id, saved_searches=None):
+    """Show new matches for the user's saved searches, and add or delete searches."""
+    try:
+        matches = take_notifications(conn, user_id)
+        if matches:
+            print("\n===== NEW MATCHES =====")
+            for match in matches:
+                print(f"\n[{match[2] or f'Search #{match[1]}'}] Property ID: {match[4]}")
+                print(f"Address: {match[5]} {match[6]}, {match[7]}, {match[8]}")
+                print(f"Price: ${match[11]}, {match[12]} rooms, {match[10]} sq ft")
+        
+        searches = list_saved_searches(conn, user_id)
+        print("\n===== SAVED SEARCHES =====")
+        if not searches:
+            print("You have no saved searches.")
+        for search in searches:
+            print(f"{search.search_id}. {search.name or 'Unnamed'}: {describe_search(search)}")
+        
+        action = input("\nEnter 'a' to add a search, 'd' to delete one, or press Enter to go back: ").strip().lower()
+        if action == 'a':
+            filters = prompt_property_filters(dates=False)
+            name = input("Name for this search: ").strip()
+            search_id = save_search(conn, user_id, filters, name[:64])
+            if saved_searches is not None:
+                saved_searches.catch_up(conn)
+            print(f"Search #{search_id} saved. New matching listings will show up here.")
+        elif action == 'd':
+            search_id = input("Enter the ID of the search to delete: ")
+            if not search_id.isdigit():
+                print("Invalid search ID. Please enter a number.")
+            elif delete_saved_search(conn, user_id, int(search_id)):
+                if saved_searches is not None:
+                    saved_searches.remove(int(search_id))
+                print("Search deleted.")
+            else:
+                print("Saved search not found.")
         
-        if not properties:
-            print("No available properties found matching your criteria.")
+    except Exception as e:
+        print(f"Error managing saved searches: {e}")
+
+def format_market_summary(summary):
+    """A MarketSummary as "Label: value" lines."""
+    def money(value):
+        return f"${value:,.2f}" if value is not None else "n/a"
+    vacancy = f"{summary.vacancy_rate:.1%}" if summary.vacancy_rate is not None else "n/a"
+    return (f"\n{summary.name} ({summary.kind})\n"
+            f"Listings: {summary.listings} ({summary.vacant} vacant, {vacancy})\n"
+            f"Median Rent: {money(summary.median_rent)} "
+            f"(middle half {money(summary.rent_p25)} to {money(summary.rent_p75)})\n"
+            f"Median Rent per Sq Ft: {money(summary.median_ppsf)} "
+            f"(middle half {money(summary.ppsf_p25)} to {money(summary.ppsf_p75)})\n")
+
+def view_market_stats(conn, market):
+    """Show rent levels and vacancy for an area, or for the largest areas of a kind."""
+    try:
+        kind = input(f"Area type ({', '.join(KINDS)}) [city]: ").strip().lower() or 'city'
+        if kind not in KINDS:
+            print("Invalid area type.")
             return
+        name = 'all' if kind == 'all' else input("Name (leave blank for the areas with the most listings): ").strip()
+        if name:
+            summary = market.get(conn, kind, name)
+            if summary is None:
+                print(f"No market data for {kind} '{name}'.")
+                return
+            summaries = [summary]
+        else:
+            summaries = market.areas(conn, kind)
         
-        print(f"\n===== AVAILABLE PROPERTIES ({len(properties)}) =====")
-        
-        for prop in properties:
-            print(f"\nProperty ID: {prop[0]}")
-            print(f"Address: {prop[1]} {prop[2]}, {prop[3]}, {prop[4]}")
-            print(f"Room: {prop[5]}")
-            print(f"Square Footage: {prop[6]} sq ft")
-            print(f"Price: ${prop[7]}")
-            print(f"Number of Rooms: {prop[8]}")
-            print(f"Landlord: {prop[9]} {prop[10]}")
-            
-            if prop[11]:
-                print(f"Neighborhood: {prop[11]}")
+        out = Renderer()
+        out.heading("MARKET STATISTICS")
+        out.rows(MARKET_FIELDS, summaries, format_market_summary)
         
     except Exception as e:
-        print(f"Error retrieving available properties: {e}")
+        print(f"Error retrieving market statistics: {e}")
+
+def fetch_rentals(conn, user_id):
+    """Return the user's rentals with property, landlord and broker details, newest first."""
+    query = """
+    SELECT r.rent_id, r.property_id, r.start_date, r.end_date, r.price, r.broker_fee,
+           p.street_number, p.street_name, p.city, p.state, p.room_number, p.square_foot,
+           u.first_name AS landlord_first_name, u.last_name AS landlord_last_name, 
+           u.phone AS landlord_phone, u.email AS landlord_email,
+           b.first_name AS broker_first_name, b.last_name AS broker_last_name
+    FROM rent r
+    JOIN properties p ON r.property_id = p.property_id
+    JOIN landlord l ON p.landlord_id = l.user_id
+    JOIN user u ON l.user_id = u.user_id
+    LEFT JOIN broker b ON r.broker_id = b.broker_id
+    WHERE r.tenant_id = %s
+    ORDER BY r.end_date DESC
+    """
+    cursor = conn.cursor()
+    cursor.execute(query, (user_id,))
+    return cursor.fetchall()
+
+# Column names of the rows returned by fetch_rentals().
+RENTAL_FIELDS = (
+    'rent_id', 'property_id', 'start_date', 'end_date', 'price', 'broker_fee',
+    'street_number', 'street_name', 'city', 'state', 'room_number', 'square_foot',
+    'landlord_first_name', 'landlord_last_name', 'landlord_phone', 'landlord_email',
+    'broker_first_name', 'broker_last_name',
+)
+
+def format_current_rental(rental):
+    """A fetch_rentals() row of a current or upcoming stay, with contacts."""
+    text = (f"\nRental ID: {rental[0]}\n"
+            f"Property: {rental[6]} {rental[7]}, {rental[8]}, {rental[9]}, Room {rental[10]}\n"
+            f"Square Footage: {rental[11]} sq ft\n"
+            f"Rental Period: {rental[2]} to {rental[3]}\n"
+            f"Monthly Rent: ${rental[4]}\n")
+    if rental[5] and rental[16]:
+        text += f"Broker: {rental[16]} {rental[17]}\nBroker Fee: ${rental[5]}\n"
+    return text + (f"Landlord: {rental[12]} {rental[13]}\n"
+                   f"Landlord Contact: {rental[14]} / {rental[15]}\n")
 
-def view_my_rentals(cursor, user_id):
+def format_past_rental(rental):
+    return (f"\nRental ID: {rental[0]}\n"
+            f"Property: {rental[6]} {rental[7]}, {rental[8]}, {rental[9]}, Room {rental[10]}\n"
+            f"Rental Period: {rental[2]} to {rental[3]}\n"
+            f"Monthly Rent: ${rental[4]}\n")
+
+def view_my_rentals(conn, user_id):
     """View properties rented by the current user."""
     if not user_id:
         print("You need to login first.")
         return
     
     try:
+        cursor = conn.cursor()
         # Check if user is a tenant
         cursor.execute("SELECT * FROM tenant WHERE user_id = %s", (user_id,))
         is_tenant = cursor.fetchone()
@@ -613,6 +1092,7 @@ def view_my_rentals(cursor, user_id):
                     if register == 'y':
                         cursor.execute("INSERT INTO tenant (user_id) VALUES (%s)", (user_id,))
                         conn.commit()
+                        invalidate(conn, 'tenant')
                         print("You have been registered as a tenant.")
                     else:
                         return
@@ -620,75 +1100,105 @@ def view_my_rentals(cursor, user_id):
                 else:
                     print("Invalid input. Please enter 'y' or 'n'.")
         
-        query = """
-        SELECT r.rent_id, r.property_id, r.start_date, r.end_date, r.price, r.broker_fee,
-               p.street_number, p.street_name, p.city, p.state, p.room_number, p.square_foot,
-               u.first_name AS landlord_first_name, u.last_name AS landlord_last_name, 
-               u.phone AS landlord_phone, u.email AS landlord_email,
-               b.first_name AS broker_first_name, b.last_name AS broker_last_name
-        FROM rent r
-        JOIN properties p ON r.property_id = p.property_id
-        JOIN landlord l ON p.landlord_id = l.user_id
-        JOIN user u ON l.user_id = u.user_id
-        LEFT JOIN broker b ON r.broker_id = b.broker_id
-        WHERE r.tenant_id = %s
-        ORDER BY r.end_date DESC
-        """
-        cursor.execute(query, (user_id,))
-        rentals = cursor.fetchall()
+        rentals = fetch_rentals(conn, user_id)
         
         if not rentals:
             print("You don't have any property rentals.")
             return
         
-        print("\n===== MY RENTALS =====")
+        out = Renderer()
+        out.heading("MY RENTALS")
         
-        today = datetime.now().date()
+        # Rentals come newest end date first, so current ones lead
+        today = date.today()
+        split = next((i for i, rental in enumerate(rentals) if rental[3] <= today), len(rentals))
         
-        # Separate current and past rentals
-        current_rentals = [r for r in rentals if r[3] >= today]
-        past_rentals = [r for r in rentals if r[3] < today]
-        
-        if current_rentals:
-            print("\nCURRENT RENTALS:")
-            for rental in current_rentals:
-                print(f"\nRental ID: {rental[0]}")
-                print(f"Property: {rental[6]} {rental[7]}, "
-                      f"{rental[8]}, {rental[9]}, Room {rental[10]}")
-                print(f"Square Footage: {rental[11]} sq ft")
-                print(f"Rental Period: {rental[2]} to {rental[3]}")
-                print(f"Monthly Rent: ${rental[4]}")
-                
-                if rental[5] and rental[16]:
-                    print(f"Broker: {rental[16]} {rental[17]}")
-                    print(f"Broker Fee: ${rental[5]}")
-                
-                print(f"Landlord: {rental[12]} {rental[13]}")
-                print(f"Landlord Contact: {rental[14]} / {rental[15]}")
-        
-        if past_rentals:
-            print("\nPAST RENTALS:")
-            for rental in past_rentals:
-                print(f"\nRental ID: {rental[0]}")
-                print(f"Property: {rental[6]} {rental[7]}, "
-                      f"{rental[8]}, {rental[9]}, Room {rental[10]}")
-                print(f"Rental Period: {rental[2]} to {rental[3]}")
-                print(f"Monthly Rent: ${rental[4]}")
+        if split:
+            out.text("\nCURRENT RENTALS:\n")
+            out.rows(RENTAL_FIELDS, rentals[:split], format_current_rental)
+        
+        if split < len(rentals):
+            out.text("\nPAST RENTALS:\n")
+            out.rows(RENTAL_FIELDS, rentals[split:], format_past_rental, header=not split)
         
     except Exception as e:
         print(f"Error retrieving rentals: {e}")
 
-def rent_property(cursor, conn, user_id):
+def stays_overlapping(conn, property_id, start_date, end_date, availability=None):
+    """Return the (start_date, end_date) stays of a property overlapping [start_date, end_date)."""
+    if availability is not None:
+        availability.catch_up(conn)
+        return availability.conflicts(property_id, start_date, end_date)
+    
+    query = """
+    SELECT start_date, end_date FROM rent
+    WHERE property_id = %s AND end_date > %s AND start_date < %s
+    ORDER BY start_date
+    """
+    cursor = conn.cursor()
+    cursor.execute(query, (property_id, start_date, end_date))
+    return cursor.fetchall()
+
+def upcoming_stays(conn, property_id, availability=None):
+    """Return a property's current and future (start_date, end_date) stays."""
+    if availability is not None:
+        availability.catch_up(conn)
+        today = date.today()
+        return [stay for stay in availability.bookings(property_id) if stay[1] > today]
+    
+    query = """
+    SELECT start_date, end_date FROM rent
+    WHERE property_id = %s AND end_date > CURRENT_DATE
+    ORDER BY start_date
+    """
+    cursor = conn.cursor()
+    cursor.execute(query, (property_id,))
+    return cursor.fetchall()
+
+def choose_broker(conn, brokers, page_size=10):
+    """Let the user page through or search the broker directory; returns a broker_id or None."""
+    query = ''
+    offset = 0
+    while True:
+        if query:
+            page, more = brokers.search(conn, query, offset, page_size)
+        else:
+            page, more = brokers.page(conn, offset, page_size)
+        if not page and offset == 0:
+            print(f"No brokers match '{query}'." if query else "No brokers available in the system.")
+            if not query:
+                return None
+        else:
+            print(f"\nBrokers matching '{query}':" if query else "\nAvailable Brokers:")
+            for broker in page:
+                print(f"{broker.broker_id}. {broker.first_name} {broker.last_name} ({broker.tenants} tenants)")
+        
+        prompt = "Enter Broker ID, a name to search"
+        prompt += ", Enter for more" if more else ""
+        choice = input(prompt + ", or 0 to skip: ").strip()
+        if not choice:
+            offset = offset + page_size if more else 0
+        elif choice.isdigit():
+            if int(choice) == 0:
+                return None
+            if brokers.get(conn, int(choice)) is not None:
+                return int(choice)
+            print("Invalid broker ID. Please select from the list.")
+        else:
+            query, offset = choice, 0
+
+def rent_property(conn, user_id, indexes=None, brokers=None):
     """Rent a property."""
     if not user_id:
         print("You need to login first.")
         return
     
     try:
+        cursor = conn.cursor()
         # Check if user is a tenant
-        tenant_status = check_tenant_status(cursor, user_id)
-        if not tenant_status:
-            register_as_tenant(cursor, conn, user_id)
+        tenant_status = check_tenant_status(conn, user_id)
+        if not tenant_status and register_as_tenant(conn, user_id):
+            print("You have been registered as a tenant.")
         
         property_id = input("Enter the Property ID you want to rent: ")
         if not property_id.isdigit():
@@ -697,40 +1207,51 @@ def rent_property(cursor, conn, user_id):
         
         property_id = int(property_id)
         
-        # Check if property exists and is available for rent
+        # Check if property exists; it can be booked for any free dates
         query = """
-        SELECT p.*, u.first_name, u.last_name
+        SELECT p.property_id, p.street_number, p.street_name, p.city, p.state,
+               p.room_number, p.square_foot, p.zip, p.price, p.room_amount,
+               p.landlord_id, u.first_name, u.last_name
         FROM properties p
         JOIN landlord l ON p.landlord_id = l.user_id
         JOIN user u ON l.user_id = u.user_id
-        WHERE p.property_id = %s AND p.for_rent = 1
+        WHERE p.property_id = %s
         """
         cursor.execute(query, (property_id,))
         property_data = cursor.fetchone()
         
         if not property_data:
-            print("Property not found or not available for rent.")
+            print("Property not found.")
             return
         
-        # Check if property is already rented by this tenant
-        query = """
-        SELECT * FROM rent 
-        WHERE property_id = %s AND tenant_id = %s AND end_date >= CURRENT_DATE
-        """
-        cursor.execute(query, (property_id, user_id))
-        existing_rental = cursor.fetchone()
+        availability = indexes.availability if indexes else None
+        booked = upcoming_stays(conn, property_id, availability)
         
-        if existing_rental:
-            print("You are already renting this property.")
-            return
+        # End the read transaction so no snapshot is held while the user types.
+        conn.rollback()
         
         print("\n===== RENT PROPERTY =====")
         print(f"Property: {property_data[1]} {property_data[2]}, "
               f"{property_data[3]}, {property_data[4]}, Room {property_data[5]}")
         print(f"Landlord: {property_data[11]} {property_data[12]}")
         print(f"Monthly Rent: ${property_data[8]}")
+        if booked:
+            print("Already booked: " + ", ".join(f"{start} to {end}" for start, end in booked))
         
         # Ask for rental details with validation
+        today = datetime.now().date()
+        while True:
+            start_date_input = input("Start Date (YYYY-MM-DD, blank for today): ").strip()
+            try:
+                start_date = date.fromisoformat(start_date_input) if start_date_input else today
+            except ValueError:
+                print("Please enter the date as YYYY-MM-DD.")
+                continue
+            if start_date < today:
+                print("The start date cannot be in the past.")
+            else:
+                break
+        
         while True:
             contract_length_input = input("Contract Length (months): ")
             if contract_length_input.isdigit() and int(contract_length_input) > 0:
@@ -739,6 +1260,15 @@ def rent_property(cursor, conn, user_id):
             else:
                 print("Please enter a positive number for contract length.")
         
+        end_date = add_months(start_date, contract_length)
+        conflicts = stays_overlapping(conn, property_id, start_date, end_date, availability)
+        conn.rollback()
+        if conflicts:
+            print("Sorry, this property is already booked from "
+                  + ", ".join(f"{start} to {end}" for start, end in conflicts)
+                  + ". Please choose other dates.")
+            return
+        
         # Ask if using a broker
         while True:
             use_broker_input = input("Do you want to use a broker for this rental? (y/n): ").lower()
@@ -752,53 +1282,18 @@ def rent_property(cursor, conn, user_id):
         broker_fee = None
         
         if use_broker:
-            # Show available brokers
-            cursor.execute("SELECT broker_id, first_name, last_name FROM broker")
-            brokers = cursor.fetchall()
-            
-            if not brokers:
-                print("No brokers available in the system.")
-                use_broker = False
-            else:
-                print("\nAvailable Brokers:")
-                for broker in brokers:
-                    print(f"{broker[0]}. {broker[1]} {broker[2]}")
-                
+            broker_id = choose_broker(conn, brokers if brokers is not None else BrokerDirectory())
+            if broker_id is not None:
                 while True:
-                    broker_choice = input("Enter Broker ID (or 0 to skip): ")
-                    if broker_choice.isdigit():
-                        broker_id = int(broker_choice)
-                        if broker_id == 0:
-                            broker_id = None
-                            break
-                            
-                        # Verify broker exists
-                        broker_exists = False
-                        for broker in brokers:
-                            if broker[0] == broker_id:
-                                broker_exists = True
-                                break
-                        
-                        if broker_exists:
-                            while True:
-                                broker_fee_input = input("Broker Fee ($): ")
-                                if broker_fee_input.replace('.', '', 1).isdigit():
-                                    broker_fee = float(broker_fee_input)
-                                    if broker_fee < 0:
-                                        print("Broker fee cannot be negative.")
-                                    else:
-                                        break
-                                else:
-                                    print("Please enter a valid number for broker fee.")
-                            break
+                    broker_fee_input = input("Broker Fee ($): ")
+                    if broker_fee_input.replace('.', '', 1).isdigit():
+                        broker_fee = float(broker_fee_input)
+                        if broker_fee < 0:
+                            print("Broker fee cannot be negative.")
                         else:
-                            print("Invalid broker ID. Please select from the list.")
+                            break
                     else:
-                        print("Invalid input. Please enter a number.")
-        
-        # Calculate dates
-        start_date = datetime.now().date()
-        end_date = start_date + timedelta(days=30 * contract_length)
+                        print("Please enter a valid number for broker fee.")
         
         # Confirm rental
         print("\nRental Summary:")
@@ -823,35 +1318,33 @@ def rent_property(cursor, conn, user_id):
             else:
                 print("Invalid input. Please enter 'y' or 'n'.")
         
-        # Insert rental
-        insert_query = """
-        INSERT INTO rent (tenant_id, property_id, contract_length, price, broker_fee, broker_id, start_date, end_date)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(insert_query, (user_id, property_id, contract_length, 
-                                     property_data[8], broker_fee, broker_id, start_date, end_date))
-        
-        # Insert broker-tenant relationship if not exists and broker is used
-        if broker_id:
-            query = """
-            SELECT * FROM broker_tenant 
-            WHERE broker_id = %s AND tenant_id = %s
-            """
-            cursor.execute(query, (broker_id, user_id))
-            if not cursor.fetchone():
-                query = """
-                INSERT INTO broker_tenant (broker_id, tenant_id)
-                VALUES (%s, %s)
-                """
-                cursor.execute(query, (broker_id, user_id))
-        
-        # Update property availability
-        query = "UPDATE properties SET for_rent = 0 WHERE property_id = %s"
-        cursor.execute(query, (property_id,))
+        # Book in one short transaction now that every input is collected
+        request = BookingRequest(
+            tenant_id=user_id,
+            property_id=property_id,
+            contract_length=contract_length,
+            broker_id=broker_id,
+            broker_fee=broker_fee,
+            start_date=start_date,
+        )
+        try:
+            rent_id = book_property(conn, request)
+        except PropertyUnavailable:
+            print("Sorry, someone else just booked this property for those dates.")
+            return
         
-        conn.commit()
+        if indexes is not None:
+            indexes.booked(request, rent_id)
+        if broker_id and brokers is not None:
+            brokers.tenant_linked(conn, broker_id)
         print("Property rented successfully!")
         
+        similar = find_similar_properties(conn, property_id, 3, indexes.similar if indexes else None)
+        if similar:
+            print("\nYou might also like:")
+            for prop in similar:
+                print(f"  #{prop[0]}: {prop[1]} {prop[2]}, {prop[3]}, {prop[4]} - ${prop[7]}")
+        
     except Exception as e:
         print(f"Error renting property: {e}")
 
@@ -863,29 +1356,80 @@ def display_menu():
     print("3. View Available Properties")
     print("4. View My Rentals")
     print("5. Rent a Property")
+    print("6. Search Properties by Address")
+    print("7. View Similar Properties")
+    print("8. Saved Searches and Matches")
+    print("9. Market Statistics")
     print("0. Logout")
     
     while True:
         choice = input("Enter your choice: ")
-        if choice in ['0', '1', '2', '3', '4', '5']:
+        if choice in ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9']:
             return choice
         else:
-            print("Invalid choice. Please enter a number between 0 and 5.")
+            print("Invalid choice. Please enter a number between 0 and 9.")
+
+# Names under which each menu choice is reported in query metrics.
+MENU_ACTIONS = {
+    '1': 'view_profile',
+    '2': 'update_personal_info',
+    '3': 'view_available_properties',
+    '4': 'view_my_rentals',
+    '5': 'rent_property',
+    '6': 'view_properties_by_text',
+    '7': 'view_similar_properties',
+    '8': 'manage_saved_searches',
+    '9': 'view_market_stats',
+}
 
 def main():
     try:
-        # Connect to the database
-        conn = pymysql.connect(
-            host='localhost',
-            database='rental_system',
-            user='root',
-            password='red',
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.Cursor
+        # Per-action query statistics, exported for scraping when a path is set
+        slow_query_ms = os.environ.get('RENTAL_SLOW_QUERY_MS')
+        metrics = Metrics(
+            slow_query_ms=float(slow_query_ms) if slow_query_ms else None,
+            slow_log_path=os.environ.get('RENTAL_SLOW_QUERY_LOG'),
+        )
+        metrics_path = os.environ.get('RENTAL_METRICS_PATH')
+        if metrics_path:
+            metrics.start_exporter(metrics_path)
+        
+        # Connect to the database through a shared pool; each menu action
+        # checks out a connection and returns it when done.
+        pool = create_pool(
+            min_size=int(os.environ.get('RENTAL_DB_POOL_MIN', '1')),
+            max_size=int(os.environ.get('RENTAL_DB_POOL_MAX', '8')),
+            cache=QueryCache(
+                max_entries=int(os.environ.get('RENTAL_CACHE_SIZE', '1024')),
+                ttl=float(os.environ.get('RENTAL_CACHE_TTL', '60')),
+            ),
+            metrics=metrics,
         )
-        print("Connected to MySQL database")
+        pool.start_reaper()
+        if pool.backend == 'sqlite':
+            # An embedded database is created and kept current on startup.
+            with pool.connection() as conn:
+                migrate(conn, backend='sqlite')
+        last_logins = last_login_buffer(pool)
+        last_logins.start()
+        
+        # Stream large searches through a server-side cursor instead of paging
+        stream_search = os.environ.get('RENTAL_SEARCH_STREAM', '0') == '1'
+        
+        # Serve searches, fuzzy address lookups and recommendations from
+        # in-memory indexes (the NumPy ones only when numpy is installed)
+        indexes = load_listing_indexes(pool, search=not stream_search)
+        # Loaded on first use when renting with a broker
+        brokers = BrokerDirectory(ttl=float(os.environ.get('RENTAL_BROKER_CACHE_TTL', '300')))
+        # Market statistics, re-read from market_stats at most this often
+        market = MarketStats(ttl=float(os.environ.get('RENTAL_MARKET_STATS_TTL', '60')))
+        
+        # Re-list properties whose lease has ended, in the background
+        sweeper = lease_sweeper(pool, indexes)
+        if sweeper is not None:
+            sweeper.start()
+        print("Connected to SQLite database" if pool.backend == 'sqlite' else "Connected to MySQL database")
         
-        cursor = conn.cursor()
         user_id = None
         
         while True:
@@ -898,13 +1442,14 @@ def main():
                 choice = input("Enter your choice: ")
                 
                 if choice == '1':
-                    user_id = login(cursor)
-                    if user_id:
-                        # Update last login time
-                        cursor.execute("UPDATE user_auth ua JOIN user u ON ua.auth_id = u.auth_id SET ua.last_login = NOW() WHERE u.user_id = %s", (user_id,))
-                        conn.commit()
+                    with metrics.action('login'), pool.connection() as conn:
+                        user_id = login(conn, last_logins)
+                        new_matches = count_notifications(conn, user_id) if user_id else 0
+                    if new_matches:
+                        print(f"You have {new_matches} new matches for your saved searches (option 8).")
                 elif choice == '2':
-                    email = signup(cursor, conn)
+                    with metrics.action('signup'), pool.connection() as conn:
+                        email = signup(conn)
                     if email:
                         print("Please log in with your new account.")
                 elif choice == '0':
@@ -919,20 +1464,37 @@ def main():
                 if choice == '0':
                     user_id = None
                     print("Logged out successfully.")
-                elif choice == '1':
-                    view_profile(cursor, user_id)
-                elif choice == '2':
-                    update_personal_info(cursor, conn, user_id)
-                elif choice == '3':
-                    view_available_properties(cursor)
-                elif choice == '4':
-                    view_my_rentals(cursor, user_id)
-                elif choice == '5':
-                    rent_property(cursor, conn, user_id)
-        
-        # Close the database connection
-        cursor.close()
-        conn.close()
+                    continue
+                
+                with metrics.action(MENU_ACTIONS[choice]), pool.connection(user_id=user_id) as conn:
+                    if choice == '1':
+                        view_profile(conn, user_id)
+                    elif choice == '2':
+                        update_personal_info(conn, user_id)
+                    elif choice == '3':
+                        view_available_properties(conn, indexes.search, stream=stream_search,
+                                                  availability=indexes.availability)
+                    elif choice == '4':
+                        view_my_rentals(conn, user_id)
+                    elif choice == '5':
+                        rent_property(conn, user_id, indexes, brokers)
+                    elif choice == '6':
+                        view_properties_by_text(conn, indexes.text)
+                    elif choice == '7':
+                        view_similar_properties(conn, indexes.similar)
+                    elif choice == '8':
+                        manage_saved_searches(conn, user_id, indexes.saved_searches)
+                    elif choice == '9':
+                        view_market_stats(conn, market)
+        
+        # Write out buffered last_login updates and close the database connections
+        if sweeper is not None:
+            sweeper.close()
+        last_logins.close()
+        pool.close()
+        if metrics_path:
+            metrics.stop()
+            metrics.export(metrics_path)
         print("Database connection closed.")
         
     except Exception as e:
@@ -0,0 +1,404 @@
+"""Market statistics per city, zip code and neighborhood.
+
+The ``market_stats`` table holds, for every city ("City, ST"), zip code
+and neighborhood, the number of listings, how many are vacant today
+(for_rent = 1), and quantile sketches of the monthly rent and of the rent
+per square foot. The sketches are mergeable, so the table is kept up to
+date incrementally instead of by GROUP BYs over the whole properties
+table:
+
+* ``record_listings`` folds newly ingested listings into the stored
+  sketches, by merging in a sketch of just the new ones;
+* ``record_vacancy`` moves the vacant counts when a stay begins
+  (book_property, the lease sweeper) or a lease ends (the lease sweeper);
+* ``rebuild`` recomputes everything, for a new or bulk-changed database.
+
+The 25th/50th/75th percentiles are stored next to each sketch, so readers
+never decode one. ``MarketStats`` caches the table in memory, reloading
+it after ``ttl`` seconds, and answers for one area with a dict lookup.
+States and the whole market are rolled up by merging their cities'
+sketches when the cache loads.
+
+    python market.py --rebuild
+    python market.py city "Boston, MA"
+"""
+import argparse
+import json
+import math
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+
+from db import create_pool
+
+KINDS = ('city', 'zip', 'neighborhood', 'state', 'all')
+
+# One row per (property, neighborhood); properties without one have a NULL name.
+PROPERTY_GROUPS = """
+    SELECT p.property_id, p.city, p.state, p.zip, p.price, p.square_foot, p.for_rent, n.name
+    FROM properties p
+    LEFT JOIN property_neighborhood pn ON p.property_id = pn.property_id
+    LEFT JOIN neighborhood n ON pn.neighborhood_id = n.neighborhood_id
+"""
+
+# Sketches are only read for cities, which the state and market rollups merge.
+STATS_QUERY = """
+    SELECT kind, group_key, label, listings, vacant,
+           rent_p25, rent_median, rent_p75, ppsf_p25, ppsf_median, ppsf_p75,
+           CASE WHEN kind = 'city' THEN rent_sketch END,
+           CASE WHEN kind = 'city' THEN ppsf_sketch END
+    FROM market_stats
+"""
+
+LOCK_GROUP = """
+    SELECT listings, vacant, rent_sketch, ppsf_sketch FROM market_stats
+    WHERE kind = %s AND group_key = %s
+    FOR UPDATE
+"""
+
+UPDATE_GROUP = """
+    UPDATE market_stats
+    SET listings = %s, vacant = %s, rent_p25 = %s, rent_median = %s, rent_p75 = %s,
+        ppsf_p25 = %s, ppsf_median = %s, ppsf_p75 = %s, rent_sketch = %s, ppsf_sketch = %s, updated_at = %s
+    WHERE kind = %s AND group_key = %s
+"""
+
+INSERT_GROUP = """
+    INSERT INTO market_stats (listings, vacant, rent_p25, rent_median, rent_p75,
+                              ppsf_p25, ppsf_median, ppsf_p75, rent_sketch, ppsf_sketch, updated_at,
+                              kind, group_key, label)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+MOVE_VACANT = "UPDATE market_stats SET vacant = vacant + %s, updated_at = %s WHERE kind = %s AND group_key = %s"
+
+MarketSummary = namedtuple('MarketSummary', 'kind name listings vacant vacancy_rate rent_p25 median_rent rent_p75 '
+                                            'ppsf_p25 median_ppsf ppsf_p75')
+
+# Column names of MarketSummary rows, for rendering.
+MARKET_FIELDS = MarketSummary._fields
+
+
+class QuantileSketch:
+    """Streaming quantile sketch with relative accuracy (DDSketch).
+
+    A value x > 0 is counted in bucket ceil(log_gamma(x)), with
+    gamma = (1 + accuracy) / (1 - accuracy), so every quantile is within
+    ``accuracy`` of the true value, relatively, and the number of buckets
+    grows with the log of the value range, not with the number of values.
+    Two sketches with the same accuracy merge by adding bucket counts.
+    """
+
+    def __init__(self, accuracy=0.01):
+        self.accuracy = accuracy
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.bins = Counter()
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value, count=1):
+        value = float(value)
+        if value > 0:
+            self.bins[math.ceil(math.log(value) / self._log_gamma)] += count
+        else:
+            self.zeros += count
+        self.count += count
+
+    def merge(self, other):
+        """Add other's values to this sketch; returns self."""
+        if other.accuracy != self.accuracy:
+            raise ValueError("Sketches with different accuracies cannot be merged.")
+        self.bins.update(other.bins)
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """The value at quantile q (0 to 1), or None for an empty sketch."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self._gamma ** key / (self._gamma + 1)
+        return 2 * self._gamma ** max(self.bins) / (self._gamma + 1)
+
+    def dumps(self):
+        return json.dumps({'a': self.accuracy, 'z': self.zeros, 'b': self.bins}, separators=(',', ':'))
+
+    @classmethod
+    def loads(cls, text):
+        data = json.loads(text)
+        sketch = cls(data['a'])
+        sketch.bins.update({int(key): count for key, count in data['b'].items()})
+        sketch.zeros = data['z']
+        sketch.count = sketch.zeros + sum(sketch.bins.values())
+        return sketch
+
+
+class _Group:
+    """Listing and vacancy counts and rent sketches of one area."""
+
+    def __init__(self, label, listings=0, vacant=0, rent=None, ppsf=None):
+        self.label = label
+        self.listings = listings
+        self.vacant = vacant
+        self.rent = rent or QuantileSketch()
+        self.ppsf = ppsf or QuantileSketch()
+
+    def add(self, price, square_foot, for_rent):
+        self.listings += 1
+        self.vacant += 1 if for_rent else 0
+        self.rent.add(price)
+        if square_foot:
+            self.ppsf.add(float(price) / square_foot)
+
+    def merge(self, other):
+        self.listings += other.listings
+        self.vacant += other.vacant
+        self.rent.merge(other.rent)
+        self.ppsf.merge(other.ppsf)
+
+    def quantiles(self):
+        """rent and price-per-square-foot 25th, 50th and 75th percentiles, rounded to cents."""
+        values = [sketch.quantile(q) for sketch in (self.rent, self.ppsf) for q in (0.25, 0.5, 0.75)]
+        return [round(value, 2) if value is not None else None for value in values]
+
+    def summary(self, kind):
+        return MarketSummary(kind, self.label, self.listings, self.vacant,
+                             self.vacant / self.listings if self.listings else None, *self.quantiles())
+
+
+def _groups(city, state, zip_code, neighborhoods):
+    """(kind, group_key, label) of every area a listing counts in."""
+    groups = [('city', f"{city}, {state}".lower(), f"{city}, {state}")]
+    if zip_code:
+        groups.append(('zip', str(zip_code), str(zip_code)))
+    groups += [('neighborhood', name.lower(), name) for name in neighborhoods]
+    return groups
+
+
+def _listings(cursor, where, params):
+    """(price, square_foot, for_rent, groups) per property matching the PROPERTY_GROUPS filter."""
+    cursor.execute(PROPERTY_GROUPS + where + " ORDER BY p.property_id", params)
+    current, neighborhoods = None, []
+    for row in cursor.fetchall():
+        if current is not None and row[0] != current[0]:
+            yield current[4], current[5], current[6], _groups(*current[1:4], neighborhoods)
+            neighborhoods = []
+        current = row
+        if row[7]:
+            neighborhoods.append(row[7])
+    if current is not None:
+        yield current[4], current[5], current[6], _groups(*current[1:4], neighborhoods)
+
+
+def _collect(conn, after_property_id, chunk=5000):
+    """({(kind, group_key): _Group}, listing count) for properties above after_property_id."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(property_id), 0) FROM properties")
+    last = cursor.fetchone()[0]
+    groups, count = {}, 0
+    # Ranges of property_id, so a listing's neighborhood rows never split across chunks.
+    for low in range(after_property_id, last, chunk):
+        for price, square_foot, for_rent, keys in _listings(
+                cursor, " WHERE p.property_id > %s AND p.property_id <= %s", (low, low + chunk)):
+            for kind, key, label in keys:
+                group = groups.get((kind, key))
+                if group is None:
+                    group = groups[kind, key] = _Group(label)
+                group.add(price, square_foot, for_rent)
+            count += 1
+    return groups, count
+
+
+def _values(group, kind, key, now):
+    return (group.listings, group.vacant, *group.quantiles(), group.rent.dumps(), group.ppsf.dumps(), now, kind, key)
+
+
+def _store(conn, groups):
+    """Merge groups into market_stats, locking rows in key order."""
+    cursor = conn.cursor()
+    now = datetime.now()
+    for (kind, key), group in sorted(groups.items()):
+        cursor.execute(LOCK_GROUP, (kind, key))
+        row = cursor.fetchone()
+        if row is not None:
+            group.merge(_Group(None, row[0], row[1], QuantileSketch.loads(row[2]), QuantileSketch.loads(row[3])))
+        values = _values(group, kind, key, now)
+        if row is not None:
+            cursor.execute(UPDATE_GROUP, values)
+        else:
+            cursor.execute(INSERT_GROUP, (*values, group.label))
+
+
+def record_listings(conn, after_property_id):
+    """Add the listings with property_id above after_property_id; returns how many.
+
+    An empty market_stats table is built from every listing instead.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM market_stats")
+    if not cursor.fetchone()[0]:
+        return rebuild(conn)
+    groups, count = _collect(conn, after_property_id)
+    try:
+        _store(conn, groups)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return count
+
+
+def rebuild(conn):
+    """Recompute market_stats from the properties table; returns the listing count."""
+    groups, count = _collect(conn, 0)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM market_stats")
+        now = datetime.now()
+        cursor.executemany(INSERT_GROUP, [(*_values(group, kind, key, now), group.label)
+                                          for (kind, key), group in groups.items()])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return count
+
+
+def record_vacancy(conn, property_ids, change):
+    """Move the vacant counts of the listings' areas by change (+1 or -1 each).
+
+    Runs in the caller's transaction and does not commit, so it can go
+    with the for_rent update it mirrors.
+    """
+    property_ids = list(property_ids)
+    if not property_ids:
+        return
+    cursor = conn.cursor()
+    moved = Counter()
+    for _, _, _, keys in _listings(cursor, f" WHERE p.property_id IN ({', '.join(['%s'] * len(property_ids))})",
+                                   property_ids):
+        for kind, key, _ in keys:
+            moved[kind, key] += change
+    now = datetime.now()
+    cursor.executemany(MOVE_VACANT, [(delta, now, kind, key) for (kind, key), delta in sorted(moved.items())])
+
+
+class MarketStats:
+    """In-memory copy of market_stats, for answering in constant time.
+
+    Loads on first use, building the table if it is still empty, and
+    reloads after ``ttl`` seconds to pick up bookings, ingests and sweeps
+    from any process.
+    """
+
+    def __init__(self, ttl=60.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._summaries = {}
+        self._cities = {}
+        self._loaded_at = None
+
+    def load(self, rows):
+        """Replace the contents with STATS_QUERY rows."""
+        summaries, cities, rollups = {}, {}, {}
+        for kind, key, label, listings, vacant, *quantiles, rent_sketch, ppsf_sketch in rows:
+            quantiles = [float(value) if value is not None else None for value in quantiles]
+            summaries[kind, key] = MarketSummary(kind, label, listings, vacant,
+                                                 vacant / listings if listings else None, *quantiles)
+            if kind != 'city':
+                continue
+            # A bare city name finds the city when no other state has one of that name.
+            city, state = label.rsplit(', ', 1)
+            cities[city.lower()] = key if city.lower() not in cities else None
+            group = _Group(None, listings, vacant, QuantileSketch.loads(rent_sketch), QuantileSketch.loads(ppsf_sketch))
+            for rollup_kind, rollup_key, rollup_label in (('state', state.lower(), state.upper()),
+                                                          ('all', 'all', 'All areas')):
+                rollup = rollups.get((rollup_kind, rollup_key))
+                if rollup is None:
+                    rollup = rollups[rollup_kind, rollup_key] = _Group(rollup_label)
+                rollup.merge(group)
+        for (kind, key), rollup in rollups.items():
+            summaries[kind, key] = rollup.summary(kind)
+        with self._lock:
+            self._summaries = summaries
+            self._cities = cities
+            self._loaded_at = time.monotonic()
+
+    def build(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(STATS_QUERY)
+        rows = cursor.fetchall()
+        if not rows and rebuild(conn):
+            cursor.execute(STATS_QUERY)
+            rows = cursor.fetchall()
+        self.load(rows)
+        return len(self)
+
+    def _current(self, conn):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            self.build(conn)
+
+    def get(self, conn, kind, name='all'):
+        """The MarketSummary of one area, or None.
+
+        Cities are named "City, ST", or just "City" when only one state has it.
+        """
+        if kind not in KINDS:
+            raise ValueError(f"Unknown area type {kind!r}; use one of {', '.join(KINDS)}.")
+        self._current(conn)
+        key = str(name).strip().lower() if kind != 'all' else 'all'
+        with self._lock:
+            if kind == 'city' and ',' not in key:
+                key = self._cities.get(key) or key
+            return self._summaries.get((kind, key))
+
+    def areas(self, conn, kind, limit=20):
+        """The `limit` areas of a kind with the most listings."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown area type {kind!r}; use one of {', '.join(KINDS)}.")
+        self._current(conn)
+        with self._lock:
+            found = [summary for (area_kind, _), summary in self._summaries.items() if area_kind == kind]
+        return sorted(found, key=lambda summary: (-summary.listings, summary.name))[:limit]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._summaries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('kind', nargs='?', choices=KINDS, default='all')
+    parser.add_argument('name', nargs='?', help="area to show (default: the areas with the most listings)")
+    parser.add_argument('--rebuild', action='store_true', help="recompute the table from the properties table")
+    args = parser.parse_args()
+
+    pool = create_pool(min_size=1, max_size=1)
+    try:
+        with pool.connection() as conn:
+            if args.rebuild:
+                started = time.perf_counter()
+                count = rebuild(conn)
+                print(f"Rebuilt market stats from {count} listings in {time.perf_counter() - started:.2f}s.")
+            stats = MarketStats()
+            if args.name or args.kind == 'all':
+                summaries = [stats.get(conn, args.kind, args.name or 'all')]
+            else:
+                summaries = stats.areas(conn, args.kind)
+        for summary in summaries:
+            print(summary)
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
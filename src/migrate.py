@@ -0,0 +1,270 @@
+"""Versioned schema migrations and query plan checks.
+
+Migrations are the numbered ``.sql`` files in ``database/migrations``
+(``001_initial_schema.sql``, ``002_...``). Each one is applied once, in
+order, and recorded in the ``schema_migrations`` table. A file with the
+same number in a backend subdirectory (``database/migrations/sqlite``)
+replaces the shared one for that backend, for DDL the dialects disagree on.
+
+    python migrate.py status     # list applied and pending migrations
+    python migrate.py up         # apply pending migrations
+    python migrate.py check      # EXPLAIN every query in main.py; fail on full table scans
+
+Run ``check`` against a database holding realistic data: on nearly empty
+tables MySQL may prefer a scan even when a usable index exists.
+"""
+import argparse
+import ast
+import os
+import re
+import sys
+
+from db import create_pool
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'migrations')
+MAIN_PY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+_MIGRATION_FILE = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+
+def _migration_files(directory):
+    found = []
+    for filename in os.listdir(directory):
+        match = _MIGRATION_FILE.match(filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    versions = [version for version, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Two migration files in {directory} share a version number.")
+    return found
+
+
+def available_migrations(directory=MIGRATIONS_DIR, backend='mysql'):
+    """Return [(version, name, path)] for every migration file, in version order."""
+    found = {version: entry for version, *entry in _migration_files(directory)}
+    overrides = os.path.join(directory, backend)
+    if os.path.isdir(overrides):
+        found.update({version: entry for version, *entry in _migration_files(overrides)})
+    return [(version, name, path) for version, (name, path) in sorted(found.items())]
+
+
+def split_statements(sql):
+    """Split a migration file into statements, dropping comment-only lines."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+          version INT NOT NULL,
+          name VARCHAR(128) NOT NULL,
+          applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          PRIMARY KEY (version)
+        )
+    """)
+
+
+def applied_versions(cursor):
+    ensure_migrations_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(conn, directory=MIGRATIONS_DIR, backend='mysql'):
+    """Apply pending migrations in order; returns the versions applied."""
+    cursor = conn.cursor()
+    done = applied_versions(cursor)
+    applied = []
+    for version, name, path in available_migrations(directory, backend):
+        if version in done:
+            continue
+        with open(path, encoding='utf-8') as f:
+            statements = split_statements(f.read())
+        print(f"Applying {version:03d}_{name} ({len(statements)} statements)")
+        # MySQL commits DDL implicitly, so a failure part way through leaves
+        # the migration unrecorded and it must be fixed up by hand.
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+        conn.commit()
+        applied.append(version)
+    return applied
+
+
+def status(conn, directory=MIGRATIONS_DIR, backend='mysql'):
+    cursor = conn.cursor()
+    done = applied_versions(cursor)
+    for version, name, _ in available_migrations(directory, backend):
+        state = 'applied' if version in done else 'pending'
+        print(f"{version:03d}_{name}: {state}")
+
+
+# Representative values for placeholders, chosen by the column they are
+# compared with, so EXPLAIN sees the same types as the real queries.
+SAMPLE_VALUES = {
+    'email': 'someone@example.com',
+    'phone': '555-0100',
+    'username': 'someone@example.com',
+    'ssn': '123-45-6789',
+    'passport_id': 'X1234567',
+    'city': 'Boston',
+    'state': 'MA',
+    'name': 'Back Bay',
+    'start_date': '2026-01-01',
+    'end_date': '2026-01-01',
+    'last_login': '2026-01-01 00:00:00',
+}
+
+_COMPARED_COLUMN = re.compile(r'(\w+)\s*(?:=|!=|<>|>=|<=|>|<|LIKE)\s*$', re.IGNORECASE)
+
+
+def sample_params(sql):
+    """Pick a sample value for each %s placeholder in sql."""
+    params = []
+    parts = sql.split('%s')
+    for before in parts[:-1]:
+        match = _COMPARED_COLUMN.search(before)
+        params.append(SAMPLE_VALUES.get(match.group(1).lower(), 1) if match else 1)
+    return params
+
+
+def _string_value(node, local_strings, module):
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Name):
+        if node.id in local_strings:
+            return local_strings[node.id]
+        value = getattr(module, node.id, None)
+        if isinstance(value, str):
+            return value
+    return None
+
+
+def queries_in_main():
+    """Collect the static SQL passed to execute()/cached_fetch*() in main.py.
+
+    Queries assembled at runtime (property search filters) are added
+    separately by hot_queries().
+    """
+    import main
+    with open(MAIN_PY, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+
+    found = []
+    for function in ast.walk(tree):
+        if not isinstance(function, ast.FunctionDef):
+            continue
+        # Local string assignments such as query = """...""" used by a later execute().
+        local_strings = {}
+        for node in sorted(ast.walk(function), key=lambda n: getattr(n, 'lineno', 0)):
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                value = _string_value(node.value, local_strings, main)
+                if value is not None:
+                    local_strings[node.targets[0].id] = value
+            if not isinstance(node, ast.Call) or not node.args:
+                continue
+            func = node.func
+            if isinstance(func, ast.Attribute) and func.attr in ('execute', 'executemany'):
+                sql_node = node.args[0]
+            elif isinstance(func, ast.Name) and func.id in ('cached_fetchall', 'cached_fetchone') and len(node.args) > 1:
+                sql_node = node.args[1]
+            else:
+                continue
+            sql = _string_value(sql_node, local_strings, main)
+            if sql is not None:
+                found.append((f"main.{function.name}:{node.lineno}", sql))
+    return found
+
+
+def hot_queries():
+    """Every query the application issues, as (label, sql) pairs."""
+    import booking
+    import main
+    import write_behind
+
+    found = queries_in_main()
+    every_filter = {'city': 'Boston', 'state': 'MA', 'min_price': 500, 'max_price': 900,
+                    'min_sqft': 300, 'min_rooms': 1}
+    for label, filters in (('no filters', {}), ('city/state', {'city': 'Boston', 'state': 'MA'}),
+                           ('all filters', every_filter),
+                           ('city/dates', {'city': 'Boston', 'available_from': '2026-06-01',
+                                           'available_to': '2026-09-01'})):
+        sql, _ = main.build_property_search(filters)
+        found.append((f"property search ({label})", sql + " ORDER BY p.price, p.property_id LIMIT 20"))
+    found.append(("booking.LOCK_PROPERTY", booking.LOCK_PROPERTY))
+    found.append(("booking.OVERLAPPING_STAY", booking.OVERLAPPING_STAY))
+    found.append(("booking.OCCUPY_PROPERTY", booking.OCCUPY_PROPERTY))
+    found.append(("booking.INSERT_RENT", booking.INSERT_RENT))
+    found.append(("booking.LINK_BROKER", booking.LINK_BROKER))
+    found.append(("write_behind.LAST_LOGIN_SQL", write_behind.LAST_LOGIN_SQL))
+    return found
+
+
+def explain(cursor, sql):
+    """Return EXPLAIN rows for sql as dicts."""
+    cursor.execute("EXPLAIN " + sql, sample_params(sql))
+    names = [column[0].lower() for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def check(conn):
+    """EXPLAIN every hot query; return the number that scan a whole table.
+
+    Statements without a WHERE clause read every row on purpose and are
+    reported but not counted. Plain INSERT ... VALUES has nothing to plan
+    and is skipped.
+    """
+    cursor = conn.cursor()
+    failures = 0
+    for label, sql in hot_queries():
+        normalized = ' '.join(sql.split())
+        if re.match(r'INSERT\b', normalized, re.IGNORECASE) and ' SELECT ' not in normalized.upper():
+            continue
+        try:
+            plan = explain(cursor, normalized)
+        except Exception as e:
+            print(f"ERROR {label}: {e}")
+            failures += 1
+            continue
+        scans = [row['table'] for row in plan if row.get('type') == 'ALL']
+        if not scans:
+            print(f"ok    {label}")
+        elif ' WHERE ' not in normalized.upper():
+            print(f"note  {label}: reads all of {', '.join(scans)} (no WHERE clause)")
+        else:
+            failures += 1
+            print(f"FAIL  {label}: full table scan on {', '.join(scans)}")
+            print(f"      {normalized}")
+    conn.rollback()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('up', 'status', 'check'))
+    args = parser.parse_args()
+
+    pool = create_pool(replicas=(), min_size=1, max_size=1)
+    if args.command == 'check' and pool.backend != 'mysql':
+        pool.close()
+        raise SystemExit("check reads MySQL EXPLAIN output; run it against the MySQL backend.")
+    try:
+        with pool.connection() as conn:
+            if args.command == 'up':
+                applied = migrate(conn, backend=pool.backend)
+                print(f"Applied {len(applied)} migration(s).")
+            elif args.command == 'status':
+                status(conn, backend=pool.backend)
+            else:
+                failures = check(conn)
+                if failures:
+                    print(f"{failures} quer{'y' if failures == 1 else 'ies'} need an index.")
+                    sys.exit(1)
+                print("No full table scans.")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""Prompt-free versions of the menu operations, shared by batch.py and server.py.
+
+Each operation takes a connection and a dict of arguments and returns a
+JSON-serializable result (see ``render.json_default`` for dates and decimals).
+Invalid arguments raise OperationError; rejected actions raise the business
+exceptions (SignupError, AuthenticationError, ProfileError,
+PropertyUnavailable), whose messages are meant for the caller.
+"""
+from dataclasses import asdict
+from datetime import date, timedelta
+
+from booking import BookingRequest, book_property
+from brokers import BrokerDirectory
+from cache import after_commit
+from listings import ListingIndexes
+from market import KINDS, MarketStats
+from main import (PAGE_SIZE, RENTAL_FIELDS, authenticate, check_tenant_status, create_account,
+                  fetch_rentals, find_similar_properties, get_user_profile, register_as_tenant,
+                  search_properties_page, search_properties_text, stays_overlapping, update_profile,
+                  upcoming_stays)
+from saved_searches import (NOTIFICATION_FIELDS, delete_saved_search, list_saved_searches, save_search,
+                            take_notifications)
+from search_index import LISTING_FIELDS
+
+SEARCH_FILTERS = ('city', 'state', 'min_price', 'max_price', 'min_sqft', 'min_rooms',
+                  'available_from', 'available_to')
+PROFILE_FIELDS = ('first_name', 'last_name', 'phone', 'new_email', 'ssn', 'passport_id')
+
+
+class OperationError(Exception):
+    """An operation's arguments are missing or invalid; the message is for the caller."""
+
+
+def require(args, *names):
+    missing = [name for name in names if args.get(name) in (None, '')]
+    if missing:
+        raise OperationError(f"Missing field(s): {', '.join(missing)}.")
+    return [args[name] for name in names]
+
+
+def integer(args, name, default=None):
+    value = args.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise OperationError(f"{name} must be a whole number.") from None
+
+
+def number(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise OperationError(f"{name} must be a number.") from None
+
+
+def day(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise OperationError(f"{name} must be YYYY-MM-DD.") from None
+
+
+def resolve_user(conn, args):
+    """The user an operation acts for, by ``user_id`` or ``email``."""
+    if args.get('user_id') is not None:
+        return integer(args, 'user_id')
+    email, = require(args, 'email')
+    cursor = conn.cursor()
+    cursor.execute("SELECT user_id FROM user WHERE email = %s", (email,))
+    row = cursor.fetchone()
+    if row is None:
+        raise OperationError(f"No account found for {email}.")
+    return row[0]
+
+
+class Operations:
+    """The operations, one method each, named in NAMES.
+
+    ``last_logins`` is an optional write-behind buffer for login timestamps
+    and ``indexes`` the optional in-memory ListingIndexes, kept in step with
+    rentals. ``brokers`` is the BrokerDirectory (``directory``) and
+    ``market`` the MarketStats cache (``market_stats``), one per process by
+    default.
+    """
+
+    NAMES = ('signup', 'login', 'profile', 'update_profile', 'register_tenant', 'search',
+             'text_search', 'similar', 'availability', 'my_rentals', 'rent',
+             'save_search', 'saved_searches', 'delete_search', 'notifications', 'brokers', 'market')
+
+    def __init__(self, last_logins=None, indexes=None, brokers=None, market=None):
+        self.last_logins = last_logins
+        self.indexes = indexes or ListingIndexes()
+        self.directory = brokers if brokers is not None else BrokerDirectory()
+        self.market_stats = market if market is not None else MarketStats()
+
+    def get(self, name):
+        """Return the handler for an operation name, or None."""
+        return getattr(self, name) if name in self.NAMES else None
+
+    def signup(self, conn, args):
+        email, password, first_name, last_name = require(args, 'email', 'password', 'first_name', 'last_name')
+        user_id = create_account(conn, email, password, first_name, last_name, args.get('phone'))
+        return {'user_id': user_id}
+
+    def login(self, conn, args):
+        email, password = require(args, 'email', 'password')
+        return {'user_id': authenticate(conn, email, password, self.last_logins)}
+
+    def profile(self, conn, args):
+        profile = get_user_profile(conn, resolve_user(conn, args))
+        if profile is None:
+            raise OperationError("User information not found.")
+        return asdict(profile)
+
+    def update_profile(self, conn, args):
+        user_id = resolve_user(conn, args)
+        changes = {field: args[field] for field in PROFILE_FIELDS if args.get(field) is not None}
+        # "email" identifies the user, so a changed address goes in new_email.
+        if 'new_email' in changes:
+            changes['email'] = changes.pop('new_email')
+        if not changes:
+            raise OperationError(f"Nothing to update; give one of {', '.join(PROFILE_FIELDS)}.")
+        update_profile(conn, user_id, **changes)
+        return {'user_id': user_id, 'updated': sorted(changes)}
+
+    def register_tenant(self, conn, args):
+        user_id = resolve_user(conn, args)
+        return {'user_id': user_id, 'registered': register_as_tenant(conn, user_id)}
+
+    @staticmethod
+    def _filters(args):
+        filters = {name: args.get(name) for name in SEARCH_FILTERS}
+        for name in ('min_price', 'max_price'):
+            filters[name] = number(args, name)
+        for name in ('min_sqft', 'min_rooms'):
+            filters[name] = integer(args, name)
+        return filters
+
+    def search(self, conn, args):
+        filters = self._filters(args)
+        filters['available_from'], filters['available_to'] = self._date_range(args)
+        after = args.get('after')
+        if isinstance(after, str):
+            after = after.split(',')
+        if after:
+            try:
+                after = (float(after[0]), int(after[1]))
+            except (TypeError, ValueError, IndexError):
+                raise OperationError("after must be [price, property_id] from the previous page.") from None
+        page_size = min(max(integer(args, 'page_size', PAGE_SIZE), 1), 500)
+        rows = search_properties_page(conn, filters, after or None, page_size, index=self.indexes.search,
+                                      availability=self.indexes.availability)
+        result = {'properties': [dict(zip(LISTING_FIELDS, row)) for row in rows]}
+        if len(rows) >= page_size:
+            last = result['properties'][-1]
+            result['next'] = [last['price'], last['property_id']]
+        return result
+
+    @staticmethod
+    def _date_range(args):
+        """(available_from, available_to); a lone start date means that one day."""
+        start, end = day(args, 'available_from'), day(args, 'available_to')
+        if start is None:
+            if end is not None:
+                raise OperationError("available_to needs available_from.")
+            return None, None
+        if end is None:
+            end = start + timedelta(days=1)
+        if end <= start:
+            raise OperationError("available_to must be after available_from.")
+        return start, end
+
+    def availability(self, conn, args):
+        require(args, 'property_id')
+        property_id = integer(args, 'property_id')
+        start, end = self._date_range(args)
+        result = {'property_id': property_id,
+                  'booked': [list(stay) for stay in upcoming_stays(conn, property_id, self.indexes.availability)]}
+        if start is not None:
+            conflicts = stays_overlapping(conn, property_id, start, end, self.indexes.availability)
+            result['available'] = not conflicts
+        return result
+
+    def text_search(self, conn, args):
+        text, = require(args, 'q')
+        limit = min(max(integer(args, 'limit', PAGE_SIZE), 1), 500)
+        rows = search_properties_text(conn, str(text), limit, text_index=self.indexes.text)
+        return {'properties': [dict(zip(LISTING_FIELDS, row)) for row in rows]}
+
+    def similar(self, conn, args):
+        require(args, 'property_id')
+        limit = min(max(integer(args, 'limit', 5), 1), 100)
+        rows = find_similar_properties(conn, integer(args, 'property_id'), limit, self.indexes.similar)
+        return {'properties': [dict(zip(LISTING_FIELDS, row)) for row in rows]}
+
+    def my_rentals(self, conn, args):
+        rows = fetch_rentals(conn, resolve_user(conn, args))
+        return {'rentals': [dict(zip(RENTAL_FIELDS, row)) for row in rows]}
+
+    def rent(self, conn, args):
+        user_id = resolve_user(conn, args)
+        require(args, 'property_id', 'contract_length')
+        contract_length = integer(args, 'contract_length')
+        if not 1 <= contract_length <= 60:
+            raise OperationError("Contract length must be between 1 and 60 months.")
+        start_date = day(args, 'start_date')
+        if start_date is not None and start_date < date.today():
+            raise OperationError("start_date cannot be in the past.")
+        broker_id = integer(args, 'broker_id')
+        if broker_id and self.directory.get(conn, broker_id) is None:
+            raise OperationError(f"No broker with ID {broker_id}.")
+        if not check_tenant_status(conn, user_id):
+            register_as_tenant(conn, user_id)
+        request = BookingRequest(
+            tenant_id=user_id,
+            property_id=integer(args, 'property_id'),
+            contract_length=contract_length,
+            broker_id=broker_id,
+            broker_fee=number(args, 'broker_fee'),
+            start_date=start_date,
+        )
+        rent_id = book_property(conn, request)
+        after_commit(conn, self.indexes.booked, request, rent_id)
+        if broker_id:
+            after_commit(conn, self.directory.tenant_linked, conn, broker_id)
+        return {'rent_id': rent_id, 'property_id': request.property_id,
+                'start_date': request.start_date, 'end_date': request.end_date}
+
+    def save_search(self, conn, args):
+        user_id = resolve_user(conn, args)
+        filters = self._filters(args)
+        if filters['min_price'] is not None and filters['max_price'] is not None \
+                and filters['max_price'] < filters['min_price']:
+            raise OperationError("max_price cannot be less than min_price.")
+        name = args.get('name')
+        search_id = save_search(conn, user_id, filters, str(name)[:64] if name else None)
+        if self.indexes.saved_searches is not None:
+            after_commit(conn, self.indexes.saved_searches.catch_up, conn)
+        return {'search_id': search_id}
+
+    def saved_searches(self, conn, args):
+        searches = list_saved_searches(conn, resolve_user(conn, args))
+        return {'searches': [search._asdict() for search in searches]}
+
+    def delete_search(self, conn, args):
+        user_id = resolve_user(conn, args)
+        require(args, 'search_id')
+        search_id = integer(args, 'search_id')
+        if not delete_saved_search(conn, user_id, search_id):
+            raise OperationError(f"Saved search {search_id} not found.")
+        if self.indexes.saved_searches is not None:
+            after_commit(conn, self.indexes.saved_searches.remove, search_id)
+        return {'search_id': search_id, 'deleted': True}
+
+    def notifications(self, conn, args):
+        """Pop the user's unseen saved-search matches."""
+        limit = min(max(integer(args, 'limit', 50), 1), 500)
+        rows = take_notifications(conn, resolve_user(conn, args), limit)
+        return {'matches': [dict(zip(NOTIFICATION_FIELDS, row)) for row in rows]}
+
+    def brokers(self, conn, args):
+        """A page of the broker directory, or of brokers whose name starts with q."""
+        page_size = min(max(integer(args, 'page_size', 10), 1), 100)
+        offset = max(integer(args, 'offset', 0), 0)
+        if args.get('q'):
+            page, more = self.directory.search(conn, str(args['q']), offset, page_size)
+        else:
+            page, more = self.directory.page(conn, offset, page_size)
+        result = {'brokers': [broker._asdict() for broker in page]}
+        if more:
+            result['next_offset'] = offset + page_size
+        return result
+
+    def market(self, conn, args):
+        """Rent levels and vacancy of one area, or of the kind's areas with the most listings."""
+        kind = args.get('kind') or 'city'
+        if kind not in KINDS:
+            raise OperationError(f"kind must be one of {', '.join(KINDS)}.")
+        if args.get('name') or kind == 'all':
+            summary = self.market_stats.get(conn, kind, args.get('name') or 'all')
+            if summary is None:
+                raise OperationError(f"No market data for {kind} {args['name']!r}.")
+            return summary._asdict()
+        limit = min(max(integer(args, 'limit', 20), 1), 500)
+        return {'areas': [summary._asdict() for summary in self.market_stats.areas(conn, kind, limit)]}
@@ -0,0 +1,175 @@
+"""Password hashing with versioned, self-describing hashes.
+
+New hashes name their scheme and cost next to the salt and digest, e.g.
+
+    scrypt$n=16384,r=8,p=1$<salt>$<digest>
+    pbkdf2_sha256$iterations=600000$<salt>$<digest>
+
+(salt and digest base64-encoded), so verification never depends on the
+current settings and the cost can be raised at any time. Records written
+before this format hold a bare SHA-256 hex digest of salt + password,
+with the salt in user_auth.salt; they still verify, and needs_rehash()
+reports them, like any hash whose scheme or cost differs from the current
+one, so authenticate() can upgrade it after a successful login.
+
+RENTAL_PASSWORD_HASHER picks the scheme for new hashes (scrypt or
+pbkdf2_sha256) and RENTAL_SCRYPT_N / RENTAL_PBKDF2_ITERATIONS its cost;
+bench_passwords.py calibrates the cost against a target latency. A
+work-factor KDF is CPU-bound, so processes serving many logins call
+start_hash_pool() to run hashing on a pool of worker processes, sized by
+RENTAL_HASH_WORKERS (default: one per core).
+"""
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class ScryptHasher:
+    name = 'scrypt'
+
+    def __init__(self, n=2 ** 14, r=8, p=1):
+        self.params = {'n': n, 'r': r, 'p': p}
+
+    @staticmethod
+    def derive(password, salt, n, r, p):
+        # OpenSSL's default limit is 32 MiB, which n=2**15 already exceeds.
+        return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 2 ** 20, dklen=32)
+
+
+class PBKDF2Hasher:
+    name = 'pbkdf2_sha256'
+
+    def __init__(self, iterations=600000):
+        self.params = {'iterations': iterations}
+
+    @staticmethod
+    def derive(password, salt, iterations):
+        return hashlib.pbkdf2_hmac('sha256', password, salt, iterations)
+
+
+HASHERS = {hasher.name: hasher for hasher in (ScryptHasher, PBKDF2Hasher)}
+
+
+def hasher_from_env():
+    """The hasher new passwords are stored with, from the environment."""
+    name = os.environ.get('RENTAL_PASSWORD_HASHER', ScryptHasher.name)
+    if name == PBKDF2Hasher.name:
+        return PBKDF2Hasher(int(os.environ.get('RENTAL_PBKDF2_ITERATIONS', '600000')))
+    if name != ScryptHasher.name:
+        raise ValueError(f"Unknown RENTAL_PASSWORD_HASHER {name!r}; use one of {', '.join(HASHERS)}.")
+    return ScryptHasher(int(os.environ.get('RENTAL_SCRYPT_N', str(2 ** 14))))
+
+
+def encode(hasher, password):
+    """A new salted hash of password in hasher's scheme."""
+    salt = os.urandom(16)
+    digest = hasher.derive(password.encode(), salt, **hasher.params)
+    params = ','.join(f"{key}={value}" for key, value in hasher.params.items())
+    return f"{hasher.name}${params}${_b64(salt)}${_b64(digest)}"
+
+
+def _parse(stored_hash):
+    """(scheme, params) of a stored hash; (None, None) for a legacy SHA-256 digest."""
+    if '$' not in stored_hash:
+        return None, None
+    name, params = stored_hash.split('$', 2)[:2]
+    return name, {key: int(value) for key, value in (item.split('=') for item in params.split(','))}
+
+
+def check(password, stored_hash, salt=''):
+    """True if password matches a stored hash of any supported scheme."""
+    name, params = _parse(stored_hash)
+    if name is None:
+        digest = hashlib.sha256((salt + password).encode()).hexdigest()
+        return hmac.compare_digest(digest, stored_hash)
+    hasher = HASHERS.get(name)
+    if hasher is None:
+        raise ValueError(f"Unknown password hash scheme {name!r}.")
+    _, _, salt_b64, digest_b64 = stored_hash.split('$')
+    return hmac.compare_digest(hasher.derive(password.encode(), _unb64(salt_b64), **params), _unb64(digest_b64))
+
+
+class PasswordHasher:
+    """Hashes new passwords with ``hasher`` and checks stored ones.
+
+    With ``workers`` > 0 the hashing runs on that many worker processes,
+    so concurrent logins use every core instead of queueing in one.
+    """
+
+    def __init__(self, hasher=None, workers=0):
+        self.hasher = hasher or hasher_from_env()
+        self.workers = workers
+        self._executor = None
+        if workers > 0:
+            # spawn: forking a process that already runs threads is unsafe.
+            self._executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _run(self, function, *args):
+        if self._executor is None:
+            return function(*args)
+        return self._executor.submit(function, *args).result()
+
+    def hash(self, password):
+        """(password_hash, salt) column values for a new password."""
+        # The salt is part of the hash; the salt column is only for legacy rows.
+        return self._run(encode, self.hasher, password), ''
+
+    def verify(self, password, stored_hash, salt=''):
+        return self._run(check, password, stored_hash, salt)
+
+    def needs_rehash(self, stored_hash):
+        """True if the hash is not in the current scheme at the current cost."""
+        return _parse(stored_hash) != (self.hasher.name, self.hasher.params)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def password_hasher():
+    """The process's PasswordHasher; inline until start_hash_pool() is called."""
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = PasswordHasher()
+        return _hasher
+
+
+def start_hash_pool(workers=None):
+    """Move the process's password hashing onto worker processes.
+
+    ``workers`` defaults to RENTAL_HASH_WORKERS, or one per core; 0 keeps
+    hashing inline.
+    """
+    global _hasher
+    if workers is None:
+        workers = int(os.environ.get('RENTAL_HASH_WORKERS', str(os.cpu_count() or 1)))
+    with _hasher_lock:
+        if _hasher is not None:
+            _hasher.close()
+        _hasher = PasswordHasher(workers=workers)
+        return _hasher
+
+
+def close_hash_pool():
+    global _hasher
+    with _hasher_lock:
+        if _hasher is not None:
+            _hasher.close()
+            _hasher = None
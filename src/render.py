@@ -0,0 +1,103 @@
+"""Buffered rendering of result rows as records, tables, JSON lines or CSV.
+
+RENTAL_OUTPUT_FORMAT picks how the menu shows listings, rentals and the
+profile:
+
+    records  a "Label: value" block per row (default)
+    table    a tabulate table per chunk of rows (for paged viewing;
+             tabulate is too slow for bulk output)
+    jsonl    one JSON object per row
+    csv      a header line, then one line per row
+
+Rows are formatted a chunk at a time into one string and written with a
+single write, so a large result costs one write per chunk rather than a
+print() per field. Rows may come from any iterable, including a cursor,
+and are never held in memory beyond one chunk.
+"""
+import csv
+import io
+import json
+import os
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+
+from tabulate import tabulate
+
+FORMATS = ('records', 'table', 'jsonl', 'csv')
+
+
+def json_default(value):
+    """json.dumps default= hook for the dates and decimals rows contain."""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _record(fields):
+    """Fallback records formatter: one "field: value" line per column."""
+    def record(row):
+        return '\n' + ''.join(f"{field}: {value}\n" for field, value in zip(fields, row))
+    return record
+
+
+class Renderer:
+    """Writes rows to ``out`` (stdout by default) in one of FORMATS."""
+
+    def __init__(self, fmt=None, out=None, chunk_rows=1000):
+        self.format = fmt or os.environ.get('RENTAL_OUTPUT_FORMAT', 'records')
+        if self.format not in FORMATS:
+            raise ValueError(f"Unknown output format {self.format!r}; use one of {', '.join(FORMATS)}.")
+        self.out = out or sys.stdout
+        self.chunk_rows = chunk_rows
+        self._encoder = json.JSONEncoder(default=json_default)
+
+    @property
+    def machine_readable(self):
+        """JSON lines and CSV carry no headings and are not paged."""
+        return self.format in ('jsonl', 'csv')
+
+    def heading(self, text):
+        if not self.machine_readable:
+            self.out.write(f"\n===== {text} =====\n")
+
+    def text(self, text):
+        """Write already formatted text, e.g. a message, in the human formats only."""
+        if not self.machine_readable:
+            self.out.write(text)
+
+    def _chunk(self, fields, rows, record, header):
+        if self.format == 'records':
+            return ''.join(map(record or _record(fields), rows))
+        if self.format == 'table':
+            return '\n' + tabulate(rows, headers=fields) + '\n'
+        if self.format == 'jsonl':
+            encode = self._encoder.encode
+            return ''.join(encode(dict(zip(fields, row))) + '\n' for row in rows)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        if header:
+            writer.writerow(fields)
+        writer.writerows(rows)
+        return buffer.getvalue()
+
+    def rows(self, fields, rows, record=None, header=True):
+        """Write rows, a chunk per write; returns how many.
+
+        ``record`` formats one row for the records format and should start
+        with a blank line. ``header=False`` leaves out the CSV header, for
+        rows that continue an earlier call.
+        """
+        rows = iter(rows)
+        count = 0
+        while True:
+            chunk = list(islice(rows, self.chunk_rows))
+            if not chunk:
+                break
+            self.out.write(self._chunk(fields, chunk, record, header and count == 0))
+            count += len(chunk)
+        self.out.flush()
+        return count
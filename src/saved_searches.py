@@ -0,0 +1,293 @@
+"""Saved searches and their match notifications.
+
+Users save a set of search filters (save_search); when listings come on
+the market, ``SavedSearchIndex`` finds the saved searches they match and
+queues a notification row for each, which take_notifications hands out
+once.
+"""
+import threading
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime
+
+SavedSearch = namedtuple('SavedSearch', 'search_id user_id name city state min_price max_price min_sqft min_rooms')
+
+# The search filters a saved search keeps (available dates are not saved).
+SEARCH_FIELDS = ('city', 'state', 'min_price', 'max_price', 'min_sqft', 'min_rooms')
+
+SEARCH_QUERY = """
+    SELECT search_id, user_id, name, city, state, min_price, max_price, min_sqft, min_rooms
+    FROM saved_search
+"""
+
+# What a saved search is matched on, for listings that are for rent.
+LISTING_FEATURES = """
+    SELECT property_id, city, state, price, square_foot, room_amount
+    FROM properties
+    WHERE for_rent = 1
+"""
+
+# One notification per (property, search); a search deleted since the
+# index last saw it selects no row.
+QUEUE_NOTIFICATION = """
+    INSERT INTO search_notification (user_id, search_id, property_id, created_at)
+    SELECT user_id, search_id, %s, %s FROM saved_search WHERE search_id = %s
+"""
+
+NOTIFICATION_QUERY = """
+    SELECT n.notification_id, n.search_id, s.name, n.created_at,
+           p.property_id, p.street_number, p.street_name, p.city, p.state,
+           p.room_number, p.square_foot, p.price, p.room_amount
+    FROM search_notification n
+    JOIN saved_search s ON n.search_id = s.search_id
+    JOIN properties p ON n.property_id = p.property_id
+    WHERE n.user_id = %s AND n.seen = 0
+    ORDER BY n.notification_id
+    LIMIT %s
+"""
+
+# Column names of the rows returned by take_notifications().
+NOTIFICATION_FIELDS = (
+    'notification_id', 'search_id', 'search_name', 'created_at',
+    'property_id', 'street_number', 'street_name', 'city', 'state',
+    'room_number', 'square_foot', 'price', 'room_amount',
+)
+
+
+def _key(text):
+    """Cities and states compare case-insensitively, as in the database."""
+    return text.strip().lower() if text else None
+
+
+def save_search(conn, user_id, filters, name=None):
+    """Store a search filter set for user_id; returns the new search_id."""
+    # Blank city/state mean any; zero is a real bound for the numeric filters
+    values = [filters.get('city') or None, filters.get('state') or None,
+              *(filters.get(field) for field in SEARCH_FIELDS[2:])]
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO saved_search (user_id, name, city, state, min_price, max_price, min_sqft, min_rooms, created_at)"
+        " VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        (user_id, name or None, *values, datetime.now()),
+    )
+    search_id = cursor.lastrowid
+    conn.commit()
+    return search_id
+
+
+def list_saved_searches(conn, user_id):
+    """The user's saved searches as SavedSearch tuples, oldest first."""
+    cursor = conn.cursor()
+    cursor.execute(SEARCH_QUERY + " WHERE user_id = %s ORDER BY search_id", (user_id,))
+    return [SavedSearch(*row) for row in cursor.fetchall()]
+
+
+def delete_saved_search(conn, user_id, search_id):
+    """Delete one of the user's saved searches and its notifications; returns False if not found."""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM search_notification WHERE search_id = %s AND user_id = %s", (search_id, user_id))
+    cursor.execute("DELETE FROM saved_search WHERE search_id = %s AND user_id = %s", (search_id, user_id))
+    deleted = cursor.rowcount > 0
+    conn.commit()
+    return deleted
+
+
+def take_notifications(conn, user_id, limit=50):
+    """Pop up to limit unseen matches off the user's queue, oldest first."""
+    cursor = conn.cursor()
+    cursor.execute(NOTIFICATION_QUERY, (user_id, limit))
+    rows = cursor.fetchall()
+    if rows:
+        cursor.execute(
+            f"UPDATE search_notification SET seen = 1 WHERE notification_id IN ({', '.join(['%s'] * len(rows))})",
+            [row[0] for row in rows],
+        )
+        conn.commit()
+    return rows
+
+
+def count_notifications(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM search_notification WHERE user_id = %s AND seen = 0", (user_id,))
+    return cursor.fetchone()[0]
+
+
+class _PriceIntervals:
+    """Static interval tree over [min_price, max_price] ranges.
+
+    Ranges are sorted by lower bound under a segment tree of the highest
+    upper bound below each node, so a price only visits subtrees holding a
+    range that contains it. Rebuilt lazily after the ranges change.
+    """
+
+    def __init__(self):
+        self.ranges = {}
+        self._dirty = True
+
+    def add(self, search_id, low, high):
+        self.ranges[search_id] = (low, high)
+        self._dirty = True
+
+    def remove(self, search_id):
+        if self.ranges.pop(search_id, None) is not None:
+            self._dirty = True
+
+    def _build(self):
+        entries = sorted((low, high, search_id) for search_id, (low, high) in self.ranges.items())
+        self._lows = [low for low, _, _ in entries]
+        self._ids = [search_id for _, _, search_id in entries]
+        leaves = 1
+        while leaves < len(entries):
+            leaves *= 2
+        tree = [float('-inf')] * (2 * leaves)
+        tree[leaves:leaves + len(entries)] = [high for _, high, _ in entries]
+        for node in range(leaves - 1, 0, -1):
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+        self._leaves = leaves
+        self._tree = tree
+        self._dirty = False
+
+    def stab(self, price):
+        """search_ids of the ranges containing price."""
+        if self._dirty:
+            self._build()
+        # Only ranges sorted before `limit` start at or below the price.
+        limit = bisect_right(self._lows, price)
+        tree, leaves = self._tree, self._leaves
+        found = []
+        stack = [(1, 0, leaves)] if limit else []
+        while stack:
+            node, first, width = stack.pop()
+            if first >= limit or tree[node] < price:
+                continue
+            if node >= leaves:
+                found.append(self._ids[node - leaves])
+            else:
+                width //= 2
+                stack.append((2 * node, first, width))
+                stack.append((2 * node + 1, first + width, width))
+        return found
+
+
+class SavedSearchIndex:
+    """In-memory index of every user's saved searches, for matching new listings.
+
+    Searches are bucketed by city (searches without a city in their own
+    bucket), and each bucket is an interval tree over the price bounds. A
+    listing is checked against the two buckets it can match, and only the
+    searches whose price range contains its price are tested on state,
+    square footage and rooms, instead of re-running every saved query.
+    ``catch_up`` picks up searches saved by other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._searches = {}
+        self._buckets = {}
+        self.max_search_id = 0
+
+    def _insert(self, search):
+        self._delete(search.search_id)
+        self._searches[search.search_id] = search
+        low = float(search.min_price) if search.min_price is not None else float('-inf')
+        high = float(search.max_price) if search.max_price is not None else float('inf')
+        self._buckets.setdefault(_key(search.city), _PriceIntervals()).add(search.search_id, low, high)
+        self.max_search_id = max(self.max_search_id, search.search_id)
+
+    def _delete(self, search_id):
+        search = self._searches.pop(search_id, None)
+        if search is not None:
+            self._buckets[_key(search.city)].remove(search_id)
+
+    def load(self, rows):
+        """Replace the contents with SEARCH_QUERY rows."""
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._insert(SavedSearch(*row))
+
+    def build(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(SEARCH_QUERY)
+        self.load(cursor.fetchall())
+        return len(self)
+
+    def add(self, search):
+        with self._lock:
+            self._insert(search)
+
+    def remove(self, search_id):
+        with self._lock:
+            self._delete(search_id)
+
+    def catch_up(self, conn):
+        """Add searches saved since the last build; returns how many."""
+        cursor = conn.cursor()
+        cursor.execute(SEARCH_QUERY + " WHERE search_id > %s", (self.max_search_id,))
+        rows = cursor.fetchall()
+        with self._lock:
+            for row in rows:
+                self._insert(SavedSearch(*row))
+        return len(rows)
+
+    def matches(self, city, state, price, square_foot, room_amount):
+        """SavedSearches that a listing with these values satisfies."""
+        price = float(price or 0)
+        found = []
+        with self._lock:
+            for bucket in (self._buckets.get(_key(city)), self._buckets.get(None)):
+                if bucket is None:
+                    continue
+                for search_id in bucket.stab(price):
+                    search = self._searches[search_id]
+                    if search.state and _key(search.state) != _key(state):
+                        continue
+                    if search.min_sqft is not None and (square_foot or 0) < search.min_sqft:
+                        continue
+                    if search.min_rooms is not None and (room_amount or 0) < search.min_rooms:
+                        continue
+                    found.append(search)
+        return found
+
+    def notify(self, conn, property_ids):
+        """Queue a notification for each saved search the listings match; returns how many."""
+        property_ids = list(property_ids)
+        if not property_ids:
+            return 0
+        self.catch_up(conn)
+        cursor = conn.cursor()
+        cursor.execute(LISTING_FEATURES + f" AND property_id IN ({', '.join(['%s'] * len(property_ids))})",
+                       property_ids)
+        return self._queue(conn, cursor.fetchall())
+
+    def notify_inserted(self, conn, after_property_id, chunk=1000):
+        """Notify for for-rent listings with property_id above after_property_id; returns how many."""
+        self.catch_up(conn)
+        cursor = conn.cursor()
+        queued = 0
+        while True:
+            cursor.execute(LISTING_FEATURES + " AND property_id > %s ORDER BY property_id LIMIT %s",
+                           (after_property_id, chunk))
+            rows = cursor.fetchall()
+            if not rows:
+                return queued
+            queued += self._queue(conn, rows)
+            after_property_id = rows[-1][0]
+
+    def _queue(self, conn, listings):
+        now = datetime.now()
+        rows = [(property_id, now, search.search_id)
+                for property_id, *features in listings
+                for search in self.matches(*features)]
+        if rows:
+            cursor = conn.cursor()
+            cursor.executemany(QUEUE_NOTIFICATION, rows)
+            conn.commit()
+        return len(rows)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._searches)
@@ -0,0 +1,290 @@
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:  # the index is optional; searches fall back to SQL
+    np = None
+
+
+# Same row shape as the SQL search in main.view_available_properties.
+LISTING_SELECT = """
+    SELECT p.property_id, p.street_number, p.street_name, p.city, p.state,
+           p.room_number, p.square_foot, p.price, p.room_amount,
+           u.first_name AS landlord_first_name, u.last_name AS landlord_last_name,
+           n.name AS neighborhood_name
+    FROM properties p
+    JOIN landlord l ON p.landlord_id = l.user_id
+    JOIN user u ON l.user_id = u.user_id
+    LEFT JOIN property_neighborhood pn ON p.property_id = pn.property_id
+    LEFT JOIN neighborhood n ON pn.neighborhood_id = n.neighborhood_id
+"""
+
+LISTING_QUERY = LISTING_SELECT + " WHERE p.for_rent = 1"
+
+# Every listing, let or not, as LISTING_QUERY rows with for_rent appended:
+# date searches can match a listing that is let today but free later.
+INDEX_QUERY = """
+    SELECT p.property_id, p.street_number, p.street_name, p.city, p.state,
+           p.room_number, p.square_foot, p.price, p.room_amount,
+           u.first_name AS landlord_first_name, u.last_name AS landlord_last_name,
+           n.name AS neighborhood_name, p.for_rent
+    FROM properties p
+    JOIN landlord l ON p.landlord_id = l.user_id
+    JOIN user u ON l.user_id = u.user_id
+    LEFT JOIN property_neighborhood pn ON p.property_id = pn.property_id
+    LEFT JOIN neighborhood n ON pn.neighborhood_id = n.neighborhood_id
+"""
+
+# Column names of LISTING_QUERY rows.
+LISTING_FIELDS = (
+    'property_id', 'street_number', 'street_name', 'city', 'state', 'room_number',
+    'square_foot', 'price', 'room_amount', 'landlord_first_name', 'landlord_last_name',
+    'neighborhood_name',
+)
+
+ID, CITY, STATE, SQFT, PRICE, ROOMS, FOR_RENT = 0, 3, 4, 6, 7, 8, 12
+
+
+def numpy_available():
+    return np is not None
+
+
+class PropertySearchIndex:
+    """Columnar in-memory index of listings.
+
+    Listing attributes live in parallel NumPy arrays kept physically sorted
+    by (price, property_id), one element per result row, with city and state
+    dictionary-encoded to integer codes. A price range is a binary search
+    to a contiguous slice, and every other filter is a vectorized comparison
+    over that slice. Let listings stay in the index with ``for_rent``
+    cleared, since a date search can still match them. Rows replaced when
+    a listing is re-read are switched off in the ``active`` mask and
+    compacted away once they make up most of the index; new rows are
+    inserted at their sorted position.
+
+    ``catch_up`` adds listings inserted by other processes and, every
+    ``ttl`` seconds, rebuilds the index so their bookings, sweeps and
+    edits show up too.
+    """
+
+    COLUMNS = ('property_id', 'price', 'square_foot', 'room_amount', 'city', 'state', 'for_rent', 'active')
+
+    def __init__(self, ttl=60.0):
+        if np is None:
+            raise RuntimeError("PropertySearchIndex requires numpy.")
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._codes = {}
+        self._built_at = None
+        self._reset([])
+
+    def _code(self, value, create=False):
+        # MySQL compares these columns case-insensitively, so the index does too.
+        key = (value or '').strip().lower()
+        code = self._codes.get(key)
+        if code is None and create:
+            code = self._codes[key] = len(self._codes) + 1
+        return code
+
+    def _columns(self, rows):
+        """Encode rows into column arrays sorted by (price, property_id)."""
+        property_id = np.array([row[ID] for row in rows], dtype=np.int64)
+        price = np.array([float(row[PRICE] or 0) for row in rows], dtype=np.float64)
+        order = np.lexsort((property_id, price))
+        columns = {
+            'property_id': property_id[order],
+            'price': price[order],
+            'square_foot': np.array([float(row[SQFT] or 0) for row in rows], dtype=np.float64)[order],
+            'room_amount': np.array([int(row[ROOMS] or 0) for row in rows], dtype=np.int32)[order],
+            'city': np.array([self._code(row[CITY], create=True) for row in rows], dtype=np.int32)[order],
+            'state': np.array([self._code(row[STATE], create=True) for row in rows], dtype=np.int32)[order],
+            'for_rent': np.array([bool(row[FOR_RENT]) for row in rows], dtype=bool)[order],
+            'active': np.ones(len(rows), dtype=bool),
+        }
+        return columns, [tuple(rows[i][:FOR_RENT]) for i in order.tolist()]
+
+    def _reset(self, rows):
+        columns, self._rows = self._columns(rows)
+        for name in self.COLUMNS:
+            setattr(self, name, columns[name])
+        self._dead = 0
+        self.max_id = int(self.property_id.max()) if len(self._rows) else 0
+
+    def _compact(self):
+        keep = self.active
+        for name in self.COLUMNS:
+            setattr(self, name, getattr(self, name)[keep])
+        self._rows = [row for row, alive in zip(self._rows, keep.tolist()) if alive]
+        self._dead = 0
+
+    def load(self, rows):
+        """Replace the index contents with rows shaped like INDEX_QUERY."""
+        rows = list(rows)
+        with self._lock:
+            self._codes = {}
+            self._reset(rows)
+            self._built_at = time.monotonic()
+
+    def build(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(INDEX_QUERY)
+        self.load(cursor.fetchall())
+        return len(self)
+
+    def catch_up(self, conn):
+        """Pick up other processes' changes; returns how many rows were read."""
+        now = time.monotonic()
+        with self._lock:
+            # The first caller past the ttl rebuilds; the rest only catch up.
+            rebuild = self._built_at is None or now - self._built_at > self.ttl
+            if rebuild:
+                self._built_at = now
+            after = self.max_id
+        cursor = conn.cursor()
+        if rebuild:
+            cursor.execute(INDEX_QUERY)
+            rows = cursor.fetchall()
+            self.load(rows)
+            return len(rows)
+        cursor.execute(INDEX_QUERY + " WHERE p.property_id > %s", (after,))
+        rows = cursor.fetchall()
+        with self._lock:
+            # Another caller may have added them meanwhile.
+            self._insert([row for row in rows if row[ID] > self.max_id])
+        return len(rows)
+
+    def add(self, rows):
+        """Insert new INDEX_QUERY rows at their sorted positions."""
+        with self._lock:
+            self._insert(list(rows))
+
+    def _insert(self, rows):
+        if rows:
+            columns, new_rows = self._columns(rows)
+            # Each new row goes after the existing rows with a smaller or equal
+            # (price, property_id); the new rows are already in that order.
+            positions = []
+            for price, property_id in zip(columns['price'].tolist(), columns['property_id'].tolist()):
+                lo = int(np.searchsorted(self.price, price, side='left'))
+                hi = int(np.searchsorted(self.price, price, side='right'))
+                positions.append(lo + int(np.searchsorted(self.property_id[lo:hi], property_id, side='right')))
+            size = len(self._rows)
+            order = np.insert(np.arange(size), positions, np.arange(size, size + len(new_rows)))
+            # One permutation for the arrays and the row list keeps them in step.
+            for name in self.COLUMNS:
+                setattr(self, name, np.concatenate((getattr(self, name), columns[name]))[order])
+            rows = self._rows + new_rows
+            self._rows = [rows[i] for i in order.tolist()]
+            self.max_id = max(self.max_id, int(columns['property_id'].max()))
+
+    def remove(self, property_id):
+        """Mark a listing as no longer for rent."""
+        with self._lock:
+            self.for_rent[self.property_id == property_id] = False
+
+    def refresh_property(self, conn, property_id):
+        """Re-read one property's listing rows after it was added or changed."""
+        cursor = conn.cursor()
+        cursor.execute(INDEX_QUERY + " WHERE p.property_id = %s", (property_id,))
+        rows = cursor.fetchall()
+        with self._lock:
+            hits = np.flatnonzero((self.property_id == property_id) & self.active)
+            self.active[hits] = False
+            self._dead += len(hits)
+            # Compact once most entries are rows that were replaced.
+            if self._dead > 1024 and self._dead * 2 > len(self._rows):
+                self._compact()
+        self.add(rows)
+
+    def _bounds(self, min_price, max_price):
+        lo, hi = 0, len(self._rows)
+        if min_price is not None:
+            lo = int(np.searchsorted(self.price, min_price, side='left'))
+        if max_price is not None:
+            hi = int(np.searchsorted(self.price, max_price, side='right'))
+        return lo, hi
+
+    def _mask(self, lo, hi, city, state, min_sqft, min_rooms, exclude=None, for_rent=True):
+        """Boolean mask of matches within [lo, hi), or None if nothing can match."""
+        mask = self.active[lo:hi].copy()
+        if for_rent:
+            mask &= self.for_rent[lo:hi]
+        if exclude is not None and len(exclude):
+            mask &= ~np.isin(self.property_id[lo:hi], exclude)
+        if city:
+            code = self._code(city)
+            if code is None:
+                return None
+            mask &= self.city[lo:hi] == code
+        if state:
+            code = self._code(state)
+            if code is None:
+                return None
+            mask &= self.state[lo:hi] == code
+        if min_sqft is not None:
+            mask &= self.square_foot[lo:hi] >= min_sqft
+        if min_rooms is not None:
+            mask &= self.room_amount[lo:hi] >= min_rooms
+        return mask
+
+    def search(self, city=None, state=None, min_price=None, max_price=None,
+               min_sqft=None, min_rooms=None, exclude=None, for_rent=True):
+        """Return matching rows ordered by price, like the SQL search.
+
+        ``exclude`` is an optional array of property_ids to leave out, such
+        as those booked during the dates searched for. ``for_rent=False``
+        also matches listings that are let today.
+        """
+        with self._lock:
+            lo, hi = self._bounds(min_price, max_price)
+            if lo >= hi:
+                return []
+            mask = self._mask(lo, hi, city, state, min_sqft, min_rooms, exclude, for_rent)
+            if mask is None:
+                return []
+            rows = self._rows
+            return [rows[i] for i in (np.flatnonzero(mask) + lo).tolist()]
+
+    def search_page(self, after=None, limit=20, city=None, state=None, min_price=None,
+                    max_price=None, min_sqft=None, min_rooms=None, exclude=None, for_rent=True,
+                    chunk=4096):
+        """Return up to limit matches after the (price, property_id) key `after`.
+
+        The range is scanned in chunks so a page is found without masking
+        every remaining listing. A listing in several neighborhoods has a
+        row per neighborhood; a page never ends part way through them, as
+        the next page starts after the last listing's key, so it can run
+        past limit.
+        """
+        with self._lock:
+            lo, hi = self._bounds(min_price, max_price)
+            if after is not None:
+                after_price, after_id = after
+                start = int(np.searchsorted(self.price, after_price, side='left'))
+                end = int(np.searchsorted(self.price, after_price, side='right'))
+                start += int(np.searchsorted(self.property_id[start:end], after_id, side='right'))
+                lo = max(lo, start)
+            page = []
+            while lo < hi and len(page) < limit:
+                stop = min(hi, lo + chunk)
+                mask = self._mask(lo, stop, city, state, min_sqft, min_rooms, exclude, for_rent)
+                if mask is None:
+                    return []
+                hits = (np.flatnonzero(mask) + lo)[:limit - len(page)]
+                page.extend(self._rows[i] for i in hits.tolist())
+                lo = stop
+                if len(page) == limit:
+                    # Finish the last listing's rows, which share its key.
+                    last = int(hits[-1])
+                    i = last + 1
+                    while (i < len(self._rows) and self.property_id[i] == self.property_id[last]
+                           and self.price[i] == self.price[last]):
+                        if self.active[i]:
+                            page.append(self._rows[i])
+                        i += 1
+            return page
+
+    def __len__(self):
+        with self._lock:
+            return int((self.active & self.for_rent).sum())
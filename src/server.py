@@ -0,0 +1,342 @@
+"""Local HTTP/JSON API for the rental system.
+
+Serves the menu operations over HTTP/1.1 from a single asyncio event loop.
+Database work runs on the connection pool's threads (see db.AsyncPool), so
+one process can keep hundreds of client connections open at once.
+
+    python server.py --port 8080
+
+Requests and responses are JSON. Log in to get a token and send it as
+``Authorization: Bearer <token>`` on the other endpoints:
+
+    POST  /signup      {"email", "password", "first_name", "last_name", "phone"}
+    POST  /login       {"email", "password"}                  -> {"token", "user_id"}
+    POST  /logout
+    GET   /profile
+    PATCH /profile     {"first_name", "last_name", "phone", "new_email", "ssn", "passport_id"}
+    GET   /properties  ?city=&state=&min_price=&max_price=&min_sqft=&min_rooms=&available_from=&available_to=&page_size=&after=
+    GET   /properties/search  ?q=&limit=         fuzzy street/city/zip/neighborhood search
+    GET   /properties/similar ?property_id=&limit=   for-rent listings most like a property
+    GET   /properties/availability ?property_id=&available_from=&available_to=   booked stays
+    GET   /rentals
+    POST  /rentals     {"property_id", "contract_length", "start_date", "broker_id", "broker_fee"}
+    GET   /searches
+    POST  /searches    {"name", "city", "state", "min_price", "max_price", "min_sqft", "min_rooms"}
+    DELETE /searches   ?search_id=
+    GET   /notifications ?limit=          pops unseen listings matching a saved search
+    GET   /brokers     ?q=&offset=&page_size=   broker directory, by name prefix
+    GET   /market      ?kind=&name=&limit=    rent quantiles and vacancy by city/zip/neighborhood/state/all
+
+A search page that is full carries ``next``; pass it back as ``after`` for
+the following page. Errors are ``{"error": message}`` with a 4xx/5xx status.
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import signal
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+from booking import PropertyUnavailable
+from cache import QueryCache
+from db import AsyncPool, create_pool
+from lease_sweeper import lease_sweeper
+from market import MarketStats
+from listings import load_listing_indexes
+from main import AuthenticationError, ProfileError, SignupError
+from migrate import migrate
+from operations import OperationError, Operations
+from passwords import close_hash_pool, start_hash_pool
+from render import json_default
+from write_behind import last_login_buffer
+
+MAX_BODY_BYTES = 1024 * 1024
+
+STATUS_TEXT = {
+    200: 'OK', 201: 'Created', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+    405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large',
+    500: 'Internal Server Error', 503: 'Service Unavailable',
+}
+
+# Business exceptions and the status they map to; their messages go to the client.
+ERROR_STATUS = (
+    (OperationError, 400),
+    (ProfileError, 400),
+    (AuthenticationError, 401),
+    (SignupError, 409),
+    (PropertyUnavailable, 409),
+)
+
+# (method, path) -> (operation, needs a session, success status)
+ROUTES = {
+    ('POST', '/signup'): ('signup', False, 201),
+    ('POST', '/login'): ('login', False, 200),
+    ('POST', '/logout'): (None, True, 200),
+    ('GET', '/profile'): ('profile', True, 200),
+    ('PATCH', '/profile'): ('update_profile', True, 200),
+    ('GET', '/properties'): ('search', False, 200),
+    ('GET', '/properties/search'): ('text_search', False, 200),
+    ('GET', '/properties/similar'): ('similar', False, 200),
+    ('GET', '/properties/availability'): ('availability', False, 200),
+    ('GET', '/rentals'): ('my_rentals', True, 200),
+    ('POST', '/rentals'): ('rent', True, 201),
+    ('GET', '/searches'): ('saved_searches', True, 200),
+    ('POST', '/searches'): ('save_search', True, 201),
+    ('DELETE', '/searches'): ('delete_search', True, 200),
+    ('GET', '/notifications'): ('notifications', True, 200),
+    ('GET', '/brokers'): ('brokers', False, 200),
+    ('GET', '/market'): ('market', False, 200),
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class SessionStore:
+    """Bearer tokens for logged-in users, expiring after ``ttl`` idle seconds.
+
+    Only touched from the event loop thread, so it needs no lock.
+    """
+
+    def __init__(self, ttl=3600.0):
+        self.ttl = ttl
+        self._sessions = {}
+
+    def create(self, user_id):
+        token = secrets.token_urlsafe(32)
+        self._sessions[token] = [user_id, time.monotonic() + self.ttl]
+        return token
+
+    def user_id(self, token):
+        session = self._sessions.get(token)
+        if session is None:
+            return None
+        now = time.monotonic()
+        if session[1] < now:
+            del self._sessions[token]
+            return None
+        session[1] = now + self.ttl
+        return session[0]
+
+    def delete(self, token):
+        self._sessions.pop(token, None)
+
+    def purge_expired(self):
+        now = time.monotonic()
+        expired = [token for token, (_, expires) in self._sessions.items() if expires < now]
+        for token in expired:
+            del self._sessions[token]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class APIServer:
+    """Minimal HTTP/1.1 front end with keep-alive and concurrency limits.
+
+    At most ``max_connections`` client connections are served; more are
+    answered 503 and closed. At most ``max_in_flight`` requests run at once;
+    a request that waits longer than ``queue_timeout`` seconds for a slot
+    gets 503 rather than piling up behind the database.
+    """
+
+    def __init__(self, db, operations, sessions, max_connections=1024, max_in_flight=256,
+                 queue_timeout=5.0, idle_timeout=30.0):
+        self.db = db
+        self.operations = operations
+        self.sessions = sessions
+        self.max_connections = max_connections
+        self.queue_timeout = queue_timeout
+        self.idle_timeout = idle_timeout
+        self.connections = 0
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    async def handle_connection(self, reader, writer):
+        self.connections += 1
+        try:
+            if self.connections > self.max_connections:
+                await self._respond(writer, 503, {'error': "Server is at its connection limit."}, False)
+                return
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.idle_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except HTTPError as e:
+                    await self._respond(writer, e.status, {'error': str(e)}, False)
+                    return
+                if request is None:
+                    return
+                method, target, headers, body = request
+                status, payload = await self.dispatch(method, target, headers, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Request headers are too large.") from None
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line.") from None
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', '0'))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length.") from None
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request bodies are limited to {MAX_BODY_BYTES} bytes.")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, default=json_default).encode()
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode('latin-1') + b'\r\n' + body)
+        await writer.drain()
+
+    async def dispatch(self, method, target, headers, body):
+        """Route one request; returns (status, payload)."""
+        url = urlsplit(target)
+        route = ROUTES.get((method, url.path))
+        if route is None:
+            if any(path == url.path for _, path in ROUTES):
+                return 405, {'error': f"{method} is not supported on {url.path}."}
+            return 404, {'error': f"No endpoint {url.path}."}
+        name, needs_session, success = route
+
+        args = dict(parse_qsl(url.query))
+        if body:
+            try:
+                data = json.loads(body)
+            except ValueError:
+                return 400, {'error': "Request body is not valid JSON."}
+            if not isinstance(data, dict):
+                return 400, {'error': "Request body must be a JSON object."}
+            args.update(data)
+
+        token = headers.get('authorization', '').removeprefix('Bearer ').strip()
+        if needs_session:
+            user_id = self.sessions.user_id(token) if token else None
+            if user_id is None:
+                return 401, {'error': "Log in first and send the token as 'Authorization: Bearer <token>'."}
+            # Sessions act only for their own user.
+            args.pop('email', None)
+            args['user_id'] = user_id
+        if name is None:
+            self.sessions.delete(token)
+            return 200, {'logged_out': True}
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            return 503, {'error': "Server is busy; try again shortly."}
+        try:
+            result = await self.db.run(self.operations.get(name), args, action=f"api.{name}",
+                                     user_id=args.get('user_id'))
+        except Exception as e:
+            for error_type, status in ERROR_STATUS:
+                if isinstance(e, error_type):
+                    return status, {'error': str(e)}
+            print(f"Error handling {method} {url.path}: {e}")
+            return 500, {'error': "Internal server error."}
+        finally:
+            self._slots.release()
+
+        if name == 'login':
+            result['token'] = self.sessions.create(result['user_id'])
+        return success, result
+
+
+async def serve(server, host, port, purge_interval=60.0):
+    """Serve until SIGINT or SIGTERM, purging expired sessions periodically."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    listener = await asyncio.start_server(server.handle_connection, host, port, backlog=1024)
+    print(f"Listening on http://{host}:{port}")
+    async with listener:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), purge_interval)
+            except asyncio.TimeoutError:
+                server.sessions.purge_expired()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.environ.get('RENTAL_API_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('RENTAL_API_PORT', '8080')))
+    parser.add_argument('--max-connections', type=int, default=1024)
+    parser.add_argument('--max-in-flight', type=int, default=256, help="requests processed at once")
+    parser.add_argument('--session-ttl', type=float, default=float(os.environ.get('RENTAL_SESSION_TTL', '3600')),
+                        help="seconds a login token stays valid without use")
+    args = parser.parse_args()
+
+    pool = create_pool(
+        min_size=int(os.environ.get('RENTAL_DB_POOL_MIN', '1')),
+        max_size=int(os.environ.get('RENTAL_DB_POOL_MAX', '16')),
+        cache=QueryCache(
+            max_entries=int(os.environ.get('RENTAL_CACHE_SIZE', '1024')),
+            ttl=float(os.environ.get('RENTAL_CACHE_TTL', '60')),
+        ),
+    )
+    pool.start_reaper()
+    if pool.backend == 'sqlite':
+        with pool.connection() as conn:
+            migrate(conn, backend='sqlite')
+    last_logins = last_login_buffer(pool)
+    last_logins.start()
+    start_hash_pool()
+    indexes = load_listing_indexes(pool)
+    sweeper = lease_sweeper(pool, indexes, log=print)
+    if sweeper is not None:
+        sweeper.start()
+
+    db = AsyncPool(pool)
+    market = MarketStats(ttl=float(os.environ.get('RENTAL_MARKET_STATS_TTL', '60')))
+    server = APIServer(db, Operations(last_logins, indexes, market=market), SessionStore(args.session_ttl),
+                       max_connections=args.max_connections, max_in_flight=args.max_in_flight)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    finally:
+        if sweeper is not None:
+            sweeper.close()
+        last_logins.close()
+        close_hash_pool()
+        db.close()
+        print("Server stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Similar-listing recommendations.
+
+``SimilarityIndex`` keeps a standardized feature matrix of the for-rent
+listings and answers main.find_similar_properties by scoring every
+listing against one in a few vectorized passes; without numpy the
+recommendations come from SQL instead.
+"""
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # recommendations fall back to SQL
+    np = None
+
+
+# One row per listing; a listing in several neighborhoods is compared by
+# its lowest neighborhood_id. Filters go between the two parts.
+FEATURE_SELECT = """
+    SELECT p.property_id, p.price, p.square_foot, p.room_amount, p.zip,
+           MIN(pn.neighborhood_id) AS neighborhood_id
+    FROM properties p
+    LEFT JOIN property_neighborhood pn ON p.property_id = pn.property_id
+"""
+FEATURE_GROUP = " GROUP BY p.property_id, p.price, p.square_foot, p.room_amount, p.zip"
+
+FEATURE_QUERY = FEATURE_SELECT + " WHERE p.for_rent = 1"
+
+# Relative weight of each term of the distance. Numeric features are
+# compared in standard deviations (price on a log scale); the categorical
+# ones add their weight when they differ.
+WEIGHTS = {
+    'price': 2.0,
+    'square_foot': 1.0,
+    'room_amount': 1.0,
+    'zip': 0.5,
+    'zip_area': 1.0,
+    'neighborhood': 1.5,
+}
+
+
+class SimilarityIndex:
+    """Feature matrix of for-rent listings for nearest-neighbour lookups.
+
+    Each listing is a column of standardized numeric features (log price,
+    square footage, rooms), pre-multiplied by the square root of their
+    weights, plus integer zip, zip area (first three digits) and
+    neighborhood codes. ``similar`` scores the whole catalogue against one
+    listing with a few in-place vectorized operations over contiguous
+    arrays and takes the top K with a partial sort. Arrays grow by
+    doubling, so listings that become available are appended cheaply;
+    rented ones are switched off in the ``active`` mask and compacted away
+    once they make up most of the index. The standardization is fixed when
+    the index is loaded.
+    """
+
+    NUMERIC = ('price', 'square_foot', 'room_amount')
+    COLUMNS = ('features', 'zip', 'zip_area', 'neighborhood', 'property_id', 'active')
+
+    def __init__(self):
+        if np is None:
+            raise RuntimeError("SimilarityIndex requires numpy.")
+        self._lock = threading.Lock()
+        self._mean = np.zeros(len(self.NUMERIC))
+        self._scale = np.ones(len(self.NUMERIC))
+        self._reset(0)
+
+    def _reset(self, capacity):
+        capacity = max(capacity, 1024)
+        self.features = np.zeros((len(self.NUMERIC), capacity), dtype=np.float32)
+        self.zip = np.zeros(capacity, dtype=np.int32)
+        self.zip_area = np.zeros(capacity, dtype=np.int32)
+        self.neighborhood = np.zeros(capacity, dtype=np.int32)
+        self.property_id = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self._size = 0
+        self._dead = 0
+        self._slot_of = {}
+
+    @staticmethod
+    def _raw(rows):
+        """(numeric features x rows matrix, zip codes, neighborhood codes) for FEATURE_QUERY rows."""
+        numeric = np.array([(float(row[1] or 0), float(row[2] or 0), float(row[3] or 0)) for row in rows],
+                           dtype=np.float64).reshape(-1, 3).T
+        numeric[0] = np.log1p(numeric[0])
+        zips = np.array([row[4] or 0 for row in rows], dtype=np.int32)
+        hoods = np.array([row[5] or 0 for row in rows], dtype=np.int32)
+        return numeric, zips, hoods
+
+    def _scaled(self, numeric):
+        weights = np.sqrt([WEIGHTS[name] for name in self.NUMERIC])
+        return ((numeric - self._mean[:, None]) / self._scale[:, None] * weights[:, None]).astype(np.float32)
+
+    def _append(self, rows):
+        numeric, zips, hoods = self._raw(rows)
+        for row in rows:
+            slot = self._slot_of.pop(row[0], None)
+            if slot is not None:
+                self.active[slot] = False
+                self._dead += 1
+        needed = self._size + len(rows)
+        if needed > len(self.active):
+            capacity = max(needed, 2 * len(self.active))
+            for name in self.COLUMNS:
+                old = getattr(self, name)
+                grown = np.zeros(old.shape[:-1] + (capacity,), dtype=old.dtype)
+                grown[..., :self._size] = old[..., :self._size]
+                setattr(self, name, grown)
+        end = self._size + len(rows)
+        self.features[:, self._size:end] = self._scaled(numeric)
+        self.zip[self._size:end] = zips
+        self.zip_area[self._size:end] = zips // 100
+        self.neighborhood[self._size:end] = hoods
+        self.property_id[self._size:end] = [row[0] for row in rows]
+        self.active[self._size:end] = True
+        for offset, row in enumerate(rows):
+            self._slot_of[row[0]] = self._size + offset
+        self._size = end
+
+    def _compact(self):
+        keep = np.flatnonzero(self.active[:self._size])
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            column[..., :len(keep)] = column[..., keep]
+        self.active[len(keep):] = False
+        self._size = len(keep)
+        self._dead = 0
+        self._slot_of = {pid: slot for slot, pid in enumerate(self.property_id[:self._size].tolist())}
+
+    def load(self, rows):
+        """Replace the index contents with FEATURE_QUERY rows."""
+        rows = list(rows)
+        with self._lock:
+            numeric, _, _ = self._raw(rows)
+            if rows:
+                self._mean = numeric.mean(axis=1)
+                self._scale = np.maximum(numeric.std(axis=1), 1e-6)
+            self._reset(len(rows))
+            if rows:
+                self._append(rows)
+
+    def build(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(FEATURE_QUERY + FEATURE_GROUP)
+        self.load(cursor.fetchall())
+        return len(self)
+
+    def add(self, rows):
+        """Add or replace listings from FEATURE_QUERY rows."""
+        rows = list(rows)
+        if rows:
+            with self._lock:
+                self._append(rows)
+
+    def remove(self, property_id):
+        """Mark a listing as no longer for rent."""
+        with self._lock:
+            slot = self._slot_of.pop(property_id, None)
+            if slot is None:
+                return
+            self.active[slot] = False
+            self._dead += 1
+            if self._dead > 1024 and self._dead * 2 > self._size:
+                self._compact()
+
+    def refresh_property(self, conn, property_id):
+        """Re-read one listing after its features or for_rent flag changed."""
+        cursor = conn.cursor()
+        cursor.execute(FEATURE_QUERY + " AND p.property_id = %s" + FEATURE_GROUP, (property_id,))
+        rows = cursor.fetchall()
+        self.remove(property_id)
+        self.add(rows)
+
+    def _read_anchor(self, conn, property_id):
+        """(features, zip, neighborhood) of any listing, for rent or not, or None."""
+        cursor = conn.cursor()
+        cursor.execute(FEATURE_SELECT + " WHERE p.property_id = %s" + FEATURE_GROUP, (property_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        numeric, zips, hoods = self._raw([row])
+        return self._scaled(numeric)[:, 0], int(zips[0]), int(hoods[0])
+
+    def similar(self, property_id, k=5, conn=None):
+        """[(property_id, distance)] of the k for-rent listings closest to property_id.
+
+        ``conn`` is used to read the anchor listing when it is not in the
+        index, e.g. because it was just rented. Returns [] for an unknown id.
+        """
+        with self._lock:
+            slot = self._slot_of.get(property_id)
+            anchor = None
+            if slot is not None:
+                anchor = self.features[:, slot].copy(), int(self.zip[slot]), int(self.neighborhood[slot])
+        if anchor is None and conn is not None:
+            anchor = self._read_anchor(conn, property_id)
+        if anchor is None or k < 1:
+            return []
+        features, zip_code, hood = anchor
+        with self._lock:
+            size = self._size
+            distance = np.zeros(size, dtype=np.float32)
+            diff = np.empty(size, dtype=np.float32)
+            for column, value in zip(self.features[:, :size], features):
+                np.subtract(column, value, out=diff)
+                np.multiply(diff, diff, out=diff)
+                distance += diff
+            np.add(distance, WEIGHTS['zip'], out=distance, where=self.zip[:size] != zip_code)
+            np.add(distance, WEIGHTS['zip_area'], out=distance, where=self.zip_area[:size] != zip_code // 100)
+            np.add(distance, WEIGHTS['neighborhood'], out=distance, where=self.neighborhood[:size] != hood)
+            np.copyto(distance, np.inf, where=~self.active[:size])
+            slot = self._slot_of.get(property_id)
+            if slot is not None:
+                distance[slot] = np.inf
+            k = min(k, size)
+            if k == 0:
+                return []
+            top = np.argpartition(distance, k - 1)[:k] if k < size else np.arange(size)
+            top = top[np.argsort(distance[top], kind='stable')]
+            return [(pid, float(d)) for pid, d in zip(self.property_id[top].tolist(), distance[top].tolist())
+                    if d != np.inf]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._slot_of)
@@ -0,0 +1,204 @@
+"""In-process SQLite backend.
+
+``connect()`` returns a connection that looks enough like a pymysql one
+for the rest of the application (cursor/commit/rollback/ping/close) and
+translates the MySQL dialect the queries are written in:
+
+    %s placeholders            -> ?     (only when parameters are passed,
+                                          as pymysql does)
+    NOW(), CURRENT_DATE        -> local-time datetime()/date()
+    INSERT IGNORE              -> INSERT OR IGNORE
+    SELECT ... FROM DUAL       -> SELECT ...
+    TRUNCATE TABLE t           -> DELETE FROM t
+    SELECT ... FOR UPDATE      -> SELECT ..., after BEGIN IMMEDIATE
+    SET SESSION ...            -> ignored, except foreign_key_checks which
+                                  maps to PRAGMA foreign_keys
+
+Translations are cached per SQL string, and sqlite3's own statement cache
+keeps the compiled statements, so repeated queries skip both steps.
+
+Transactions start with BEGIN IMMEDIATE, taking the write lock up front.
+A deferred transaction that reads and then writes fails at once with
+"database is locked" if another writer got in between; an immediate one
+waits for the lock (up to busy_timeout) instead.
+"""
+import re
+import sqlite3
+from datetime import date, datetime
+from functools import lru_cache
+
+# Applied to every new connection. WAL lets readers run alongside the writer.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA busy_timeout = 5000",
+)
+
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATE', lambda raw: date.fromisoformat(raw.decode()))
+sqlite3.register_converter('DATETIME', lambda raw: datetime.fromisoformat(raw.decode()))
+
+_REWRITES = (
+    (re.compile(r'\bNOW\(\)', re.IGNORECASE), "datetime('now', 'localtime')"),
+    (re.compile(r'\bCURRENT_DATE\b', re.IGNORECASE), "date('now', 'localtime')"),
+    (re.compile(r'\bINSERT\s+IGNORE\b', re.IGNORECASE), 'INSERT OR IGNORE'),
+    (re.compile(r'\s+FROM\s+DUAL\b', re.IGNORECASE), ''),
+    (re.compile(r'^\s*TRUNCATE\s+TABLE\b', re.IGNORECASE), 'DELETE FROM'),
+    (re.compile(r'\s+FOR\s+UPDATE\b', re.IGNORECASE), ''),
+)
+_FOR_UPDATE = re.compile(r'\bFOR\s+UPDATE\b', re.IGNORECASE)
+_SAVEPOINT = re.compile(r'^\s*SAVEPOINT\b', re.IGNORECASE)
+_SESSION_SETTING = re.compile(r'^\s*SET\s', re.IGNORECASE)
+_FOREIGN_KEY_CHECKS = re.compile(r'\bforeign_key_checks\s*=\s*([01])', re.IGNORECASE)
+
+
+def _placeholders(sql):
+    """Replace %s with ? outside quoted strings; %% becomes %."""
+    out = []
+    quote = None
+    i, n = 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if quote:
+            out.append(ch)
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"', '`'):
+            quote = ch
+            out.append(ch)
+        elif ch == '%' and i + 1 < n and sql[i + 1] == 's':
+            out.append('?')
+            i += 1
+        elif ch == '%' and i + 1 < n and sql[i + 1] == '%':
+            out.append('%')
+            i += 1
+        else:
+            out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+@lru_cache(maxsize=1024)
+def translate(sql, parameters=True):
+    """Rewrite a MySQL-dialect statement for SQLite; None means skip it."""
+    if _SESSION_SETTING.match(sql):
+        checks = _FOREIGN_KEY_CHECKS.search(sql)
+        return f"PRAGMA foreign_keys = {checks.group(1)}" if checks else None
+    for pattern, replacement in _REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return _placeholders(sql) if parameters else sql
+
+
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, args=None):
+        sql = translate(query, args is not None)
+        if sql is None:
+            return 0
+        if (_SAVEPOINT.match(sql) or _FOR_UPDATE.search(query)) and not self._cursor.connection.in_transaction:
+            # A savepoint would open a deferred transaction, and a plain
+            # SELECT none at all; take the write lock up front the way
+            # MySQL's implicit transaction and row lock would.
+            self._cursor.execute("BEGIN IMMEDIATE")
+        self._cursor.execute(sql, tuple(args) if args is not None else ())
+        return self._cursor.rowcount
+
+    def executemany(self, query, args):
+        sql = translate(query)
+        if sql is None:
+            return 0
+        self._cursor.executemany(sql, [tuple(row) for row in args])
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SQLiteConnection:
+    """sqlite3 connection with the subset of the pymysql interface the app uses."""
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._conn = sqlite3.connect(
+            f"file:{path}?mode=ro" if readonly else path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            cached_statements=512,
+            isolation_level='IMMEDIATE',
+            uri=readonly,
+        )
+        for pragma in PRAGMAS:
+            # The journal mode is the writer's to set.
+            if readonly and 'journal_mode' in pragma:
+                continue
+            self._conn.execute(pragma)
+        self.open = True
+
+    def cursor(self, cursorclass=None):
+        # sqlite3 cursors already step through results lazily, so there is
+        # no separate unbuffered cursor class.
+        return SQLiteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def ping(self, reconnect=True):
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        if self.open:
+            self._conn.close()
+            self.open = False
+
+
+def connect(path='rental_system.db', readonly=False, **_):
+    """Open a SQLite database; extra MySQL-style keyword arguments are ignored.
+
+    ``readonly`` opens it in read-only mode, as a stand-in for a replica.
+    """
+    return SQLiteConnection(path, readonly)
@@ -0,0 +1,223 @@
+"""Fuzzy address search over for-rent listings.
+
+``TrigramIndex`` answers main.search_properties_text without a LIKE scan:
+street names, cities, zip codes and neighborhoods are split into
+three-letter grams, so misspelt or partial queries ("bostn", "beacon st")
+still find the listing.
+"""
+import heapq
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # scoring falls back to a Counter over the posting lists
+    np = None
+
+
+# LISTING_QUERY rows (see search_index) with the zip code appended, which
+# the text search matches on but does not display.
+TEXT_QUERY = """
+    SELECT p.property_id, p.street_number, p.street_name, p.city, p.state,
+           p.room_number, p.square_foot, p.price, p.room_amount,
+           u.first_name AS landlord_first_name, u.last_name AS landlord_last_name,
+           n.name AS neighborhood_name, p.zip
+    FROM properties p
+    JOIN landlord l ON p.landlord_id = l.user_id
+    JOIN user u ON l.user_id = u.user_id
+    LEFT JOIN property_neighborhood pn ON p.property_id = pn.property_id
+    LEFT JOIN neighborhood n ON pn.neighborhood_id = n.neighborhood_id
+    WHERE p.for_rent = 1
+"""
+
+ID, STREET, CITY, NEIGHBORHOOD, ZIP = 0, 2, 3, 11, 12
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+@lru_cache(maxsize=65536)
+def _word_trigrams(word):
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def trigrams(text):
+    """Set of the padded, lowercased trigrams of each word in text.
+
+    Words are padded with two spaces in front and one behind, so short
+    words and word starts count for more, as in PostgreSQL's pg_trgm.
+    """
+    grams = set()
+    for word in _NON_ALNUM.sub(' ', (text or '').lower()).split():
+        grams |= _word_trigrams(word)
+    return grams
+
+
+def listing_text(rows):
+    """The searchable text of one property: street, city, zip and neighborhoods."""
+    first = rows[0]
+    zip_code = first[ZIP]
+    parts = [first[STREET], first[CITY], f"{zip_code:05d}" if isinstance(zip_code, int) else zip_code]
+    parts.extend(row[NEIGHBORHOOD] for row in rows)
+    return ' '.join(str(part) for part in parts if part)
+
+
+class TrigramIndex:
+    """In-memory trigram inverted index over for-rent listings' addresses.
+
+    Each listing gets a slot; every trigram of its street name, city, zip
+    and neighborhood names maps to a posting list of slots. A query is
+    scored against each listing by the share of its trigrams the listing
+    contains, so typos ("bostn") and partial words ("beacon st") still
+    match, with ties going to the listing whose text is closest in length.
+    Only the posting lists of the query's trigrams are read.
+
+    Rented listings are switched off and their slots reclaimed once they
+    make up most of the index; changed listings are re-added under a new
+    slot. ``catch_up`` picks up listings inserted by other processes.
+    """
+
+    def __init__(self, min_score=0.5):
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._postings = {}
+        self._rows = []
+        self._sizes = array('i')
+        self._alive = bytearray()
+        self._slot_of = {}
+        self._dead = 0
+        self.max_id = 0
+
+    def _insert(self, property_id, rows):
+        if property_id in self._slot_of:
+            self._delete(property_id)
+        grams = trigrams(listing_text(rows))
+        slot = len(self._rows)
+        self._rows.append([tuple(row[:ZIP]) for row in rows])
+        self._sizes.append(len(grams))
+        self._alive.append(1)
+        self._slot_of[property_id] = slot
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array('i')
+            postings.append(slot)
+        self.max_id = max(self.max_id, property_id)
+
+    def _delete(self, property_id):
+        slot = self._slot_of.pop(property_id, None)
+        if slot is None:
+            return
+        self._alive[slot] = 0
+        self._rows[slot] = None
+        self._dead += 1
+
+    def _compact(self):
+        live = [rows for rows in self._rows if rows is not None]
+        max_id = self.max_id
+        self._reset()
+        for rows in live:
+            self._insert(rows[0][ID], rows)
+        self.max_id = max_id
+
+    @staticmethod
+    def _group(rows):
+        """{property_id: rows}; a listing has one row per neighborhood."""
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row[ID], []).append(row)
+        return grouped
+
+    def load(self, rows):
+        """Replace the index contents with rows shaped like TEXT_QUERY."""
+        grouped = self._group(rows)
+        with self._lock:
+            self._reset()
+            for property_id, listing in grouped.items():
+                self._insert(property_id, listing)
+
+    def add(self, rows):
+        """Add or replace the listings in rows."""
+        grouped = self._group(rows)
+        with self._lock:
+            for property_id, listing in grouped.items():
+                self._insert(property_id, listing)
+
+    def remove(self, property_id):
+        """Drop a listing that is no longer for rent."""
+        with self._lock:
+            self._delete(property_id)
+            if self._dead > 1024 and self._dead * 2 > len(self._rows):
+                self._compact()
+
+    def build(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(TEXT_QUERY)
+        self.load(cursor.fetchall())
+        return len(self)
+
+    def refresh_property(self, conn, property_id):
+        """Re-read one listing after its address or for_rent flag changed."""
+        cursor = conn.cursor()
+        cursor.execute(TEXT_QUERY + " AND p.property_id = %s", (property_id,))
+        rows = cursor.fetchall()
+        self.remove(property_id)
+        self.add(rows)
+
+    def catch_up(self, conn):
+        """Add listings inserted since the index was built; returns how many."""
+        cursor = conn.cursor()
+        cursor.execute(TEXT_QUERY + " AND p.property_id > %s", (self.max_id,))
+        rows = cursor.fetchall()
+        self.add(rows)
+        return len(self._group(rows))
+
+    def _ranked(self, grams, limit):
+        """Slots of the best limit live listings, best first.
+
+        Listings are ranked by how many query trigrams they share, then by
+        Jaccard similarity, which favours listings with less unrelated text.
+        """
+        lists = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not lists:
+            return []
+        wanted = len(grams)
+        needed = max(1, math.ceil(self.min_score * wanted))
+        if np is None:
+            counts = Counter()
+            for postings in lists:
+                counts.update(postings)
+            scored = [(shared + shared / (wanted + self._sizes[slot] - shared), -slot)
+                      for slot, shared in counts.items()
+                      if self._alive[slot] and shared >= needed]
+            return [-slot for _, slot in heapq.nlargest(limit, scored)]
+        # Views over the arrays must not outlive the lock: arrays with
+        # exported buffers cannot grow.
+        counts = np.bincount(np.concatenate([np.frombuffer(p, dtype=np.intc) for p in lists]),
+                             minlength=len(self._rows))
+        counts[np.frombuffer(self._alive, dtype=np.uint8) == 0] = 0
+        candidates = np.flatnonzero(counts >= needed)
+        shared = counts[candidates]
+        sizes = np.frombuffer(self._sizes, dtype=np.intc)[candidates]
+        rank = shared + shared / (wanted + sizes - shared)
+        top = np.argpartition(-rank, limit - 1)[:limit] if len(candidates) > limit else np.arange(len(candidates))
+        return candidates[top[np.argsort(-rank[top], kind='stable')]].tolist()
+
+    def search(self, text, limit=20):
+        """Return up to limit matching listings' rows, best match first."""
+        grams = trigrams(text)
+        if not grams or limit < 1:
+            return []
+        with self._lock:
+            return [row for slot in self._ranked(grams, limit) for row in self._rows[slot]]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._slot_of)
@@ -0,0 +1,107 @@
+import threading
+
+from cache import invalidate
+
+
+class WriteBehindBuffer:
+    """Coalesce keyed writes in memory and flush them in batches.
+
+    ``record(key, *values)`` keeps only the latest values per key. Pending
+    rows are written with a single ``executemany`` of ``sql`` whenever
+    ``max_pending`` keys are buffered, every ``interval`` seconds once the
+    background flusher is started, and on ``close()``. With the flusher
+    running, a full buffer wakes it rather than flushing in the caller,
+    which may already hold the pool's last free connection. Each row is
+    passed to ``sql`` as ``(*values, key)`` so the key can go in the WHERE
+    clause.
+    """
+
+    def __init__(self, pool, sql, interval=5.0, max_pending=500, tables=()):
+        self.pool = pool
+        self.sql = sql
+        # Tables whose cached query results go stale when a batch is written.
+        self.tables = tables
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self.flushed_rows = 0
+        self.flushes = 0
+
+    def record(self, key, *values):
+        with self._lock:
+            self._pending[key] = values
+            full = len(self._pending) >= self.max_pending
+        if full:
+            if self._thread is not None and self._thread.is_alive():
+                self._wake.set()
+            else:
+                self.flush()
+
+    def pending(self, key):
+        """Return the buffered values for key, or None if nothing is waiting."""
+        with self._lock:
+            return self._pending.get(key)
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = self._pending
+                self._pending = {}
+            rows = [values + (key,) for key, values in batch.items()]
+            try:
+                with self.pool.connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.executemany(self.sql, rows)
+                    conn.commit()
+                    if self.tables:
+                        invalidate(conn, *self.tables)
+            except Exception:
+                # Put the batch back without clobbering newer values.
+                with self._lock:
+                    for key, values in batch.items():
+                        self._pending.setdefault(key, values)
+                raise
+            self.flushed_rows += len(rows)
+            self.flushes += 1
+            return len(rows)
+
+    def start(self):
+        """Flush on a daemon thread every `interval` seconds."""
+        def run():
+            while not self._stop.is_set():
+                self._wake.wait(self.interval)
+                self._wake.clear()
+                if self._stop.is_set():
+                    break
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Error flushing buffered writes: {e}")
+        self._thread = threading.Thread(target=run, name="write-behind", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def close(self):
+        """Stop the flusher thread and write out anything still pending."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+        return self.flush()
+
+
+LAST_LOGIN_SQL = "UPDATE user_auth SET last_login = %s WHERE auth_id = %s"
+
+
+def last_login_buffer(pool, interval=5.0, max_pending=500):
+    """Write-behind buffer for user_auth.last_login, keyed by auth_id."""
+    return WriteBehindBuffer(pool, LAST_LOGIN_SQL, interval=interval, max_pending=max_pending,
+                             tables=('user_auth',))
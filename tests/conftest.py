@@ -0,0 +1,45 @@
+import os
+import sys
+
+# The modules in src/ import each other as top-level modules.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def sqlite_conn(tmp_path, capsys):
+    """A migrated SQLite database holding one landlord (user_id 1)."""
+    from migrate import migrate
+    from sqlite_backend import connect
+
+    conn = connect(str(tmp_path / 'rental.db'))
+    migrate(conn, backend='sqlite')
+    capsys.readouterr()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO user_auth (auth_id, username, password_hash, salt) VALUES (1, 'l@example.com', 'x', '')")
+    cursor.execute("INSERT INTO user (user_id, auth_id, first_name, last_name, phone, email)"
+                   " VALUES (1, 1, 'Lee', 'Park', '555-0001', 'l@example.com')")
+    cursor.execute("INSERT INTO landlord (user_id) VALUES (1)")
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def add_property(conn, property_id, price, city='Boston', for_rent=1, neighborhoods=()):
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO properties (property_id, landlord_id, street_number, street_name, city, state, zip,"
+        " room_number, square_foot, price, room_amount, for_rent) VALUES (%s, 1, 1, 'Main Street', %s, 'MA',"
+        " 2100, 1, 800, %s, 2, %s)", (property_id, city, price, for_rent))
+    for name in neighborhoods:
+        cursor.execute("SELECT neighborhood_id FROM neighborhood WHERE name = %s", (name,))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute("INSERT INTO neighborhood (name) VALUES (%s)", (name,))
+            neighborhood_id = cursor.lastrowid
+        else:
+            neighborhood_id = row[0]
+        cursor.execute("INSERT INTO property_neighborhood (property_id, neighborhood_id) VALUES (%s, %s)",
+                       (property_id, neighborhood_id))
+    conn.commit()
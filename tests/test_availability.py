@@ -0,0 +1,44 @@
+from datetime import date
+
+import pytest
+
+from conftest import add_property
+
+pytest.importorskip('numpy')
+
+from availability import AvailabilityIndex  # noqa: E402
+
+
+def add_stay(conn, rent_id, property_id, start, end):
+    conn.cursor().execute(
+        "INSERT INTO rent (rent_id, tenant_id, property_id, start_date, end_date, contract_length, price)"
+        " VALUES (%s, 1, %s, %s, %s, 1, 100)", (rent_id, property_id, start, end))
+    conn.commit()
+
+
+def test_catch_up_reads_stays_committed_out_of_rent_id_order(sqlite_conn):
+    sqlite_conn.cursor().execute("INSERT INTO tenant (user_id) VALUES (1)")
+    for property_id in (1, 2, 3):
+        add_property(sqlite_conn, property_id, 100)
+    index = AvailabilityIndex()
+    index.build(sqlite_conn)
+
+    # This process books rent_id 42, while rent_id 41 is still uncommitted
+    # in another one.
+    add_stay(sqlite_conn, 42, 2, '2100-01-01', '2100-02-01')
+    index.add(2, date(2100, 1, 1), date(2100, 2, 1), 42)
+    assert index.catch_up(sqlite_conn) == 0
+    add_stay(sqlite_conn, 41, 1, '2100-01-01', '2100-02-01')
+    add_stay(sqlite_conn, 43, 3, '2100-01-01', '2100-02-01')
+
+    assert index.catch_up(sqlite_conn) == 2
+    assert index.busy(date(2100, 1, 10), date(2100, 1, 20)).tolist() == [1, 2, 3]
+    assert len(index) == 3
+    assert index.catch_up(sqlite_conn) == 0
+    assert len(index) == 3
+
+    # A booking whose own transaction's catch_up already read it.
+    add_stay(sqlite_conn, 44, 1, '2100-03-01', '2100-04-01')
+    assert index.catch_up(sqlite_conn) == 1
+    index.add(1, date(2100, 3, 1), date(2100, 4, 1), 44)
+    assert len(index) == 4
@@ -0,0 +1,44 @@
+import sqlite3
+
+from batch import BatchRunner
+from cache import after_commit
+
+
+class Recorder:
+    """Operations whose after-commit work appends to `done`."""
+
+    def __init__(self):
+        self.done = []
+
+    def get(self, name):
+        return getattr(self, name)
+
+    def write(self, conn, op):
+        after_commit(conn, self.done.append, op['id'])
+
+    def fail(self, conn, op):
+        after_commit(conn, self.done.append, op['id'])
+        raise ValueError("rejected")
+
+    def lose(self, conn, op):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_after_commit_work_runs_only_for_committed_operations(sqlite_conn):
+    operations = Recorder()
+    runner = BatchRunner(None, operations)
+    items = [(1, {'op': 'write', 'id': 'a'}), (2, {'op': 'fail', 'id': 'b'}), (3, {'op': 'write', 'id': 'c'})]
+
+    outcomes = dict(runner.run_batch(sqlite_conn, items))
+    assert [outcomes[line]['ok'] for line in (1, 2, 3)] == [True, False, True]
+    assert operations.done == ['a', 'c']
+
+
+def test_after_commit_work_of_a_lost_transaction_runs_once_on_replay(sqlite_conn):
+    operations = Recorder()
+    runner = BatchRunner(None, operations)
+    items = [(1, {'op': 'write', 'id': 'a'}), (2, {'op': 'lose'}), (3, {'op': 'write', 'id': 'c'})]
+
+    outcomes = dict(runner.run_batch(sqlite_conn, items))
+    assert [outcomes[line]['ok'] for line in (1, 2, 3)] == [True, False, True]
+    assert operations.done == ['a', 'c']
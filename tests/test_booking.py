@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+
+import pymysql
+import pytest
+
+import booking
+from booking import BookingRequest, PropertyUnavailable, book_property
+from conftest import add_property
+
+
+@pytest.fixture
+def conn(sqlite_conn):
+    sqlite_conn.cursor().execute("INSERT INTO tenant (user_id) VALUES (1)")
+    add_property(sqlite_conn, 1, 1000)
+    sqlite_conn.commit()
+    return sqlite_conn
+
+
+def book(conn, start, months=1):
+    return book_property(conn, BookingRequest(tenant_id=1, property_id=1, contract_length=months, start_date=start))
+
+
+def for_rent(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT for_rent FROM properties WHERE property_id = 1")
+    return cursor.fetchone()[0]
+
+
+def test_overlapping_stay_is_rejected(conn):
+    book(conn, date(2100, 1, 1), months=2)
+    with pytest.raises(PropertyUnavailable):
+        book(conn, date(2100, 2, 15))
+    with pytest.raises(PropertyUnavailable):
+        book(conn, date(2099, 12, 15))
+
+
+def test_back_to_back_stays_are_both_accepted(conn):
+    # Stays are [start, end): one ending on 1 February leaves that day free.
+    first = book(conn, date(2100, 1, 1))
+    second = book(conn, date(2100, 2, 1))
+    assert first != second
+    cursor = conn.cursor()
+    cursor.execute("SELECT start_date, end_date FROM rent ORDER BY start_date")
+    assert cursor.fetchall() == [(date(2100, 1, 1), date(2100, 2, 1)), (date(2100, 2, 1), date(2100, 3, 1))]
+
+
+def test_only_a_stay_starting_today_takes_the_listing_off_the_market(conn):
+    book(conn, date.today() + timedelta(days=60))
+    assert for_rent(conn) == 1
+    book(conn, date.today())
+    assert for_rent(conn) == 0
+
+
+def test_deadlock_is_retried(conn, monkeypatch):
+    book_once, calls = booking._book_once, []
+
+    def deadlock_once(conn, request):
+        calls.append(request.property_id)
+        if len(calls) == 1:
+            raise pymysql.err.OperationalError(1213, "Deadlock found when trying to get lock")
+        return book_once(conn, request)
+
+    monkeypatch.setattr(booking, '_book_once', deadlock_once)
+    assert book_property(conn, BookingRequest(1, 1, 1, start_date=date(2100, 1, 1)), backoff=0) is not None
+    assert len(calls) == 2
@@ -0,0 +1,23 @@
+import csv
+import io
+
+from db import ConnectionPool
+from ingest import ingest
+from sqlite_backend import connect
+
+
+def test_rows_with_an_unknown_landlord_are_rejected(sqlite_conn, tmp_path):
+    pool = ConnectionPool(config={'path': str(tmp_path / 'rental.db')}, connect=connect, backend='sqlite')
+    rows = [{'landlord_id': landlord_id, 'street_number': '1', 'street_name': 'Main Street',
+             'city': 'Boston', 'state': 'MA', 'price': '1000'} for landlord_id in ('1', '99', '1')]
+    out = io.StringIO()
+    try:
+        loaded, rejected, _ = ingest(pool, rows, {'for_rent': 1}, batch_size=2, rejects=csv.writer(out))
+    finally:
+        pool.close()
+
+    assert (loaded, rejected) == (2, 1)
+    assert next(csv.reader(io.StringIO(out.getvalue())))[:2] == ['2', 'unknown landlord_id 99']
+    cursor = sqlite_conn.cursor()
+    cursor.execute("SELECT landlord_id FROM properties")
+    assert [row[0] for row in cursor.fetchall()] == [1, 1]
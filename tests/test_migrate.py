@@ -0,0 +1,11 @@
+from migrate import hot_queries, sample_params
+
+
+def test_hot_queries_are_all_valid_sql(sqlite_conn):
+    found = hot_queries()
+    labels = [label for label, _ in found]
+    for name in ('LOCK_PROPERTY', 'OVERLAPPING_STAY', 'OCCUPY_PROPERTY', 'INSERT_RENT'):
+        assert f"booking.{name}" in labels
+    cursor = sqlite_conn.cursor()
+    for label, sql in found:
+        cursor.execute("EXPLAIN " + ' '.join(sql.split()), sample_params(sql))
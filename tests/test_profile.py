@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import main
+
+
+class CountingCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        self.conn.queries.append(sql)
+
+    def fetchall(self):
+        return [self.conn.row] if self.conn.row else []
+
+    def fetchone(self):
+        return self.conn.row
+
+
+class CountingConnection:
+    """Answers every query with one profile row and records each execute()."""
+
+    def __init__(self, row):
+        self.row = row
+        self.queries = []
+
+    def cursor(self, cursorclass=None):
+        return CountingCursor(self)
+
+
+PROFILE_ROW = (7, 'Ada', 'Lovelace', '555-0100', 'ada@example.com', 'ada@example.com',
+               datetime(2026, 1, 2, 3, 4, 5), 1, 1, 1, '123-45-6789', 0, None, 1)
+
+
+def test_view_profile_loads_in_one_query(capsys):
+    conn = CountingConnection(PROFILE_ROW)
+    main.view_profile(conn, 7)
+    assert len(conn.queries) == 1
+    out = capsys.readouterr().out
+    assert "Name: Ada Lovelace" in out
+    assert "Registered as: Landlord" in out
+    assert "Registered as: Tenant" in out
+    assert "SSN: 123-45-6789" in out
+    assert "Status: Student" in out
+
+
+def test_view_profile_of_unknown_user_is_one_query(capsys):
+    conn = CountingConnection(None)
+    main.view_profile(conn, 7)
+    assert len(conn.queries) == 1
+    assert "User information not found." in capsys.readouterr().out
@@ -0,0 +1,36 @@
+from cache import QueryCache, cached_fetchone, invalidate
+from db import ConnectionPool, RoutedPool
+from sqlite_backend import connect
+
+
+def make_db(path, name):
+    conn = connect(str(path))
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE user (user_id INTEGER PRIMARY KEY, first_name TEXT)")
+    cursor.execute("INSERT INTO user (user_id, first_name) VALUES (1, %s)", (name,))
+    conn.commit()
+    conn.close()
+
+
+def test_lagging_replica_does_not_refill_the_cache_for_a_sticky_user(tmp_path):
+    # The replica is a separate file, so it never sees the primary's writes.
+    make_db(tmp_path / 'primary.db', 'Lee')
+    make_db(tmp_path / 'replica.db', 'Lee')
+    primary = ConnectionPool(config={'path': str(tmp_path / 'primary.db')}, connect=connect,
+                             backend='sqlite', cache=QueryCache())
+    replica = ConnectionPool(config={'path': str(tmp_path / 'replica.db'), 'readonly': True},
+                             connect=connect, backend='sqlite', min_size=0)
+    pool = RoutedPool(primary, [replica], sticky_seconds=60)
+    query = "SELECT first_name FROM user WHERE user_id = %s"
+    try:
+        with pool.connection(user_id=1) as conn:
+            conn.cursor().execute("UPDATE user SET first_name = 'Lena' WHERE user_id = 1")
+            conn.commit()
+            invalidate(conn, 'user')
+        # Another user's read is served by the stale replica.
+        with pool.connection(user_id=2) as conn:
+            assert cached_fetchone(conn, query, (1,)) == ('Lee',)
+        with pool.connection(user_id=1) as conn:
+            assert cached_fetchone(conn, query, (1,)) == ('Lena',)
+    finally:
+        pool.close()
@@ -0,0 +1,91 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from conftest import add_property  # noqa: E402
+from search_index import PropertySearchIndex  # noqa: E402
+
+
+def listing(property_id, city, price, neighborhood=None, for_rent=1):
+    """A row shaped like INDEX_QUERY."""
+    return (property_id, 1, 'Main Street', city, 'MA', 1, 800, price, 2, 'Lee', 'Park', neighborhood, for_rent)
+
+
+def ids(rows):
+    return [row[0] for row in rows]
+
+
+def pages(index, limit, **filters):
+    """Every row of search_page(), following the (price, property_id) key page by page."""
+    rows, after = [], None
+    while True:
+        page = index.search_page(after=after, limit=limit, **filters)
+        rows += page
+        if len(page) < limit:
+            return rows
+        after = (page[-1][7], page[-1][0])
+
+
+def test_add_keeps_rows_in_step_with_columns_on_price_ties():
+    index = PropertySearchIndex()
+    index.load([listing(1, 'Boston', 100), listing(2, 'Cambridge', 100), listing(3, 'Boston', 200)])
+    index.add([listing(6, 'Boston', 100), listing(4, 'Cambridge', 100), listing(5, 'Boston', 100)])
+
+    assert ids(index.search()) == [1, 2, 4, 5, 6, 3]
+    assert ids(index.search(city='Boston')) == [1, 5, 6, 3]
+    assert ids(index.search(city='Cambridge')) == [2, 4]
+    for limit in (1, 2, 3):
+        assert ids(pages(index, limit, city='Boston')) == [1, 5, 6, 3]
+        assert ids(pages(index, limit)) == [1, 2, 4, 5, 6, 3]
+    # Every row still matches its column values.
+    assert index.property_id.tolist() == [1, 2, 4, 5, 6, 3]
+
+
+def test_relisted_property_keeps_property_id_order(sqlite_conn):
+    for property_id in (5, 7, 9):
+        add_property(sqlite_conn, property_id, 100)
+    index = PropertySearchIndex()
+    index.build(sqlite_conn)
+    index.remove(7)
+    assert ids(index.search()) == [5, 9]
+    assert ids(index.search(for_rent=False)) == [5, 7, 9]
+
+    index.refresh_property(sqlite_conn, 7)
+    assert ids(index.search()) == [5, 7, 9]
+    assert ids(index.search(for_rent=False)) == [5, 7, 9]
+    assert ids(pages(index, 1)) == [5, 7, 9]
+    assert ids(pages(index, 2)) == [5, 7, 9]
+
+
+def test_page_never_ends_inside_a_listings_neighborhood_rows():
+    index = PropertySearchIndex()
+    index.load([listing(1, 'Boston', 100, 'Back Bay'), listing(1, 'Boston', 100, 'South End'),
+                listing(2, 'Boston', 100, 'Fenway'), listing(3, 'Boston', 200, 'North End'),
+                listing(3, 'Boston', 200, 'West End'), listing(4, 'Boston', 300)])
+    expected = sorted((row[0], row[11]) for row in index.search())
+    for limit in (1, 2, 3, 4):
+        assert sorted((row[0], row[11]) for row in pages(index, limit)) == expected
+    first = index.search_page(limit=1)
+    assert [(row[0], row[11]) for row in first] == [(1, 'Back Bay'), (1, 'South End')]
+
+
+def test_catch_up_picks_up_other_processes_changes(sqlite_conn):
+    add_property(sqlite_conn, 1, 100)
+    add_property(sqlite_conn, 2, 200)
+    sqlite_conn.commit()
+    index = PropertySearchIndex(ttl=3600)
+    index.build(sqlite_conn)
+
+    # Another process lists a new property and lets an existing one.
+    add_property(sqlite_conn, 3, 150)
+    sqlite_conn.cursor().execute("UPDATE properties SET for_rent = 0 WHERE property_id = 1")
+    sqlite_conn.commit()
+    index.catch_up(sqlite_conn)
+    assert ids(index.search()) == [1, 3, 2]
+    index.catch_up(sqlite_conn)
+    assert ids(index.search()) == [1, 3, 2]
+
+    index.ttl = 0
+    index.catch_up(sqlite_conn)
+    assert ids(index.search()) == [3, 2]
+    assert ids(index.search(for_rent=False)) == [1, 3, 2]
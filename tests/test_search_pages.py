@@ -0,0 +1,61 @@
+from datetime import date
+
+import pytest
+
+from availability import AvailabilityIndex
+from conftest import add_property
+from main import search_available_properties, search_properties_page
+from search_index import PropertySearchIndex
+
+
+def all_pages(conn, filters, page_size, index=None):
+    rows, after = [], None
+    while True:
+        page = search_properties_page(conn, filters, after, page_size, index)
+        rows += page
+        if len(page) < page_size:
+            return rows
+        after = (page[-1][7], page[-1][0])
+
+
+def test_sql_pages_keep_every_neighborhood_row(sqlite_conn):
+    add_property(sqlite_conn, 1, 100, neighborhoods=('Back Bay', 'South End'))
+    add_property(sqlite_conn, 2, 100, neighborhoods=('Fenway',))
+    add_property(sqlite_conn, 3, 200, neighborhoods=('North End', 'West End', 'Beacon Hill'))
+    add_property(sqlite_conn, 4, 300)
+
+    for page_size in (1, 2, 3, 4):
+        rows = all_pages(sqlite_conn, {}, page_size)
+        assert sorted((row[0], row[11]) for row in rows) == [
+            (1, 'Back Bay'), (1, 'South End'), (2, 'Fenway'),
+            (3, 'Beacon Hill'), (3, 'North End'), (3, 'West End'), (4, None)]
+
+
+def add_stay(conn, property_id, start, end):
+    conn.cursor().execute(
+        "INSERT INTO rent (tenant_id, property_id, start_date, end_date, contract_length, price)"
+        " VALUES (1, %s, %s, %s, 1, 100)", (property_id, start, end))
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_date_search_finds_a_let_listing_free_later(sqlite_conn, indexed):
+    sqlite_conn.cursor().execute("INSERT INTO tenant (user_id) VALUES (1)")
+    add_property(sqlite_conn, 1, 100, for_rent=0)
+    add_property(sqlite_conn, 2, 200)
+    add_property(sqlite_conn, 3, 300, for_rent=0)
+    add_stay(sqlite_conn, 1, '2000-01-01', '2100-06-01')
+    add_stay(sqlite_conn, 2, '2100-02-01', '2100-03-01')
+    add_stay(sqlite_conn, 3, '2000-01-01', '2100-02-01')
+    sqlite_conn.commit()
+    index = availability = None
+    if indexed:
+        pytest.importorskip('numpy')
+        index, availability = PropertySearchIndex(), AvailabilityIndex()
+        index.build(sqlite_conn)
+        availability.build(sqlite_conn)
+    dates = {'available_from': date(2100, 2, 1), 'available_to': date(2100, 3, 1)}
+
+    # 3 is let today but free from February; 2 is for rent but booked then.
+    assert [row[0] for row in search_available_properties(sqlite_conn, dates, index, availability)] == [3]
+    assert [row[0] for row in search_properties_page(sqlite_conn, dates, None, 20, index, availability)] == [3]
+    assert [row[0] for row in search_available_properties(sqlite_conn, {}, index, availability)] == [2]
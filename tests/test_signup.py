@@ -0,0 +1,7 @@
+from main import create_account
+
+
+def test_accounts_without_a_phone_number(sqlite_conn):
+    first = create_account(sqlite_conn, 'a@example.com', 'secret-a', 'Ann', 'Ames', '')
+    second = create_account(sqlite_conn, 'b@example.com', 'secret-b', 'Bob', 'Burns', '')
+    assert first != second